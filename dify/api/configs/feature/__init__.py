@@ -97,6 +97,26 @@ class CodeExecutionSandboxConfig(BaseSettings):
         default=10.0,
     )
 
+    CODE_EXECUTION_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections to the code execution service per process",
+        default=100,
+    )
+
+    CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS: NonNegativeInt = Field(
+        description="Maximum number of idle keep-alive connections to the code execution service per process",
+        default=20,
+    )
+
+    CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Time in seconds an idle keep-alive connection to the code execution service is kept open",
+        default=5.0,
+    )
+
+    CODE_EXECUTION_BATCH_SIZE: NonNegativeInt = Field(
+        description="Maximum number of iteration items a code node runs in one code execution request, 0 to disable",
+        default=0,
+    )
+
     CODE_MAX_NUMBER: PositiveInt = Field(
         description="Maximum allowed numeric value in code execution",
         default=9223372036854775807,
@@ -175,6 +195,21 @@ class PluginConfig(BaseSettings):
         default=15728640 * 12,
     )
 
+    PLUGIN_DAEMON_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of keep-alive connections to the plugin daemon kept per process",
+        default=100,
+    )
+
+    PLUGIN_DAEMON_CONNECT_TIMEOUT: PositiveFloat = Field(
+        description="Timeout in seconds for connecting to the plugin daemon",
+        default=10.0,
+    )
+
+    PLUGIN_DAEMON_READ_TIMEOUT: PositiveFloat = Field(
+        description="Timeout in seconds for waiting on data from the plugin daemon, between two chunks when streaming",
+        default=600.0,
+    )
+
 
 class MarketplaceConfig(BaseSettings):
     """
@@ -381,6 +416,21 @@ class HttpConfig(BaseSettings):
         default=5,
     )
 
+    SSRF_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections of each pooled client for network requests (SSRF)",
+        default=100,
+    )
+
+    SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS: NonNegativeInt = Field(
+        description="Maximum number of idle keep-alive connections of each pooled client for network requests (SSRF)",
+        default=20,
+    )
+
+    SSRF_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Time in seconds an idle keep-alive connection for network requests (SSRF) is kept open",
+        default=5.0,
+    )
+
     RESPECT_XFORWARD_HEADERS_ENABLED: bool = Field(
         description="Enable handling of X-Forwarded-For, X-Forwarded-Proto, and X-Forwarded-Port headers"
         " when the app is behind a single trusted reverse proxy.",
@@ -460,6 +510,43 @@ class ModelLoadBalanceConfig(BaseSettings):
         default=False,
     )
 
+    MEMORY_TOKEN_ESTIMATION_ENABLED: bool = Field(
+        description="Estimate the tokens of conversation memory with a local GPT-2 tokenizer"
+        " instead of counting them with the model",
+        default=False,
+    )
+
+    MEMORY_TOKEN_COUNTING_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of concurrent token counts of conversation memory messages",
+        default=8,
+    )
+
+
+class ModelProviderCacheConfig(BaseSettings):
+    """
+    Configuration for the caches of model provider configurations
+    """
+
+    PROVIDER_CONFIGURATIONS_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of tenants whose provider configurations are cached per worker, 0 to disable",
+        default=1000,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds cached provider configurations of a tenant are reused",
+        default=300,
+    )
+
+    PLUGIN_MODEL_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of plugin model provider lists and model schemas cached per worker, 0 to disable",
+        default=5000,
+    )
+
+    PLUGIN_MODEL_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds plugin model providers and schemas fetched from the plugin daemon are reused",
+        default=300,
+    )
+
 
 class BillingConfig(BaseSettings):
     """
@@ -508,6 +595,16 @@ class WorkflowConfig(BaseSettings):
         default=3,
     )
 
+    WORKFLOW_NODE_MAX_CONCURRENCY: PositiveInt = Field(
+        description="Maximum number of workflow nodes executing at once in a process, shared by all workflow runs",
+        default=200,
+    )
+
+    WORKFLOW_NODE_MAX_CONCURRENCY_PER_RUN: PositiveInt = Field(
+        description="Maximum number of nodes of a single workflow run executing at once in a process",
+        default=50,
+    )
+
     MAX_VARIABLE_SIZE: PositiveInt = Field(
         description="Maximum size in bytes for a single variable in workflows. Default to 200 KB.",
         default=200 * 1024,
@@ -529,6 +626,31 @@ class WorkflowNodeExecutionConfig(BaseSettings):
         description="Storage backend for WorkflowNodeExecution. Options: 'rdbms', 'hybrid'",
     )
 
+    WORKFLOW_NODE_EXECUTION_WRITE_STRICT: bool = Field(
+        description="Write every workflow node execution change right away instead of batching writes, for debugging",
+        default=False,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Seconds workflow node execution writes are held to be coalesced before they are flushed",
+        default=0.5,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Number of pending workflow node execution writes flushing right away, and rows per batch",
+        default=100,
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_MAX_ATTEMPTS: PositiveInt = Field(
+        description="Number of failed attempts to write a workflow node execution before it is dropped",
+        default=5,
+    )
+
+    WORKFLOW_NODE_EXECUTION_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of running workflow node executions a repository keeps in memory",
+        default=1000,
+    )
+
 
 class AuthConfig(BaseSettings):
     """
@@ -676,8 +798,8 @@ class RagEtlConfig(BaseSettings):
     )
 
     KEYWORD_DATA_SOURCE_TYPE: str = Field(
-        description="Data source type for keyword extraction"
-        " ('database' or other supported types), default to 'database'",
+        description="Deprecated, keyword tables are stored in the dataset_keyword_postings table,"
+        " tables of the legacy data source types ('database' or storage) are imported on first access",
         default="database",
     )
 
@@ -732,6 +854,26 @@ class DataSetConfig(BaseSettings):
         default=30,
     )
 
+    RETRIEVAL_STATS_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Interval in seconds at which buffered segment hit counts and dataset queries are written",
+        default=5.0,
+    )
+
+    RETRIEVAL_STATS_FLUSH_THRESHOLD: PositiveInt = Field(
+        description="Number of buffered segment hits and dataset queries that triggers an early write",
+        default=500,
+    )
+
+    RETRIEVAL_RESULT_CACHE_ENABLED: bool = Field(
+        description="Enable caching of retrieval results in Redis, invalidated whenever the dataset content changes",
+        default=False,
+    )
+
+    RETRIEVAL_RESULT_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds a cached retrieval result is kept",
+        default=300,
+    )
+
 
 class WorkspaceConfig(BaseSettings):
     """
@@ -759,6 +901,32 @@ class IndexingConfig(BaseSettings):
         default=50,
     )
 
+    EMBEDDING_LOCAL_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of document embeddings kept in the process-local LRU cache, 0 to disable",
+        default=2000,
+    )
+
+    EMBEDDING_CACHE_QUERY_BATCH_SIZE: PositiveInt = Field(
+        description="Maximum number of text hashes looked up in the embeddings table per bulk query",
+        default=500,
+    )
+
+    KEYWORD_TABLE_CACHE_MAX_BYTES: NonNegativeInt = Field(
+        description="Memory budget in bytes of the per-worker keyword postings cache, 0 to disable",
+        default=64 * 1024 * 1024,
+    )
+
+    KEYWORD_TABLE_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds a cached keyword postings entry is kept",
+        default=600,
+    )
+
+    EMBEDDING_STORAGE_FORMAT: Literal["float32", "float16", "int8"] = Field(
+        description="Binary format of cached embeddings in the database and Redis ('float32', 'float16' or 'int8'),"
+        " default to float32",
+        default="float32",
+    )
+
 
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
@@ -887,6 +1055,7 @@ class FeatureConfig(
     LoggingConfig,
     MailConfig,
     ModelLoadBalanceConfig,
+    ModelProviderCacheConfig,
     ModerationConfig,
     MultiModalTransferConfig,
     PositionConfig,
@@ -84,6 +84,34 @@ class VectorStoreConfig(BaseSettings):
         default=False,
     )
 
+    VECTOR_CACHE_MAX_SIZE: NonNegativeInt = Field(
+        description="Maximum number of ready-to-use dataset vectors and embedding models cached per worker"
+        " for retrieval, 0 to disable.",
+        default=256,
+    )
+
+    VECTOR_CACHE_TTL: PositiveInt = Field(
+        description="Time in seconds a cached dataset vector or embedding model is reused.",
+        default=300,
+    )
+
+    VECTOR_STORE_POOL_MAX_LIFETIME: PositiveInt = Field(
+        description="Maximum lifetime in seconds of a pooled connection of the SQL-backed vector stores,"
+        " older connections are recycled.",
+        default=3600,
+    )
+
+    VECTOR_STORE_POOL_TIMEOUT: PositiveFloat = Field(
+        description="Maximum time in seconds to wait for a pooled connection of the SQL-backed vector stores.",
+        default=30.0,
+    )
+
+    VECTOR_STORE_POOL_HEALTH_CHECK_INTERVAL: NonNegativeFloat = Field(
+        description="Pooled connections of the SQL-backed vector stores idle for longer than this number of seconds"
+        " are checked before reuse.",
+        default=30.0,
+    )
+
 
 class KeywordStoreConfig(BaseSettings):
     KEYWORD_STORE: str = Field(
@@ -172,8 +200,26 @@ class DatabaseConfig(BaseSettings):
     )
 
     RETRIEVAL_SERVICE_EXECUTORS: NonNegativeInt = Field(
-        description="Number of processes for the retrieval service, default to CPU cores.",
-        default=os.cpu_count() or 1,
+        description="Number of threads of the process-wide pool running the searches of the retrieval service,"
+        " default to 4 times the CPU cores.",
+        default=(os.cpu_count() or 1) * 4,
+    )
+
+    RETRIEVAL_DATASET_EXECUTORS: PositiveInt = Field(
+        description="Number of threads of the process-wide pool retrieving the datasets of multiple dataset retrieval.",
+        default=32,
+    )
+
+    RETRIEVAL_TIMEOUT: PositiveFloat = Field(
+        description="Deadline in seconds of one retrieval, datasets or searches not finished in time are skipped"
+        " and the results gathered so far are returned.",
+        default=30.0,
+    )
+
+    RETRIEVAL_MAX_OVERDUE_TASKS: PositiveInt = Field(
+        description="Number of timed out tasks of one dataset or search that may keep holding a thread of the"
+        " retrieval pools, its further tasks are skipped until one of them finishes.",
+        default=2,
     )
 
     @computed_field  # type: ignore[misc]
@@ -5,6 +5,7 @@ from typing import TYPE_CHECKING
 from contexts.wrapper import RecyclableContextVar
 
 if TYPE_CHECKING:
+    from core.helper.code_executor.code_executor import CodeExecutionBatch
     from core.model_runtime.entities.model_entities import AIModelEntity
     from core.plugin.entities.plugin_daemon import PluginModelProviderEntity
     from core.tools.plugin_tool.provider import PluginToolProviderController
@@ -33,3 +34,8 @@ plugin_model_schema_lock: RecyclableContextVar[Lock] = RecyclableContextVar(Cont
 plugin_model_schemas: RecyclableContextVar[dict[str, "AIModelEntity"]] = RecyclableContextVar(
     ContextVar("plugin_model_schemas")
 )
+
+# Key: code node id, Value: id of the iteration node and the planned executions of its items
+code_execution_batches: RecyclableContextVar[dict[str, tuple[str, "CodeExecutionBatch"]]] = RecyclableContextVar(
+    ContextVar("code_execution_batches")
+)
@@ -92,6 +92,7 @@ class CompletionConversationApi(Resource):
         query = query.order_by(Conversation.created_at.desc())
 
         conversations = db.paginate(query, page=args["page"], per_page=args["limit"], error_out=False)
+        Conversation.load_aggregates(conversations.items)
 
         return conversations
 
@@ -257,6 +258,7 @@ class ChatConversationApi(Resource):
                 query = query.order_by(Conversation.created_at.desc())
 
         conversations = db.paginate(query, page=args["page"], per_page=args["limit"], error_out=False)
+        Conversation.load_aggregates(conversations.items)
 
         return conversations
 
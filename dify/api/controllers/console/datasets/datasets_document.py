@@ -212,23 +212,9 @@ class DatasetDocumentListApi(Resource):
         paginated_documents = db.paginate(select=query, page=page, per_page=limit, max_per_page=100, error_out=False)
         documents = paginated_documents.items
         if fetch:
+            segment_progress = DocumentService.get_segment_progress([str(document.id) for document in documents])
             for document in documents:
-                completed_segments = (
-                    db.session.query(DocumentSegment)
-                    .filter(
-                        DocumentSegment.completed_at.isnot(None),
-                        DocumentSegment.document_id == str(document.id),
-                        DocumentSegment.status != "re_segment",
-                    )
-                    .count()
-                )
-                total_segments = (
-                    db.session.query(DocumentSegment)
-                    .filter(DocumentSegment.document_id == str(document.id), DocumentSegment.status != "re_segment")
-                    .count()
-                )
-                document.completed_segments = completed_segments
-                document.total_segments = total_segments
+                document.completed_segments, document.total_segments = segment_progress[str(document.id)]
             data = marshal(documents, document_with_segments_fields)
         else:
             data = marshal(documents, document_fields)
@@ -567,22 +553,10 @@ class DocumentBatchIndexingStatusApi(DocumentResource):
         dataset_id = str(dataset_id)
         batch = str(batch)
         documents = self.get_batch_documents(dataset_id, batch)
+        segment_progress = DocumentService.get_segment_progress([str(document.id) for document in documents])
         documents_status = []
         for document in documents:
-            completed_segments = (
-                db.session.query(DocumentSegment)
-                .filter(
-                    DocumentSegment.completed_at.isnot(None),
-                    DocumentSegment.document_id == str(document.id),
-                    DocumentSegment.status != "re_segment",
-                )
-                .count()
-            )
-            total_segments = (
-                db.session.query(DocumentSegment)
-                .filter(DocumentSegment.document_id == str(document.id), DocumentSegment.status != "re_segment")
-                .count()
-            )
+            completed_segments, total_segments = segment_progress[str(document.id)]
             # Create a dictionary with document attributes and additional fields
             document_dict = {
                 "id": document.id,
@@ -612,20 +586,7 @@ class DocumentIndexingStatusApi(DocumentResource):
         document_id = str(document_id)
         document = self.get_document(dataset_id, document_id)
 
-        completed_segments = (
-            db.session.query(DocumentSegment)
-            .filter(
-                DocumentSegment.completed_at.isnot(None),
-                DocumentSegment.document_id == str(document_id),
-                DocumentSegment.status != "re_segment",
-            )
-            .count()
-        )
-        total_segments = (
-            db.session.query(DocumentSegment)
-            .filter(DocumentSegment.document_id == str(document_id), DocumentSegment.status != "re_segment")
-            .count()
-        )
+        completed_segments, total_segments = DocumentService.get_segment_progress([document_id])[document_id]
 
         # Create a dictionary with document attributes and additional fields
         document_dict = {
@@ -25,6 +25,9 @@ class PublishFrom(Enum):
 
 
 class AppQueueManager:
+    # seconds between reads of the stop flag, it is checked for every published and listened message
+    _stop_check_interval = 0.5
+
     def __init__(self, task_id: str, user_id: str, invoke_from: InvokeFrom) -> None:
         if not user_id:
             raise ValueError("user is required")
@@ -41,6 +44,8 @@ class AppQueueManager:
         q: queue.Queue[WorkflowQueueMessage | MessageQueueMessage | None] = queue.Queue()
 
         self._q = q
+        self._stopped = False
+        self._stop_checked_at = float("-inf")
 
     def listen(self):
         """
@@ -128,12 +133,21 @@ class AppQueueManager:
 
     def _is_stopped(self) -> bool:
         """
-        Check if task is stopped
+        Check if task is stopped, the stop flag is read at most once per `_stop_check_interval`
         :return:
         """
+        if self._stopped:
+            return True
+
+        now = time.monotonic()
+        if now - self._stop_checked_at < self._stop_check_interval:
+            return False
+        self._stop_checked_at = now
+
         stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
         result = redis_client.get(stopped_cache_key)
         if result is not None:
+            self._stopped = True
             return True
 
         return False
@@ -1,10 +1,11 @@
+import json
 import logging
-from collections.abc import Mapping
+from collections.abc import Mapping, Sequence
 from enum import StrEnum
 from threading import Lock
 from typing import Any, Optional
 
-from httpx import Timeout, post
+from httpx import Client, Limits, Timeout
 from pydantic import BaseModel
 from yarl import URL
 
@@ -13,13 +14,17 @@ from core.helper.code_executor.javascript.javascript_transformer import NodeJsTe
 from core.helper.code_executor.jinja2.jinja2_transformer import Jinja2TemplateTransformer
 from core.helper.code_executor.python3.python3_transformer import Python3TemplateTransformer
 from core.helper.code_executor.template_transformer import TemplateTransformer
+from libs.process_local import ProcessLocal
 
 logger = logging.getLogger(__name__)
 code_execution_endpoint_url = URL(str(dify_config.CODE_EXECUTION_ENDPOINT))
 
 
 class CodeExecutionError(Exception):
-    pass
+    def __init__(self, *args: object, stdout: str = "") -> None:
+        super().__init__(*args)
+        # output printed by the code before the error
+        self.stdout = stdout
 
 
 class CodeExecutionResponse(BaseModel):
@@ -42,6 +47,16 @@ class CodeExecutor:
     dependencies_cache: dict[str, str] = {}
     dependencies_cache_lock = Lock()
 
+    _client = ProcessLocal(
+        lambda: Client(
+            limits=Limits(
+                max_connections=dify_config.CODE_EXECUTION_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=dify_config.CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=dify_config.CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+    )
+
     code_template_transformers: dict[CodeLanguage, type[TemplateTransformer]] = {
         CodeLanguage.PYTHON3: Python3TemplateTransformer,
         CodeLanguage.JINJA2: Jinja2TemplateTransformer,
@@ -56,6 +71,13 @@ class CodeExecutor:
 
     supported_dependencies_languages: set[CodeLanguage] = {CodeLanguage.PYTHON3}
 
+    @classmethod
+    def _get_client(cls) -> Client:
+        """
+        Get the process-wide client of the code execution service, it keeps connections alive between executions
+        """
+        return cls._client.get()
+
     @classmethod
     def execute_code(cls, language: CodeLanguage, preload: str, code: str) -> str:
         """
@@ -77,7 +99,7 @@ class CodeExecutor:
         }
 
         try:
-            response = post(
+            response = cls._get_client().post(
                 str(url),
                 json=data,
                 headers=headers,
@@ -85,7 +107,8 @@ class CodeExecutor:
                     connect=dify_config.CODE_EXECUTION_CONNECT_TIMEOUT,
                     read=dify_config.CODE_EXECUTION_READ_TIMEOUT,
                     write=dify_config.CODE_EXECUTION_WRITE_TIMEOUT,
-                    pool=None,
+                    # waiting for a pooled connection is bounded like connecting
+                    pool=dify_config.CODE_EXECUTION_CONNECT_TIMEOUT,
                 ),
             )
             if response.status_code == 503:
@@ -115,7 +138,7 @@ class CodeExecutor:
         response_code = CodeExecutionResponse(**response_data)
 
         if response_code.data.error:
-            raise CodeExecutionError(response_code.data.error)
+            raise CodeExecutionError(response_code.data.error, stdout=response_code.data.stdout or "")
 
         return response_code.data.stdout or ""
 
@@ -140,3 +163,111 @@ class CodeExecutor:
             raise e
 
         return template_transformer.transform_response(response)
+
+    @classmethod
+    def execute_workflow_code_template_batch(
+        cls, language: CodeLanguage, code: str, inputs_list: Sequence[Mapping[str, Any]]
+    ) -> list[Mapping[str, Any] | Exception]:
+        """
+        Execute code once for each of several inputs, in as few requests as the batch size allows
+        :param language: code language
+        :param code: code
+        :param inputs_list: inputs of each execution
+        :return: result of each execution, or the error it raised
+        """
+        template_transformer = cls.code_template_transformers.get(language)
+        if not template_transformer:
+            raise CodeExecutionError(f"Unsupported language {language}")
+
+        batch_size = dify_config.CODE_EXECUTION_BATCH_SIZE
+        if not batch_size or template_transformer.get_batch_runner_script() is None:
+            return [cls._execute_workflow_code_template_safely(language, code, inputs) for inputs in inputs_list]
+
+        results: list[Mapping[str, Any] | Exception] = []
+        for start in range(0, len(inputs_list), batch_size):
+            chunk = inputs_list[start : start + batch_size]
+            runner, preload = template_transformer.transform_batch_caller(code, chunk)
+            chunk_error: Optional[CodeExecutionError] = None
+            try:
+                response = cls.execute_code(language, preload, runner)
+            except CodeExecutionError as e:
+                # e.g. the chunk exceeds the time limit of the sandbox, the inputs reported before are kept
+                logger.warning(
+                    "Batch execution of %d inputs failed, executing the inputs not started one by one", len(chunk)
+                )
+                chunk_error = e
+                response = e.stdout
+
+            started = template_transformer.extract_batch_started_indexes(response, len(chunk))
+            chunk_results = template_transformer.transform_batch_response(response, len(chunk))
+            for index, (inputs, result) in enumerate(zip(chunk, chunk_results)):
+                if result is None and index in started:
+                    # the input may have run partly, e.g. until the time limit, it is not run again
+                    results.append(chunk_error or CodeExecutionError("The code exited before returning a result"))
+                elif result is None:
+                    # the runner ended before starting the input, it is run on its own
+                    results.append(cls._execute_workflow_code_template_safely(language, code, inputs))
+                elif isinstance(result, RuntimeError):
+                    # errors raised by the code itself are reported like the ones of a single execution
+                    results.append(CodeExecutionError(str(result)))
+                else:
+                    results.append(result)
+        return results
+
+    @classmethod
+    def _execute_workflow_code_template_safely(
+        cls, language: CodeLanguage, code: str, inputs: Mapping[str, Any]
+    ) -> Mapping[str, Any] | Exception:
+        try:
+            return cls.execute_workflow_code_template(language, code, inputs)
+        except Exception as e:
+            return e
+
+
+class CodeExecutionBatch:
+    """
+    Planned executions of one code over several inputs, e.g. a code node over the items of an iteration.
+
+    The inputs are executed chunk by chunk, a chunk on the first lookup of one of its inputs, so
+    executions never run far ahead of the run that needs them. The inputs of a chunk share one
+    interpreter, each of them runs the code in a fresh namespace.
+    """
+
+    def __init__(self, language: CodeLanguage, code: str, inputs_list: Sequence[Mapping[str, Any]]) -> None:
+        self._language = language
+        self._code = code
+        self._inputs_list = list(inputs_list)
+        self._chunk_size = max(dify_config.CODE_EXECUTION_BATCH_SIZE, 1)
+        self._lock = Lock()
+        self._chunk_locks: dict[int, Lock] = {}
+        self._results: dict[int, Mapping[str, Any] | Exception] = {}
+
+    @staticmethod
+    def inputs_key(inputs: Mapping[str, Any]) -> str:
+        return json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+
+    def execute(self, position: int, inputs: Mapping[str, Any]) -> Optional[Mapping[str, Any]]:
+        """
+        Get the result of the planned inputs at a position, the error of the execution is raised
+        :param position: position of the inputs, e.g. the index of the iteration item
+        :param inputs: inputs
+        :return: result, None when other inputs were planned at the position
+        """
+        if not 0 <= position < len(self._inputs_list):
+            return None
+        if self.inputs_key(self._inputs_list[position]) != self.inputs_key(inputs):
+            return None
+
+        start = position - position % self._chunk_size
+        with self._lock:
+            chunk_lock = self._chunk_locks.setdefault(start, Lock())
+        with chunk_lock:
+            if position not in self._results:
+                chunk = self._inputs_list[start : start + self._chunk_size]
+                results = CodeExecutor.execute_workflow_code_template_batch(self._language, self._code, chunk)
+                self._results.update(enumerate(results, start))
+
+        result = self._results[position]
+        if isinstance(result, Exception):
+            raise result
+        return result
@@ -24,3 +24,32 @@ class NodeJsTemplateTransformer(TemplateTransformer):
             """
         )
         return runner_script
+
+    @classmethod
+    def get_batch_runner_script(cls) -> str:
+        runner_script = dedent(
+            f"""
+            // decode the code and the list of input objects
+            var code = Buffer.from('{cls._code_placeholder}', 'base64').toString('utf-8')
+            var inputs_list = JSON.parse(Buffer.from('{cls._inputs_placeholder}', 'base64').toString('utf-8'))
+
+            // for each input object, declare main function in a fresh scope and execute it, print the start
+            // of the input and its result or its error
+            inputs_list.forEach(function (inputs_obj, index) {{
+                console.log(`<<START_${{index}}>>`)
+                try {{
+                    var main = new Function('require', 'module', 'exports', code + '\\nreturn main')(
+                        require,
+                        module,
+                        exports
+                    )
+                    var output_json = JSON.stringify(main(inputs_obj))
+                    console.log(`<<RESULT_${{index}}>>${{output_json}}<<RESULT_${{index}}>>`)
+                }} catch (e) {{
+                    var error_json = JSON.stringify(e && e.stack ? e.stack : String(e))
+                    console.log(`<<ERROR_${{index}}>>${{error_json}}<<ERROR_${{index}}>>`)
+                }}
+            }})
+            """
+        )
+        return runner_script
@@ -25,3 +25,29 @@ class Python3TemplateTransformer(TemplateTransformer):
             print(result)
             """)
         return runner_script
+
+    @classmethod
+    def get_batch_runner_script(cls) -> str:
+        runner_script = dedent(f"""
+            import json
+            import traceback
+            from base64 import b64decode
+
+            # decode the code and the list of input dicts
+            code = compile(b64decode('{cls._code_placeholder}').decode('utf-8'), '<string>', 'exec')
+            inputs_list = json.loads(b64decode('{cls._inputs_placeholder}').decode('utf-8'))
+
+            # for each input dict, declare main function in a fresh namespace and execute it, print the start
+            # of the input and its result or its error, flushed so they survive the runner being killed
+            for index, inputs_obj in enumerate(inputs_list):
+                print(f'''<<START_{{index}}>>''', flush=True)
+                try:
+                    namespace = {{'__name__': '__main__'}}
+                    exec(code, namespace)
+                    output_json = json.dumps(namespace['main'](**inputs_obj), indent=4)
+                    print(f'''<<RESULT_{{index}}>>{{output_json}}<<RESULT_{{index}}>>''', flush=True)
+                except Exception:
+                    error_json = json.dumps(traceback.format_exc())
+                    print(f'''<<ERROR_{{index}}>>{{error_json}}<<ERROR_{{index}}>>''', flush=True)
+            """)
+        return runner_script
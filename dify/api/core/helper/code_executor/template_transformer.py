@@ -2,14 +2,18 @@ import json
 import re
 from abc import ABC, abstractmethod
 from base64 import b64encode
-from collections.abc import Mapping
-from typing import Any
+from collections.abc import Mapping, Sequence
+from typing import Any, Optional
 
 
 class TemplateTransformer(ABC):
     _code_placeholder: str = "{{code}}"
     _inputs_placeholder: str = "{{inputs}}"
     _result_tag: str = "<<RESULT>>"
+    # tags of the start, the result and the error of the input at a given index of a batch run
+    _batch_start_tag: str = "<<START_{index}>>"
+    _batch_result_tag: str = "<<RESULT_{index}>>"
+    _batch_error_tag: str = "<<ERROR_{index}>>"
 
     @classmethod
     def transform_caller(cls, code: str, inputs: Mapping[str, Any]) -> tuple[str, str]:
@@ -38,8 +42,17 @@ class TemplateTransformer(ABC):
         :param response: response
         :return:
         """
+        return cls.load_result(cls.extract_result_str_from_response(response))
+
+    @classmethod
+    def load_result(cls, result_str: str) -> Mapping[str, Any]:
+        """
+        Load the result printed by the runner script
+        :param result_str: result between the result tags
+        :return:
+        """
         try:
-            result = json.loads(cls.extract_result_str_from_response(response))
+            result = json.loads(result_str)
         except json.JSONDecodeError:
             raise ValueError("failed to parse response")
         if not isinstance(result, dict):
@@ -48,6 +61,68 @@ class TemplateTransformer(ABC):
             raise ValueError("result keys must be strings")
         return result
 
+    @classmethod
+    def get_batch_runner_script(cls) -> Optional[str]:
+        """
+        Get the runner script declaring the base64 encoded code in a fresh namespace and calling main
+        for each input of a JSON list. It prints `_batch_start_tag` before each input, then the result
+        between `_batch_result_tag` or the error as JSON string between `_batch_error_tag`.
+        None when the language has no batch runner
+        """
+        return None
+
+    @classmethod
+    def transform_batch_caller(cls, code: str, inputs_list: Sequence[Mapping[str, Any]]) -> tuple[str, str]:
+        """
+        Transform code to a runner of several inputs
+        :param code: code
+        :param inputs_list: inputs of each run
+        :return: runner, preload
+        """
+        runner_script = cls.get_batch_runner_script()
+        if runner_script is None:
+            raise NotImplementedError(f"{cls.__name__} has no batch runner")
+
+        code_str = b64encode(code.encode()).decode("utf-8")
+        runner_script = runner_script.replace(cls._code_placeholder, code_str)
+        inputs_str = b64encode(json.dumps(list(inputs_list), ensure_ascii=False).encode()).decode("utf-8")
+        runner_script = runner_script.replace(cls._inputs_placeholder, inputs_str)
+
+        return runner_script, cls.get_preload_script()
+
+    @classmethod
+    def transform_batch_response(cls, response: str, count: int) -> list[Mapping[str, Any] | Exception | None]:
+        """
+        Transform the response of a batch runner to the result, or the error, of each input
+        :param response: response
+        :param count: number of inputs
+        :return: None for the inputs the runner did not report, e.g. because the code exited
+        """
+        results: list[Mapping[str, Any] | Exception | None] = []
+        for index in range(count):
+            result_tag = re.escape(cls._batch_result_tag.format(index=index))
+            error_tag = re.escape(cls._batch_error_tag.format(index=index))
+            if result := re.search(rf"{result_tag}(.*?){result_tag}", response, re.DOTALL):
+                try:
+                    results.append(cls.load_result(result.group(1)))
+                except ValueError as e:
+                    results.append(e)
+            elif error := re.search(rf"{error_tag}(.*?){error_tag}", response, re.DOTALL):
+                results.append(RuntimeError(json.loads(error.group(1))))
+            else:
+                results.append(None)
+        return results
+
+    @classmethod
+    def extract_batch_started_indexes(cls, response: str, count: int) -> set[int]:
+        """
+        Get the indexes of the inputs a batch runner started, an unreported one may have run partly
+        :param response: response
+        :param count: number of inputs
+        :return:
+        """
+        return {index for index in range(count) if cls._batch_start_tag.format(index=index) in response}
+
     @classmethod
     @abstractmethod
     def get_runner_script(cls) -> str:
@@ -0,0 +1,108 @@
+import threading
+from collections.abc import Callable, Hashable, Sequence
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
+
+from configs import dify_config
+from libs.versioned_cache import VersionedCache
+
+if TYPE_CHECKING:
+    from core.model_runtime.entities.model_entities import AIModelEntity
+    from core.plugin.entities.plugin_daemon import PluginModelProviderEntity
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("error", "event", "value")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class PluginModelCache(VersionedCache):
+    """
+    Per-worker cache of the model providers and model schemas fetched from the plugin daemon.
+
+    Entries are keyed by tenant id and plugin version, a Redis counter bumped whenever plugins of
+    the tenant are installed, upgraded or uninstalled. Concurrent misses of one key share a single
+    daemon call. Installations complete asynchronously in the daemon, the TTL bounds how long a
+    plugin installed after the last bump stays unseen.
+    """
+
+    VERSION_KEY = "plugin_model_version:{}"
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        super().__init__(self.VERSION_KEY, maxsize, ttl)
+        self._inflight: dict[Hashable, _Flight] = {}
+        self._shared_loads = 0
+
+    def _get_or_load(self, tenant_id: str, key: Hashable, loader: Callable[[], T]) -> T:
+        version = self.get_version(tenant_id) if self._enabled else None
+        if version is None:
+            return loader()
+
+        key = (tenant_id, version, key)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._hits += 1
+                return value
+            self._misses += 1
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._shared_loads += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                # empty results are not cached, e.g. a schema the plugin could not resolve
+                if flight.error is None and flight.value is not None:
+                    self._entries[key] = flight.value
+            flight.event.set()
+        return flight.value
+
+    def get_model_providers(
+        self, tenant_id: str, loader: Callable[[], Sequence["PluginModelProviderEntity"]]
+    ) -> Sequence["PluginModelProviderEntity"]:
+        return self._get_or_load(tenant_id, "model_providers", loader)
+
+    def get_model_schema(
+        self, tenant_id: str, schema_key: str, loader: Callable[[], Optional["AIModelEntity"]]
+    ) -> Optional["AIModelEntity"]:
+        """
+        :param schema_key: key of the schema, it must cover plugin, provider, model type, model and credentials
+        """
+        return self._get_or_load(tenant_id, ("model_schema", schema_key), loader)
+
+    def stats(self) -> dict[str, float]:
+        stats = super().stats()
+        with self._lock:
+            stats["shared_loads"] = self._shared_loads
+        return stats
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._shared_loads = 0
+
+
+plugin_model_cache = PluginModelCache(
+    maxsize=dify_config.PLUGIN_MODEL_CACHE_SIZE,
+    ttl=dify_config.PLUGIN_MODEL_CACHE_TTL,
+)
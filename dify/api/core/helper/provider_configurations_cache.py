@@ -0,0 +1,34 @@
+from collections.abc import Hashable
+from typing import TYPE_CHECKING, Optional
+
+from configs import dify_config
+from libs.versioned_cache import VersionedCache
+
+if TYPE_CHECKING:
+    from core.entities.provider_configuration import ProviderConfigurations
+
+
+class ProviderConfigurationsCache(VersionedCache):
+    """
+    Per-worker cache of the provider configurations built for a tenant.
+
+    Entries are keyed by tenant id and configurations version. The version lives in Redis and is
+    bumped whenever provider, provider model, model setting, load balancing or quota records of the
+    tenant change, so every worker rebuilds on its next lookup. The TTL bounds the staleness of
+    what is not versioned, e.g. plugins installed asynchronously by the plugin daemon or quotas
+    topped up by the billing service.
+    """
+
+    VERSION_KEY = "provider_configurations_version:{}"
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        super().__init__(self.VERSION_KEY, maxsize, ttl)
+
+    def get(self, tenant_id: str, version: Optional[int], key: Hashable = None) -> Optional["ProviderConfigurations"]:
+        return super().get(tenant_id, version, key)
+
+
+provider_configurations_cache = ProviderConfigurationsCache(
+    maxsize=dify_config.PROVIDER_CONFIGURATIONS_CACHE_SIZE,
+    ttl=dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL,
+)
@@ -2,12 +2,18 @@
 Proxy requests to avoid SSRF
 """
 
+import asyncio
 import logging
+import threading
 import time
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Any, Optional
 
 import httpx
 
 from configs import dify_config
+from libs.process_local import ProcessLocal
 
 SSRF_DEFAULT_MAX_RETRIES = dify_config.SSRF_DEFAULT_MAX_RETRIES
 
@@ -34,7 +40,130 @@ class MaxRetriesExceededError(ValueError):
     pass
 
 
-def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+# (proxy name, ssl verify) of a pooled client
+_ClientKey = tuple[str, bool]
+
+
+class _RejectCookiesPolicy(DefaultCookiePolicy):
+    """
+    Pooled clients are shared by all tenants, cookies set by a response must never be kept.
+    Redirects are followed by `_send` with a cookie jar of the call instead.
+    """
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+def _proxy_name() -> str:
+    # proxy urls may hold credentials, they are only named
+    if dify_config.SSRF_PROXY_ALL_URL:
+        return "all"
+    elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
+        return "http+https"
+    return "direct"
+
+
+def _client_kwargs(ssl_verify: bool, transport_class: type) -> dict[str, Any]:
+    limits = httpx.Limits(
+        max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+    )
+    kwargs: dict[str, Any] = {
+        "verify": ssl_verify,
+        "limits": limits,
+        "cookies": CookieJar(policy=_RejectCookiesPolicy()),
+    }
+    if dify_config.SSRF_PROXY_ALL_URL:
+        kwargs["proxy"] = dify_config.SSRF_PROXY_ALL_URL
+    elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
+        kwargs["mounts"] = {
+            "http://": transport_class(proxy=dify_config.SSRF_PROXY_HTTP_URL, verify=ssl_verify, limits=limits),
+            "https://": transport_class(proxy=dify_config.SSRF_PROXY_HTTPS_URL, verify=ssl_verify, limits=limits),
+        }
+    return kwargs
+
+
+class _ClientPool:
+    """
+    Long-lived httpx clients per (proxy, ssl verify), so requests reuse connections and TLS sessions.
+
+    Sync clients are process-wide and recreated in forked processes, async clients are bound to the
+    event loop they were created in.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: ProcessLocal[dict[_ClientKey, httpx.Client]] = ProcessLocal(dict)
+        self._async_clients: ProcessLocal[
+            weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[_ClientKey, httpx.AsyncClient]]
+        ] = ProcessLocal(weakref.WeakKeyDictionary)
+
+    def get_client(self, ssl_verify: bool) -> httpx.Client:
+        key = (_proxy_name(), bool(ssl_verify))
+        clients = self._clients.get()
+        client = clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = clients.get(key)
+            if client is None:
+                client = httpx.Client(**_client_kwargs(ssl_verify, httpx.HTTPTransport))
+                clients[key] = client
+            return client
+
+    def get_async_client(self, ssl_verify: bool) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        key = (_proxy_name(), bool(ssl_verify))
+        async_clients = self._async_clients.get()
+        with self._lock:
+            clients = async_clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                client = httpx.AsyncClient(**_client_kwargs(ssl_verify, httpx.AsyncHTTPTransport))
+                clients[key] = client
+            return client
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Utilisation of the connection pools, keyed by `sync|async:proxy:verify`."""
+        sync_clients = self._clients.peek() or {}
+        async_clients = self._async_clients.peek() or {}
+        with self._lock:
+            clients: list[tuple[str, httpx.Client | httpx.AsyncClient]] = [
+                (f"sync:{proxy}:{verify}", client) for (proxy, verify), client in sync_clients.items()
+            ]
+            for loop_clients in async_clients.values():
+                clients.extend((f"async:{proxy}:{verify}", client) for (proxy, verify), client in loop_clients.items())
+
+        result: dict[str, dict[str, int]] = {}
+        for name, client in clients:
+            stats = result.setdefault(name, {"connections": 0, "idle": 0, "active": 0, "waiting": 0})
+            transports = [client._transport, *(t for t in client._mounts.values() if t is not None)]
+            for transport in {id(t): t for t in transports}.values():
+                pool = getattr(transport, "_pool", None)
+                connections = list(getattr(pool, "connections", None) or [])
+                idle = sum(1 for connection in connections if connection.is_idle())
+                stats["connections"] += len(connections)
+                stats["idle"] += idle
+                stats["active"] += len(connections) - idle
+                stats["waiting"] += sum(1 for request in getattr(pool, "_requests", None) or [] if request.is_queued())
+        return result
+
+    def close(self) -> None:
+        clients = self._clients.pop() or {}
+        self._async_clients.pop()
+        for client in clients.values():
+            client.close()
+
+
+_client_pool = _ClientPool()
+
+
+def _prepare_kwargs(kwargs: dict[str, Any]) -> bool:
+    """
+    Normalise the request kwargs in place
+    :return: ssl verify
+    """
     if "allow_redirects" in kwargs:
         allow_redirects = kwargs.pop("allow_redirects")
         if "follow_redirects" not in kwargs:
@@ -47,33 +176,109 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
             read=dify_config.SSRF_DEFAULT_READ_TIME_OUT,
             write=dify_config.SSRF_DEFAULT_WRITE_TIME_OUT,
         )
+    else:
+        timeout = httpx.Timeout(kwargs["timeout"])
+        if timeout.pool is None:
+            # the pools are bounded, never wait for a free connection forever
+            kwargs["timeout"] = httpx.Timeout(
+                connect=timeout.connect, read=timeout.read, write=timeout.write, pool=dify_config.SSRF_DEFAULT_TIME_OUT
+            )
 
     if "ssl_verify" not in kwargs:
         kwargs["ssl_verify"] = HTTP_REQUEST_NODE_SSL_VERIFY
 
-    ssl_verify = kwargs.pop("ssl_verify")
+    return kwargs.pop("ssl_verify")
+
+
+class _Call:
+    """
+    One request through a pooled client, following redirects by itself.
+
+    The pooled clients reject every cookie, so the cookies of a call are kept in a jar of its own:
+    cookies set by a response of a redirect chain are sent on the rest of the chain, as a client
+    per request would, and never leak into the requests of other calls.
+    """
+
+    def __init__(self, method: str, url: str, kwargs: dict[str, Any]) -> None:
+        self._method = method
+        self._url = url
+        self._cookies = kwargs.pop("cookies", None)
+        self._follow_redirects = bool(kwargs.pop("follow_redirects", False))
+        self._send_kwargs = {"auth": kwargs.pop("auth")} if "auth" in kwargs else {}
+        self._request_kwargs = kwargs
+
+    def start(self, client: httpx.Client | httpx.AsyncClient) -> tuple[httpx.Request, httpx.Cookies]:
+        # every attempt starts a new redirect chain with the cookies of the caller only
+        cookies = httpx.Cookies(self._cookies)
+        request = client.build_request(self._method, self._url, cookies=cookies, **self._request_kwargs)
+        return request, cookies
+
+    def send_kwargs(self) -> dict[str, Any]:
+        return {**self._send_kwargs, "follow_redirects": False}
+
+    def next_request(
+        self,
+        client: httpx.Client | httpx.AsyncClient,
+        response: httpx.Response,
+        cookies: httpx.Cookies,
+        history: list[httpx.Response],
+    ) -> Optional[httpx.Request]:
+        """
+        :return: request of the redirect to follow, None when the response is final
+        """
+        request = response.next_request
+        if not self._follow_redirects or request is None:
+            response.history = list(history)
+            return None
+        if len(history) >= client.max_redirects:
+            raise httpx.TooManyRedirects("Exceeded maximum allowed redirects.", request=response.request)
+        history.append(response)
+        cookies.extract_cookies(response)
+        # the redirect request carries the cookies of the pooled client, which are always empty
+        request.headers.pop("Cookie", None)
+        cookies.set_cookie_header(request)
+        return request
+
+
+def _send(client: httpx.Client, call: _Call) -> httpx.Response:
+    request, cookies = call.start(client)
+    history: list[httpx.Response] = []
+    while True:
+        response = client.send(request, **call.send_kwargs())
+        next_request = call.next_request(client, response, cookies, history)
+        if next_request is None:
+            return response
+        response.close()
+        request = next_request
+
+
+async def _send_async(client: httpx.AsyncClient, call: _Call) -> httpx.Response:
+    request, cookies = call.start(client)
+    history: list[httpx.Response] = []
+    while True:
+        response = await client.send(request, **call.send_kwargs())
+        next_request = call.next_request(client, response, cookies, history)
+        if next_request is None:
+            return response
+        await response.aclose()
+        request = next_request
+
+
+def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+    ssl_verify = _prepare_kwargs(kwargs)
+    call = _Call(method, url, kwargs)
 
     retries = 0
     while retries <= max_retries:
         try:
-            if dify_config.SSRF_PROXY_ALL_URL:
-                with httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL, verify=ssl_verify) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
-                proxy_mounts = {
-                    "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL, verify=ssl_verify),
-                    "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL, verify=ssl_verify),
-                }
-                with httpx.Client(mounts=proxy_mounts, verify=ssl_verify) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            else:
-                with httpx.Client(verify=ssl_verify) as client:
-                    response = client.request(method=method, url=url, **kwargs)
+            response = _send(_client_pool.get_client(ssl_verify), call)
 
             if response.status_code not in STATUS_FORCELIST:
                 return response
             else:
                 logging.warning(f"Received status code {response.status_code} for URL {url} which is in the force list")
+                # the response is dropped, its connection goes back to the pool before the retry
+                response.close()
 
         except httpx.RequestError as e:
             logging.warning(f"Request to URL {url} failed on attempt {retries + 1}: {e}")
@@ -86,6 +291,40 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     raise MaxRetriesExceededError(f"Reached maximum retries ({max_retries}) for URL {url}")
 
 
+async def make_request_async(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+    """
+    Async variant of `make_request` for concurrent requests, same proxies, retries and errors.
+    """
+    ssl_verify = _prepare_kwargs(kwargs)
+    call = _Call(method, url, kwargs)
+
+    retries = 0
+    while retries <= max_retries:
+        try:
+            response = await _send_async(_client_pool.get_async_client(ssl_verify), call)
+
+            if response.status_code not in STATUS_FORCELIST:
+                return response
+            else:
+                logging.warning(f"Received status code {response.status_code} for URL {url} which is in the force list")
+                # the response is dropped, its connection goes back to the pool before the retry
+                await response.aclose()
+
+        except httpx.RequestError as e:
+            logging.warning(f"Request to URL {url} failed on attempt {retries + 1}: {e}")
+            if max_retries == 0:
+                raise
+
+        retries += 1
+        if retries <= max_retries:
+            await asyncio.sleep(BACKOFF_FACTOR * (2 ** (retries - 1)))
+    raise MaxRetriesExceededError(f"Reached maximum retries ({max_retries}) for URL {url}")
+
+
+def pool_stats() -> dict[str, dict[str, int]]:
+    return _client_pool.stats()
+
+
 def get(url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     return make_request("GET", url, max_retries=max_retries, **kwargs)
 
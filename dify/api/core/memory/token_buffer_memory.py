@@ -1,6 +1,13 @@
+from collections import defaultdict
 from collections.abc import Sequence
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, cast
 
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from configs import dify_config
 from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
 from core.file import file_manager
 from core.model_manager import ModelInstance
@@ -13,11 +20,27 @@ from core.model_runtime.entities import (
     UserPromptMessage,
 )
 from core.model_runtime.entities.message_entities import PromptMessageContentUnionTypes
+from core.model_runtime.model_providers.__base.tokenizers.gpt2_tokenzier import GPT2Tokenizer
 from core.prompt.utils.extract_thread_messages import extract_thread_messages
 from extensions.ext_database import db
 from factories import file_factory
 from models.model import AppMode, Conversation, Message, MessageFile
-from models.workflow import WorkflowRun
+from models.workflow import Workflow, WorkflowRun
+
+
+def estimate_num_tokens(prompt_message: PromptMessage) -> int:
+    """
+    Estimate the number of tokens of the text of a prompt message with the local GPT-2 tokenizer.
+    """
+    if isinstance(prompt_message.content, str):
+        return GPT2Tokenizer.get_num_tokens(prompt_message.content)
+    if isinstance(prompt_message.content, list):
+        return sum(
+            GPT2Tokenizer.get_num_tokens(content.data)
+            for content in prompt_message.content
+            if isinstance(content, TextPromptMessageContent)
+        )
+    return 0
 
 
 class TokenBufferMemory:
@@ -30,6 +53,9 @@ class TokenBufferMemory:
     ) -> Sequence[PromptMessage]:
         """
         Get history prompt messages.
+
+        The uncounted messages are counted together, when the history exceeds the max token limit they are
+        counted one by one and the counts are persisted per model, then the oldest messages are cut off.
         :param max_token_limit: max token limit
         :param message_limit: message limit
         """
@@ -45,6 +71,9 @@ class TokenBufferMemory:
                 Message.workflow_run_id,
                 Message.parent_message_id,
                 Message.answer_tokens,
+                Message.memory_tokens_model,
+                Message.memory_query_tokens,
+                Message.memory_answer_tokens,
             )
             .filter(
                 Message.conversation_id == self.conversation.id,
@@ -69,23 +98,29 @@ class TokenBufferMemory:
 
         messages = list(reversed(thread_messages))
 
+        files_by_message = self._get_message_files([message.id for message in messages])
+        file_extra_configs = self._get_file_extra_configs(
+            [message.workflow_run_id for message in messages if message.id in files_by_message]
+        )
+
         prompt_messages: list[PromptMessage] = []
+        # tokens of each prompt message, None when they are not counted yet
+        token_counts: list[Optional[int]] = []
+        # message, column and tokens model of each prompt message, for persisting its tokens
+        count_keys: list[tuple[Any, str, str]] = []
+        persist_token_counts = (
+            not dify_config.MEMORY_TOKEN_ESTIMATION_ENABLED and dify_config.PLUGIN_BASED_TOKEN_COUNTING_ENABLED
+        )
+        # persisted counts are only reused by the model which counted them
+        tokens_model = f"{self.model_instance.provider}:{self.model_instance.model}"
         for message in messages:
-            files = db.session.query(MessageFile).filter(MessageFile.message_id == message.id).all()
+            message_tokens_model = tokens_model
+            files = files_by_message.get(message.id)
             if files:
-                file_extra_config = None
                 if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
+                    file_extra_config = file_extra_configs.get(None)
                 else:
-                    if message.workflow_run_id:
-                        workflow_run = (
-                            db.session.query(WorkflowRun).filter(WorkflowRun.id == message.workflow_run_id).first()
-                        )
-
-                        if workflow_run and workflow_run.workflow:
-                            file_extra_config = FileUploadConfigManager.convert(
-                                workflow_run.workflow.features_dict, is_vision=False
-                            )
+                    file_extra_config = file_extra_configs.get(message.workflow_run_id)
 
                 detail = ImagePromptMessageContent.DETAIL.LOW
                 if file_extra_config and app_record:
@@ -98,7 +133,7 @@ class TokenBufferMemory:
                     file_objs = []
 
                 if not file_objs:
-                    prompt_messages.append(UserPromptMessage(content=message.query))
+                    user_prompt_message = UserPromptMessage(content=message.query)
                 else:
                     prompt_message_contents: list[PromptMessageContentUnionTypes] = []
                     prompt_message_contents.append(TextPromptMessageContent(data=message.query))
@@ -109,26 +144,113 @@ class TokenBufferMemory:
                         )
                         prompt_message_contents.append(prompt_message)
 
-                    prompt_messages.append(UserPromptMessage(content=prompt_message_contents))
+                    user_prompt_message = UserPromptMessage(content=prompt_message_contents)
+                    # the tokens of files depend on the file upload config of the app, which may change
+                    message_tokens_model = f"{tokens_model}:{len(file_objs)}:{detail.value}"
 
             else:
-                prompt_messages.append(UserPromptMessage(content=message.query))
+                user_prompt_message = UserPromptMessage(content=message.query)
 
-            prompt_messages.append(AssistantPromptMessage(content=message.answer))
+            reuse_token_counts = persist_token_counts and message.memory_tokens_model == message_tokens_model
+            for prompt_message, key in (
+                (user_prompt_message, "memory_query_tokens"),
+                (AssistantPromptMessage(content=message.answer), "memory_answer_tokens"),
+            ):
+                prompt_messages.append(prompt_message)
+                token_counts.append(getattr(message, key) if reuse_token_counts else None)
+                count_keys.append((message, key, message_tokens_model))
 
         if not prompt_messages:
             return []
 
-        # prune the chat message if it exceeds the max token limit
-        curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        uncounted = [index for index, num_tokens in enumerate(token_counts) if num_tokens is None]
+        uncounted_messages = [prompt_messages[index] for index in uncounted]
+        if uncounted and not dify_config.MEMORY_TOKEN_ESTIMATION_ENABLED:
+            # the uncounted messages are counted in one call, they are only counted apart to prune them
+            uncounted_tokens = self._get_num_tokens(uncounted_messages)
+            if sum(num_tokens or 0 for num_tokens in token_counts) + uncounted_tokens <= max_token_limit:
+                return prompt_messages
+            new_counts = [uncounted_tokens] if len(uncounted) == 1 else self._count_each(uncounted_messages)
+        else:
+            new_counts = self._count_each(uncounted_messages)
+
+        for index, num_tokens in zip(uncounted, new_counts):
+            token_counts[index] = num_tokens
+        if persist_token_counts and uncounted:
+            counted_message_ids = {count_keys[index][0].id for index in uncounted}
+            token_updates: dict[str, dict[str, Any]] = {}
+            for (message, key, message_tokens_model), num_tokens in zip(count_keys, token_counts):
+                if message.id in counted_message_ids:
+                    token_updates.setdefault(
+                        message.id, {"id": message.id, "memory_tokens_model": message_tokens_model}
+                    )[key] = num_tokens
+            # reading the history must not commit the pending changes of the caller's session
+            with Session(db.engine) as session:
+                session.execute(update(Message), list(token_updates.values()))
+                session.commit()
+
+        # prune the oldest chat messages while the history exceeds the max token limit
+        counts = cast(list[int], token_counts)
+        curr_message_tokens = sum(counts)
+        start = 0
+        while curr_message_tokens > max_token_limit and start < len(prompt_messages) - 1:
+            curr_message_tokens -= counts[start]
+            start += 1
 
-        if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        return prompt_messages[start:]
 
-        return prompt_messages
+    def _get_num_tokens(self, prompt_messages: list[PromptMessage]) -> int:
+        if dify_config.MEMORY_TOKEN_ESTIMATION_ENABLED:
+            return sum(estimate_num_tokens(prompt_message) for prompt_message in prompt_messages)
+        return self.model_instance.get_llm_num_tokens(prompt_messages)
+
+    def _count_each(self, prompt_messages: list[PromptMessage]) -> list[int]:
+        """
+        Count the tokens of each prompt message, model counts run concurrently.
+        """
+        if dify_config.MEMORY_TOKEN_ESTIMATION_ENABLED or len(prompt_messages) < 2:
+            return [self._get_num_tokens([prompt_message]) for prompt_message in prompt_messages]
+
+        flask_app = current_app._get_current_object()  # type: ignore
+
+        def count(prompt_message: PromptMessage) -> int:
+            with flask_app.app_context():
+                return self._get_num_tokens([prompt_message])
+
+        max_workers = min(len(prompt_messages), dify_config.MEMORY_TOKEN_COUNTING_MAX_WORKERS)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(count, prompt_messages))
+
+    @staticmethod
+    def _get_message_files(message_ids: list[str]) -> dict[str, list[MessageFile]]:
+        files_by_message: dict[str, list[MessageFile]] = defaultdict(list)
+        if message_ids:
+            for file in db.session.query(MessageFile).filter(MessageFile.message_id.in_(message_ids)).all():
+                files_by_message[file.message_id].append(file)
+        return files_by_message
+
+    def _get_file_extra_configs(self, workflow_run_ids: list[Optional[str]]) -> dict[Optional[str], Any]:
+        """
+        Get the file upload configs of messages with files, keyed by workflow run id, or by None for apps
+        without workflow.
+        """
+        if not workflow_run_ids:
+            return {}
+        if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            return {None: FileUploadConfigManager.convert(self.conversation.model_config)}
+
+        run_ids = {run_id for run_id in workflow_run_ids if run_id}
+        if not run_ids:
+            return {}
+        workflow_ids = dict(
+            db.session.query(WorkflowRun.id, WorkflowRun.workflow_id).filter(WorkflowRun.id.in_(run_ids)).all()
+        )
+        workflows = db.session.query(Workflow).filter(Workflow.id.in_(set(workflow_ids.values()))).all()
+        file_extra_configs = {
+            workflow.id: FileUploadConfigManager.convert(workflow.features_dict, is_vision=False)
+            for workflow in workflows
+        }
+        return {run_id: file_extra_configs.get(workflow_id) for run_id, workflow_id in workflow_ids.items()}
 
     def get_history_prompt_text(
         self,
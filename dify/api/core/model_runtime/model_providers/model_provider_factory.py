@@ -8,6 +8,7 @@ from typing import Optional
 from pydantic import BaseModel
 
 import contexts
+from core.helper.plugin_model_cache import plugin_model_cache
 from core.helper.position_helper import get_provider_position_map, sort_to_dict_by_position_map
 from core.model_runtime.entities.model_entities import AIModelEntity, ModelType
 from core.model_runtime.entities.provider_entities import ProviderConfig, ProviderEntity, SimpleProviderEntity
@@ -88,17 +89,24 @@ class ModelProviderFactory:
             if plugin_model_providers is not None:
                 return plugin_model_providers
 
-            plugin_model_providers = []
+            plugin_model_providers = list(
+                plugin_model_cache.get_model_providers(self.tenant_id, self._fetch_plugin_model_providers)
+            )
             contexts.plugin_model_providers.set(plugin_model_providers)
 
-            # Fetch plugin model providers
-            plugin_providers = self.plugin_model_manager.fetch_model_providers(self.tenant_id)
+            return plugin_model_providers
 
-            for provider in plugin_providers:
-                provider.declaration.provider = provider.plugin_id + "/" + provider.declaration.provider
-                plugin_model_providers.append(provider)
+    def _fetch_plugin_model_providers(self) -> list[PluginModelProviderEntity]:
+        """
+        Fetch plugin model providers from the plugin daemon
+        :return: list of plugin model providers
+        """
+        plugin_model_providers = []
+        for provider in self.plugin_model_manager.fetch_model_providers(self.tenant_id):
+            provider.declaration.provider = provider.plugin_id + "/" + provider.declaration.provider
+            plugin_model_providers.append(provider)
 
-            return plugin_model_providers
+        return plugin_model_providers
 
     def get_provider_schema(self, provider: str) -> ProviderEntity:
         """
@@ -222,14 +230,18 @@ class ModelProviderFactory:
             if cache_key in contexts.plugin_model_schemas.get():
                 return contexts.plugin_model_schemas.get()[cache_key]
 
-            schema = self.plugin_model_manager.get_model_schema(
-                tenant_id=self.tenant_id,
-                user_id="unknown",
-                plugin_id=plugin_id,
-                provider=provider_name,
-                model_type=model_type.value,
-                model=model,
-                credentials=credentials or {},
+            schema = plugin_model_cache.get_model_schema(
+                self.tenant_id,
+                cache_key,
+                lambda: self.plugin_model_manager.get_model_schema(
+                    tenant_id=self.tenant_id,
+                    user_id="unknown",
+                    plugin_id=plugin_id,
+                    provider=provider_name,
+                    model_type=model_type.value,
+                    model=model,
+                    credentials=credentials or {},
+                ),
             )
 
             if schema:
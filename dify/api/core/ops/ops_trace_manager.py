@@ -671,6 +671,7 @@ class TraceTask:
             "agent_based": message_data.agent_based,
             "workflow_run_id": message_data.workflow_run_id,
             "from_source": message_data.from_source,
+            "dataset_latencies": timer.get("dataset_latencies"),
         }
 
         dataset_retrieval_trace_info = DatasetRetrievalTraceInfo(
@@ -30,6 +30,7 @@ from core.plugin.impl.exc import (
     PluginPermissionDeniedError,
     PluginUniqueIdentifierError,
 )
+from core.plugin.impl.session import endpoint_of, iter_ndjson_lines, plugin_daemon_session
 
 plugin_daemon_inner_api_baseurl = URL(str(dify_config.PLUGIN_DAEMON_URL))
 
@@ -61,10 +62,17 @@ class BasePluginClient:
             data = json.dumps(data)
 
         try:
-            response = requests.request(
-                method=method, url=str(url), headers=headers, data=data, params=params, stream=stream, files=files
+            response = plugin_daemon_session.request(
+                method=method,
+                url=str(url),
+                endpoint=endpoint_of(method, path),
+                headers=headers,
+                data=data,
+                params=params,
+                stream=stream,
+                files=files,
             )
-        except requests.exceptions.ConnectionError:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             logger.exception("Request to Plugin Daemon Service failed")
             raise PluginDaemonInnerError(code=-500, message="Request to Plugin Daemon Service failed")
 
@@ -83,12 +91,11 @@ class BasePluginClient:
         Make a stream request to the plugin daemon inner API
         """
         response = self._request(method, path, headers, data, params, files, stream=True)
-        for line in response.iter_lines(chunk_size=1024 * 8):
-            line = line.decode("utf-8").strip()
-            if line.startswith("data:"):
-                line = line[5:].strip()
-            if line:
-                yield line
+        try:
+            yield from iter_ndjson_lines(response.iter_content(chunk_size=1024 * 8))
+        finally:
+            # hand the connection back to the pool, also when the consumer stops early
+            response.close()
 
     def _stream_request_with_model(
         self,
@@ -192,14 +199,16 @@ class BasePluginClient:
                 rep = PluginDaemonBasicResponse[type].model_validate_json(line)  # type: ignore
             except (ValueError, TypeError):
                 # TODO modify this when line_data has code and message
+                # lines are bytes, errors must show their text instead of a bytes repr
+                text = line.decode("utf-8", "replace")
                 try:
                     line_data = json.loads(line)
                 except (ValueError, TypeError):
-                    raise ValueError(line)
+                    raise ValueError(text)
                 # If the dictionary contains the `error` key, use its value as the argument
                 # for `ValueError`.
                 # Otherwise, use the `line` to provide better contextual information about the error.
-                raise ValueError(line_data.get("error", line))
+                raise ValueError(line_data.get("error", text) if isinstance(line_data, dict) else text)
 
             if rep.code != 0:
                 if rep.code == -500:
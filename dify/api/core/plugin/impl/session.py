@@ -0,0 +1,113 @@
+import re
+import threading
+import time
+from collections.abc import Generator, Iterable
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from configs import dify_config
+from libs.latency_histogram import LatencyHistogram
+from libs.process_local import ProcessLocal
+
+_ID_SEGMENT_PATTERN = re.compile(r"^(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{24,})$")
+
+
+def endpoint_of(method: str, path: str) -> str:
+    """
+    Name of the endpoint of a request, with tenant and other id segments replaced,
+    e.g. `POST plugin/{id}/dispatch/llm/invoke`
+    """
+    segments = ["{id}" if _ID_SEGMENT_PATTERN.match(segment) else segment for segment in path.strip("/").split("/")]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+class PluginDaemonSession:
+    """
+    Process-wide HTTP session of the plugin daemon clients.
+
+    Requests share a pool of keep-alive connections instead of opening a connection per call,
+    the session is recreated in forked processes. Latencies until the response headers arrive
+    are recorded per endpoint.
+    """
+
+    def __init__(self, max_connections: int, connect_timeout: float, read_timeout: float) -> None:
+        self._max_connections = max_connections
+        self._timeout = (connect_timeout, read_timeout)
+        self._lock = threading.Lock()
+        self._session = ProcessLocal(self._create_session)
+        self._histograms: dict[str, LatencyHistogram] = {}
+
+    def _create_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._max_connections, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def request(self, method: str, url: str, endpoint: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self._timeout)
+        started_at = time.perf_counter()
+        try:
+            return self._session.get().request(method=method, url=url, **kwargs)
+        finally:
+            self._observe(endpoint, time.perf_counter() - started_at)
+
+    def _observe(self, endpoint: str, latency: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            histogram.observe(latency)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            return {endpoint: histogram.to_dict() for endpoint, histogram in self._histograms.items()}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def close(self) -> None:
+        session = self._session.pop()
+        if session is not None:
+            session.close()
+
+
+def iter_ndjson_lines(chunks: Iterable[bytes]) -> Generator[bytes, None, None]:
+    """
+    Split a stream of NDJSON or SSE chunks into non-empty payload lines.
+
+    Works on bytes end to end, the lines are handed as-is to the JSON parser, and a
+    `data:` prefix is stripped for SSE framed streams.
+    """
+    buffer = b""
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer = buffer + chunk if buffer else chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line = _strip_line(buffer[start:end])
+            start = end + 1
+            if line:
+                yield line
+        buffer = buffer[start:]
+    line = _strip_line(buffer)
+    if line:
+        yield line
+
+
+def _strip_line(line: bytes) -> bytes:
+    line = line.strip()
+    if line.startswith(b"data:"):
+        line = line[5:].strip()
+    return line
+
+
+plugin_daemon_session = PluginDaemonSession(
+    max_connections=dify_config.PLUGIN_DAEMON_MAX_CONNECTIONS,
+    connect_timeout=dify_config.PLUGIN_DAEMON_CONNECT_TIMEOUT,
+    read_timeout=dify_config.PLUGIN_DAEMON_READ_TIMEOUT,
+)
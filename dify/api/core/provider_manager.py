@@ -24,6 +24,7 @@ from core.entities.provider_entities import (
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
 from core.helper.position_helper import is_filtered
+from core.helper.provider_configurations_cache import provider_configurations_cache
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -242,6 +243,26 @@ class ProviderManager:
         # Return the encapsulated object
         return provider_configurations
 
+    def get_cached_configurations(self, tenant_id: str) -> ProviderConfigurations:
+        """
+        Get model provider configurations through the per-worker cache.
+
+        Only for callers that read the configurations, e.g. model invocations,
+        the cached objects are shared by all the requests of the worker.
+
+        :param tenant_id: workspace id
+        :return:
+        """
+        version = provider_configurations_cache.get_version(tenant_id)
+        if version is None or not provider_configurations_cache.enabled:
+            return self.get_configurations(tenant_id)
+
+        provider_configurations = provider_configurations_cache.get(tenant_id, version)
+        if provider_configurations is None:
+            provider_configurations = self.get_configurations(tenant_id)
+            provider_configurations_cache.set(tenant_id, version, provider_configurations)
+        return provider_configurations
+
     def get_provider_model_bundle(self, tenant_id: str, provider: str, model_type: ModelType) -> ProviderModelBundle:
         """
         Get provider model bundle.
@@ -250,10 +271,14 @@ class ProviderManager:
         :param model_type: model type
         :return:
         """
-        provider_configurations = self.get_configurations(tenant_id)
+        provider_configurations = self.get_cached_configurations(tenant_id)
 
         # get provider instance
         provider_configuration = provider_configurations.get(provider)
+        if not provider_configuration:
+            # the provider may have been installed since the configurations were cached
+            provider_configurations = self.get_configurations(tenant_id)
+            provider_configuration = provider_configurations.get(provider)
         if not provider_configuration:
             raise ValueError(f"Provider {provider} does not exist.")
 
@@ -536,6 +561,7 @@ class ProviderManager:
                             )
                             db.session.add(new_provider_record)
                             db.session.commit()
+                            provider_configurations_cache.bump_version(tenant_id)
                             provider_name_to_provider_records_dict[provider_name].append(new_provider_record)
                         except IntegrityError:
                             db.session.rollback()
@@ -555,6 +581,7 @@ class ProviderManager:
                             if not existed_provider_record.is_valid:
                                 existed_provider_record.is_valid = True
                                 db.session.commit()
+                                provider_configurations_cache.bump_version(tenant_id)
 
                             provider_name_to_provider_records_dict[provider_name].append(existed_provider_record)
 
@@ -5,7 +5,7 @@ from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.errors.invoke import InvokeAuthorizationError
 from core.rag.data_post_processor.reorder import ReorderRunner
 from core.rag.models.document import Document
-from core.rag.rerank.entity.weight import KeywordSetting, VectorSetting, Weights
+from core.rag.rerank.entity.weight import KeywordScoringMethod, KeywordSetting, VectorSetting, Weights
 from core.rag.rerank.rerank_base import BaseRerankRunner
 from core.rag.rerank.rerank_factory import RerankRunnerFactory
 from core.rag.rerank.rerank_type import RerankMode
@@ -32,9 +32,10 @@ class DataPostProcessor:
         score_threshold: Optional[float] = None,
         top_n: Optional[int] = None,
         user: Optional[str] = None,
+        query_vector: Optional[list[float]] = None,
     ) -> list[Document]:
         if self.rerank_runner:
-            documents = self.rerank_runner.run(query, documents, score_threshold, top_n, user)
+            documents = self.rerank_runner.run(query, documents, score_threshold, top_n, user, query_vector)
 
         if self.reorder_runner:
             documents = self.reorder_runner.run(documents)
@@ -60,6 +61,7 @@ class DataPostProcessor:
                     ),
                     keyword_setting=KeywordSetting(
                         keyword_weight=weights["keyword_setting"]["keyword_weight"],
+                        scoring_method=weights["keyword_setting"].get("scoring_method", KeywordScoringMethod.TF_IDF),
                     ),
                 ),
             )
@@ -1,17 +1,18 @@
-import json
 from collections import defaultdict
 from typing import Any, Optional
 
 from pydantic import BaseModel
+from sqlalchemy.dialects.postgresql import insert
 
-from configs import dify_config
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
+from core.rag.datasource.keyword.keyword_table_cache import KeywordPostings, keyword_table_cache
+from core.rag.datasource.keyword.segment_content_cache import CachedSegmentContent, SegmentContentCache
 from core.rag.models.document import Document
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
-from models.dataset import Dataset, DatasetKeywordTable, DocumentSegment
+from models.dataset import Dataset, DatasetKeywordPosting, DatasetKeywordTable, DocumentSegment
 
 
 class KeywordTableConfig(BaseModel):
@@ -19,87 +20,84 @@ class KeywordTableConfig(BaseModel):
 
 
 class Jieba(BaseKeyword):
+    _POSTINGS_BATCH_SIZE = 1000
+    _MAX_KEYWORD_LENGTH = 255
+
     def __init__(self, dataset: Dataset):
         super().__init__(dataset)
         self._config = KeywordTableConfig()
+        self._segment_content_cache = SegmentContentCache(dataset.id)
 
     def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-            keyword_table = self._get_dataset_keyword_table()
-            for text in texts:
-                keywords = keyword_table_handler.extract_keywords(
-                    text.page_content, self._config.max_keywords_per_chunk
-                )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+        self._ensure_keyword_postings()
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keyword_table: dict[str, set[str]] = {}
+        for text in texts:
+            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata["doc_id"], list(keywords))
 
-            self._save_dataset_keyword_table(keyword_table)
+        self._add_keyword_postings(keyword_table)
 
-            return self
+        return self
 
     def add_texts(self, texts: list[Document], **kwargs):
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-
-            keyword_table = self._get_dataset_keyword_table()
-            keywords_list = kwargs.get("keywords_list")
-            for i in range(len(texts)):
-                text = texts[i]
-                if keywords_list:
-                    keywords = keywords_list[i]
-                    if not keywords:
-                        keywords = keyword_table_handler.extract_keywords(
-                            text.page_content, self._config.max_keywords_per_chunk
-                        )
-                else:
+        self._ensure_keyword_postings()
+        keyword_table_handler = JiebaKeywordTableHandler()
+
+        keyword_table: dict[str, set[str]] = {}
+        keywords_list = kwargs.get("keywords_list")
+        for i in range(len(texts)):
+            text = texts[i]
+            if keywords_list:
+                keywords = keywords_list[i]
+                if not keywords:
                     keywords = keyword_table_handler.extract_keywords(
                         text.page_content, self._config.max_keywords_per_chunk
                     )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+            else:
+                keywords = keyword_table_handler.extract_keywords(
+                    text.page_content, self._config.max_keywords_per_chunk
+                )
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata["doc_id"], list(keywords))
 
-            self._save_dataset_keyword_table(keyword_table)
+        self._add_keyword_postings(keyword_table)
 
     def text_exists(self, id: str) -> bool:
-        keyword_table = self._get_dataset_keyword_table()
-        if keyword_table is None:
-            return False
-        return id in set.union(*keyword_table.values())
+        self._ensure_keyword_postings()
+        posting = (
+            db.session.query(DatasetKeywordPosting.index_node_id)
+            .filter(DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id == id)
+            .first()
+        )
+        return posting is not None
 
     def delete_by_ids(self, ids: list[str]) -> None:
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table = self._get_dataset_keyword_table()
-            if keyword_table is not None:
-                keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
-
-            self._save_dataset_keyword_table(keyword_table)
+        self._ensure_keyword_postings()
+        if not ids:
+            return
+        db.session.query(DatasetKeywordPosting).filter(
+            DatasetKeywordPosting.dataset_id == self.dataset.id, DatasetKeywordPosting.index_node_id.in_(ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        keyword_table_cache.bump_version(self.dataset.id)
+        self._segment_content_cache.delete_many(ids)
 
     def search(self, query: str, **kwargs: Any) -> list[Document]:
-        keyword_table = self._get_dataset_keyword_table()
+        self._ensure_keyword_postings()
 
         k = kwargs.get("top_k", 4)
         document_ids_filter = kwargs.get("document_ids_filter")
-        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table or {}, query, k)
+        sorted_chunk_indices = self._retrieve_ids_by_query(query, k)
+
+        segments = self._get_segment_contents(sorted_chunk_indices, document_ids_filter)
 
         documents = []
         for chunk_index in sorted_chunk_indices:
-            segment_query = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id == chunk_index
-            )
-            if document_ids_filter:
-                segment_query = segment_query.filter(DocumentSegment.document_id.in_(document_ids_filter))
-            segment = segment_query.first()
-
+            segment = segments.get(chunk_index)
             if segment:
                 documents.append(
                     Document(
@@ -115,59 +113,146 @@ class Jieba(BaseKeyword):
 
         return documents
 
+    def _get_segment_contents(
+        self, index_node_ids: list[str], document_ids_filter: Optional[list[str]] = None
+    ) -> dict[str, CachedSegmentContent]:
+        """
+        Hydrate the matched segments from the segment content cache, the misses are
+        loaded with a single query.
+        """
+        segments = self._segment_content_cache.get_many(index_node_ids)
+        if document_ids_filter:
+            segments = {
+                index_node_id: segment
+                for index_node_id, segment in segments.items()
+                if segment.document_id in document_ids_filter
+            }
+
+        missing_ids = [index_node_id for index_node_id in index_node_ids if index_node_id not in segments]
+        if missing_ids:
+            segment_query = db.session.query(DocumentSegment).filter(
+                DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id.in_(missing_ids)
+            )
+            if document_ids_filter:
+                segment_query = segment_query.filter(DocumentSegment.document_id.in_(document_ids_filter))
+            loaded_segments = [
+                CachedSegmentContent(
+                    index_node_id=segment.index_node_id,
+                    index_node_hash=segment.index_node_hash,
+                    document_id=segment.document_id,
+                    dataset_id=segment.dataset_id,
+                    content=segment.content,
+                )
+                for segment in segment_query.all()
+            ]
+            self._segment_content_cache.set_many(loaded_segments)
+            segments.update({segment.index_node_id: segment for segment in loaded_segments})
+
+        return segments
+
     def delete(self) -> None:
         lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
         with redis_client.lock(lock_name, timeout=600):
+            db.session.query(DatasetKeywordPosting).filter(DatasetKeywordPosting.dataset_id == self.dataset.id).delete(
+                synchronize_session=False
+            )
             dataset_keyword_table = self.dataset.dataset_keyword_table
             if dataset_keyword_table:
                 db.session.delete(dataset_keyword_table)
-                db.session.commit()
-                if dataset_keyword_table.data_source_type != "database":
-                    file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
-                    storage.delete(file_key)
-
-    def _save_dataset_keyword_table(self, keyword_table):
-        keyword_table_dict = {
-            "__type__": "keyword_table",
-            "__data__": {"index_id": self.dataset.id, "summary": None, "table": keyword_table},
-        }
-        dataset_keyword_table = self.dataset.dataset_keyword_table
-        keyword_data_source_type = dataset_keyword_table.data_source_type
-        if keyword_data_source_type == "database":
-            dataset_keyword_table.keyword_table = json.dumps(keyword_table_dict, cls=SetEncoder)
             db.session.commit()
-        else:
-            file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
-            if storage.exists(file_key):
-                storage.delete(file_key)
-            storage.save(file_key, json.dumps(keyword_table_dict, cls=SetEncoder).encode("utf-8"))
+            keyword_table_cache.bump_version(self.dataset.id)
+            if dataset_keyword_table and dataset_keyword_table.data_source_type not in {"database", "postings"}:
+                storage.delete(self._keyword_table_file_key())
+
+    def _keyword_table_file_key(self) -> str:
+        return "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
+
+    def _ensure_keyword_postings(self) -> None:
+        """
+        Make sure the dataset keyword index lives in `dataset_keyword_postings`.
+
+        Keyword tables written before the postings index are stored as one JSON blob in the
+        database or in storage, they are imported once. The blob is only dropped after every
+        posting of it is stored, a failed import keeps it and raises.
+        """
+        # the flag is kept per keyword table version, once the index is deleted the row is checked again
+        version = keyword_table_cache.get_version(self.dataset.id)
+        if keyword_table_cache.is_postings_ready(self.dataset.id, version):
+            return
 
-    def _get_dataset_keyword_table(self) -> Optional[dict]:
         dataset_keyword_table = self.dataset.dataset_keyword_table
-        if dataset_keyword_table:
-            keyword_table_dict = dataset_keyword_table.keyword_table_dict
-            if keyword_table_dict:
-                return dict(keyword_table_dict["__data__"]["table"])
-        else:
-            keyword_data_source_type = dify_config.KEYWORD_DATA_SOURCE_TYPE
-            dataset_keyword_table = DatasetKeywordTable(
-                dataset_id=self.dataset.id,
-                keyword_table="",
-                data_source_type=keyword_data_source_type,
+        if dataset_keyword_table and dataset_keyword_table.data_source_type == "postings":
+            keyword_table_cache.mark_postings_ready(self.dataset.id, version)
+            return
+
+        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+        with redis_client.lock(lock_name, timeout=600):
+            dataset_keyword_table = self.dataset.dataset_keyword_table
+            if dataset_keyword_table is None:
+                dataset_keyword_table = DatasetKeywordTable(
+                    dataset_id=self.dataset.id,
+                    keyword_table="",
+                    data_source_type="postings",
+                )
+                db.session.add(dataset_keyword_table)
+                db.session.commit()
+                keyword_table_cache.mark_postings_ready(self.dataset.id, version)
+                return
+            if dataset_keyword_table.data_source_type == "postings":
+                keyword_table_cache.mark_postings_ready(self.dataset.id, version)
+                return
+
+            legacy_data_source_type = dataset_keyword_table.data_source_type
+            keyword_table = self._load_legacy_keyword_table(dataset_keyword_table)
+            self._add_keyword_postings(keyword_table, commit=False)
+            expected_postings = len(self._build_postings(keyword_table))
+            stored_postings = (
+                db.session.query(DatasetKeywordPosting)
+                .filter(DatasetKeywordPosting.dataset_id == self.dataset.id)
+                .count()
             )
-            if keyword_data_source_type == "database":
-                dataset_keyword_table.keyword_table = json.dumps(
-                    {
-                        "__type__": "keyword_table",
-                        "__data__": {"index_id": self.dataset.id, "summary": None, "table": {}},
-                    },
-                    cls=SetEncoder,
+            if stored_postings < expected_postings:
+                db.session.rollback()
+                raise ValueError(
+                    f"Imported {stored_postings} of {expected_postings} keyword postings of dataset "
+                    f"{self.dataset.id}, the legacy keyword table is kept"
                 )
-            db.session.add(dataset_keyword_table)
+            dataset_keyword_table.keyword_table = ""
+            dataset_keyword_table.data_source_type = "postings"
             db.session.commit()
-
+            keyword_table_cache.bump_version(self.dataset.id)
+            keyword_table_cache.mark_postings_ready(self.dataset.id, keyword_table_cache.get_version(self.dataset.id))
+            if legacy_data_source_type != "database" and storage.exists(self._keyword_table_file_key()):
+                storage.delete(self._keyword_table_file_key())
+
+    def _load_legacy_keyword_table(self, dataset_keyword_table: DatasetKeywordTable) -> dict[str, set[str]]:
+        keyword_table_dict = dataset_keyword_table.keyword_table_dict
+        if keyword_table_dict:
+            return dict(keyword_table_dict["__data__"]["table"])
+        if dataset_keyword_table.data_source_type != "database" and storage.exists(self._keyword_table_file_key()):
+            # the file exists but could not be loaded, importing nothing would drop it
+            raise ValueError(f"Failed to load the legacy keyword table of dataset {self.dataset.id}")
         return {}
 
+    def _build_postings(self, keyword_table: dict[str, set[str]]) -> list[dict[str, str]]:
+        return [
+            {"dataset_id": self.dataset.id, "keyword": keyword, "index_node_id": node_id}
+            for keyword, node_ids in keyword_table.items()
+            for node_id in node_ids
+            if len(keyword) <= self._MAX_KEYWORD_LENGTH
+        ]
+
+    def _add_keyword_postings(self, keyword_table: dict[str, set[str]], commit: bool = True) -> None:
+        postings = self._build_postings(keyword_table)
+        for i in range(0, len(postings), self._POSTINGS_BATCH_SIZE):
+            stmt = insert(DatasetKeywordPosting).values(postings[i : i + self._POSTINGS_BATCH_SIZE])
+            db.session.execute(stmt.on_conflict_do_nothing())
+        if commit:
+            db.session.commit()
+            keyword_table_cache.bump_version(self.dataset.id)
+        # the segments may have been re-indexed with a new content
+        self._segment_content_cache.delete_many(list({posting["index_node_id"] for posting in postings}))
+
     def _add_text_to_keyword_table(self, keyword_table: dict, id: str, keywords: list[str]) -> dict:
         for keyword in keywords:
             if keyword not in keyword_table:
@@ -175,32 +260,18 @@ class Jieba(BaseKeyword):
             keyword_table[keyword].add(id)
         return keyword_table
 
-    def _delete_ids_from_keyword_table(self, keyword_table: dict, ids: list[str]) -> dict:
-        # get set of ids that correspond to node
-        node_idxs_to_delete = set(ids)
-
-        # delete node_idxs from keyword to node idxs mapping
-        keywords_to_delete = set()
-        for keyword, node_idxs in keyword_table.items():
-            if node_idxs_to_delete.intersection(node_idxs):
-                keyword_table[keyword] = node_idxs.difference(node_idxs_to_delete)
-                if not keyword_table[keyword]:
-                    keywords_to_delete.add(keyword)
-
-        for keyword in keywords_to_delete:
-            del keyword_table[keyword]
-
-        return keyword_table
-
-    def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
+    def _retrieve_ids_by_query(self, query: str, k: int = 4):
         keyword_table_handler = JiebaKeywordTableHandler()
         keywords = keyword_table_handler.extract_keywords(query)
+        if not keywords:
+            return []
+
+        postings = self._get_keyword_postings(keywords)
 
         # go through text chunks in order of most matching keywords
         chunk_indices_count: dict[str, int] = defaultdict(int)
-        keywords_list = [keyword for keyword in keywords if keyword in set(keyword_table.keys())]
-        for keyword in keywords_list:
-            for node_id in keyword_table[keyword]:
+        for node_ids in postings.values():
+            for node_id in node_ids:
                 chunk_indices_count[node_id] += 1
 
         sorted_chunk_indices = sorted(
@@ -211,6 +282,33 @@ class Jieba(BaseKeyword):
 
         return sorted_chunk_indices[:k]
 
+    def _get_keyword_postings(self, keywords: set[str]) -> dict[str, KeywordPostings]:
+        """
+        Load the postings of the given keywords, served from the per-worker cache for the
+        current keyword table version, only the missing keywords are queried.
+        """
+        version = keyword_table_cache.get_version(self.dataset.id)
+        postings = keyword_table_cache.get_many(self.dataset.id, version, keywords)
+
+        missing_keywords = [keyword for keyword in keywords if keyword not in postings]
+        if missing_keywords:
+            loaded: dict[str, set[str]] = {keyword: set() for keyword in missing_keywords}
+            rows = (
+                db.session.query(DatasetKeywordPosting.keyword, DatasetKeywordPosting.index_node_id)
+                .filter(
+                    DatasetKeywordPosting.dataset_id == self.dataset.id,
+                    DatasetKeywordPosting.keyword.in_(missing_keywords),
+                )
+                .all()
+            )
+            for keyword, node_id in rows:
+                loaded[keyword].add(node_id)
+            loaded_postings = {keyword: frozenset(node_ids) for keyword, node_ids in loaded.items()}
+            keyword_table_cache.set_many(self.dataset.id, version, loaded_postings)
+            postings.update(loaded_postings)
+
+        return postings
+
     def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: list[str]):
         document_segment = (
             db.session.query(DocumentSegment)
@@ -223,37 +321,27 @@ class Jieba(BaseKeyword):
             db.session.commit()
 
     def create_segment_keywords(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
+        self._ensure_keyword_postings()
         self._update_segment_keywords(self.dataset.id, node_id, keywords)
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        self._add_keyword_postings(self._add_text_to_keyword_table({}, node_id, keywords))
 
     def multi_create_segment_keywords(self, pre_segment_data_list: list):
+        self._ensure_keyword_postings()
         keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = self._get_dataset_keyword_table()
+        keyword_table: dict[str, set[str]] = {}
         for pre_segment_data in pre_segment_data_list:
             segment = pre_segment_data["segment"]
             if pre_segment_data["keywords"]:
                 segment.keywords = pre_segment_data["keywords"]
                 keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, pre_segment_data["keywords"]
+                    keyword_table, segment.index_node_id, pre_segment_data["keywords"]
                 )
             else:
                 keywords = keyword_table_handler.extract_keywords(segment.content, self._config.max_keywords_per_chunk)
                 segment.keywords = list(keywords)
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, list(keywords)
-                )
-        self._save_dataset_keyword_table(keyword_table)
+                keyword_table = self._add_text_to_keyword_table(keyword_table, segment.index_node_id, list(keywords))
+        self._add_keyword_postings(keyword_table)
 
     def update_segment_keywords_index(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
-
-
-class SetEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, set):
-            return list(obj)
-        return super().default(obj)
+        self._ensure_keyword_postings()
+        self._add_keyword_postings(self._add_text_to_keyword_table({}, node_id, keywords))
@@ -0,0 +1,53 @@
+import sys
+from typing import Optional
+
+from cachetools import TTLCache
+
+from configs import dify_config
+from libs.versioned_cache import VersionedCache
+
+KeywordPostings = frozenset[str]
+
+
+def _postings_size(postings: KeywordPostings) -> int:
+    return sys.getsizeof(postings) + sum(sys.getsizeof(node_id) for node_id in postings)
+
+
+class KeywordTableCache(VersionedCache):
+    """
+    Per-worker cache of parsed keyword postings.
+
+    Entries are keyed by dataset id, keyword table version and keyword. The version lives in
+    Redis and is bumped by every write to the keyword index, so all workers stop reading stale
+    postings as soon as a write is committed, the TTL only bounds how long unused versions linger.
+    """
+
+    VERSION_KEY = "keyword_table_version:{}"
+
+    def __init__(self, max_bytes: int, ttl: int) -> None:
+        super().__init__(self.VERSION_KEY, max_bytes, ttl, getsizeof=_postings_size)
+        self._ready_datasets: TTLCache = TTLCache(maxsize=10000, ttl=ttl)
+
+    def is_postings_ready(self, dataset_id: str, version: Optional[int]) -> bool:
+        """
+        :param version: current keyword table version, a delete of the index bumps it in every worker
+        """
+        with self._lock:
+            return version is not None and self._ready_datasets.get(dataset_id) == version
+
+    def mark_postings_ready(self, dataset_id: str, version: Optional[int]) -> None:
+        if version is None:
+            return
+        with self._lock:
+            self._ready_datasets[dataset_id] = version
+
+    def clear(self) -> None:
+        super().clear()
+        with self._lock:
+            self._ready_datasets.clear()
+
+
+keyword_table_cache = KeywordTableCache(
+    max_bytes=dify_config.KEYWORD_TABLE_CACHE_MAX_BYTES,
+    ttl=dify_config.KEYWORD_TABLE_CACHE_TTL,
+)
@@ -0,0 +1,70 @@
+import json
+import logging
+from collections.abc import Sequence
+from typing import Optional
+
+from pydantic import BaseModel
+
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class CachedSegmentContent(BaseModel):
+    index_node_id: str
+    index_node_hash: Optional[str] = None
+    document_id: str
+    dataset_id: str
+    content: str
+
+
+class SegmentContentCache:
+    """
+    Read-through Redis cache of segment contents used by keyword search, keyed by index node id.
+
+    Keys of one dataset share a hash tag so multi-key commands stay on one slot in Redis Cluster.
+    Entries are invalidated by the keyword store whenever a segment is re-indexed or removed.
+    """
+
+    CACHE_TTL = 600
+    DELETE_BATCH_SIZE = 1000
+
+    def __init__(self, dataset_id: str):
+        self._dataset_id = dataset_id
+
+    def _cache_key(self, index_node_id: str) -> str:
+        return f"keyword_segment_content:{{{self._dataset_id}}}:{index_node_id}"
+
+    def get_many(self, index_node_ids: Sequence[str]) -> dict[str, CachedSegmentContent]:
+        if not index_node_ids:
+            return {}
+        try:
+            values = redis_client.mget([self._cache_key(index_node_id) for index_node_id in index_node_ids])
+        except Exception:
+            logger.exception("Failed to load segment contents from cache")
+            return {}
+
+        result = {}
+        for index_node_id, value in zip(index_node_ids, values):
+            if value:
+                result[index_node_id] = CachedSegmentContent.model_validate(json.loads(value))
+        return result
+
+    def set_many(self, segments: Sequence[CachedSegmentContent]) -> None:
+        if not segments:
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for segment in segments:
+                pipeline.setex(self._cache_key(segment.index_node_id), self.CACHE_TTL, segment.model_dump_json())
+            pipeline.execute()
+        except Exception:
+            logger.exception("Failed to save segment contents to cache")
+
+    def delete_many(self, index_node_ids: Sequence[str]) -> None:
+        try:
+            for i in range(0, len(index_node_ids), self.DELETE_BATCH_SIZE):
+                batch_ids = index_node_ids[i : i + self.DELETE_BATCH_SIZE]
+                redis_client.delete(*[self._cache_key(index_node_id) for index_node_id in batch_ids])
+        except Exception:
+            logger.exception("Failed to invalidate segment contents in cache")
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from collections.abc import Mapping
+from typing import Any, Optional
+
+from cachetools import LRUCache
+
+from configs import dify_config
+from core.rag.embedding.vector_codec import decode_vector, encode_vector
+from core.rag.models.document import ChildDocument, Document
+from extensions.ext_redis import redis_client
+from libs.versioned_cache import VersionCounter
+
+logger = logging.getLogger(__name__)
+
+
+def _dump_vector(vector: Optional[list[float]]) -> Optional[str]:
+    return base64.b64encode(encode_vector(vector)).decode() if vector else None
+
+
+def _load_vector(data: Optional[str]) -> Optional[list[float]]:
+    return decode_vector(base64.b64decode(data)).tolist() if data else None
+
+
+class RetrievalResultCache:
+    """
+    Opt-in Redis cache of retrieval results of one dataset.
+
+    Keys embed the dataset content version, a Redis counter bumped by every write to the vector
+    and keyword indexes of the dataset, so results are invalidated as soon as documents or
+    segments change. Results are stored as zlib compressed JSON with binary encoded vectors.
+    """
+
+    VERSION_KEY = "dataset_content_version:{}"
+    RESULT_KEY = "retrieval_result:{{{}}}:{}:{}"
+
+    def __init__(self, enabled: bool, ttl: int) -> None:
+        self._versions = VersionCounter(self.VERSION_KEY)
+        self._enabled = enabled
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # per dataset [hits, misses] of this process
+        self._dataset_stats: LRUCache = LRUCache(maxsize=10000)
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def bump_version(self, dataset_id: str) -> None:
+        self._versions.bump(dataset_id)
+
+    def build_key(self, dataset_id: str, params: Mapping[str, Any]) -> Optional[str]:
+        """
+        Build the cache key of a retrieval against the current content version of the dataset,
+        results computed after this call must be stored under this key, not a fresh one.
+        :param dataset_id: dataset id
+        :param params: every parameter affecting the result, query included
+        :return: cache key, None when the cache is disabled or unavailable
+        """
+        if not self._enabled:
+            return None
+        version = self._versions.get(dataset_id)
+        if version is None:
+            return None
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return self.RESULT_KEY.format(dataset_id, version, digest)
+
+    def get(self, dataset_id: str, key: str) -> Optional[list[Document]]:
+        try:
+            value = redis_client.get(key)
+            documents = self._loads(value) if value else None
+        except Exception:
+            logger.exception("Failed to load cached retrieval result of dataset %s", dataset_id)
+            documents = None
+
+        with self._lock:
+            stats = self._dataset_stats.get(dataset_id) or [0, 0]
+            stats[0 if documents is not None else 1] += 1
+            self._dataset_stats[dataset_id] = stats
+        return documents
+
+    def set(self, key: str, documents: list[Document]) -> None:
+        try:
+            redis_client.setex(key, self._ttl, self._dumps(documents))
+        except Exception:
+            # results that do not serialize, e.g. metadata with custom types, are simply not cached
+            logger.exception("Failed to cache retrieval result")
+
+    def stats(self, dataset_id: str) -> dict[str, float]:
+        with self._lock:
+            hits, misses = self._dataset_stats.get(dataset_id) or [0, 0]
+        return self._hit_rate(hits, misses)
+
+    def total_stats(self) -> dict[str, float]:
+        """
+        :return: stats summed over the datasets looked up by this process, most recently used datasets only
+        """
+        with self._lock:
+            dataset_stats = [list(stats) for stats in self._dataset_stats.values()]
+        stats = self._hit_rate(sum(hits for hits, _ in dataset_stats), sum(misses for _, misses in dataset_stats))
+        stats["datasets"] = len(dataset_stats)
+        return stats
+
+    @staticmethod
+    def _hit_rate(hits: int, misses: int) -> dict[str, float]:
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+
+    @staticmethod
+    def _dumps(documents: list[Document]) -> bytes:
+        payload = [
+            {
+                "page_content": document.page_content,
+                "vector": _dump_vector(document.vector),
+                "metadata": document.metadata,
+                "provider": document.provider,
+                "children": [
+                    {
+                        "page_content": child.page_content,
+                        "vector": _dump_vector(child.vector),
+                        "metadata": child.metadata,
+                    }
+                    for child in document.children
+                ]
+                if document.children is not None
+                else None,
+            }
+            for document in documents
+        ]
+        return zlib.compress(json.dumps(payload, ensure_ascii=False).encode())
+
+    @staticmethod
+    def _loads(value: bytes) -> list[Document]:
+        documents = []
+        for item in json.loads(zlib.decompress(value)):
+            children = item.get("children")
+            documents.append(
+                Document(
+                    page_content=item["page_content"],
+                    vector=_load_vector(item.get("vector")),
+                    metadata=item.get("metadata") or {},
+                    provider=item.get("provider"),
+                    children=[
+                        ChildDocument(
+                            page_content=child["page_content"],
+                            vector=_load_vector(child.get("vector")),
+                            metadata=child.get("metadata") or {},
+                        )
+                        for child in children
+                    ]
+                    if children is not None
+                    else None,
+                )
+            )
+        return documents
+
+
+retrieval_result_cache = RetrievalResultCache(
+    enabled=dify_config.RETRIEVAL_RESULT_CACHE_ENABLED,
+    ttl=dify_config.RETRIEVAL_RESULT_CACHE_TTL,
+)
@@ -1,19 +1,19 @@
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Callable
 from typing import Optional
 
 from flask import Flask, current_app
 from sqlalchemy.orm import load_only
 
-from configs import dify_config
 from core.rag.data_post_processor.data_post_processor import DataPostProcessor
 from core.rag.datasource.keyword.keyword_factory import Keyword
-from core.rag.datasource.vdb.vector_factory import Vector
+from core.rag.datasource.retrieval_result_cache import retrieval_result_cache
+from core.rag.datasource.vdb.vector_cache import vector_cache
 from core.rag.embedding.retrieval import RetrievalSegments
 from core.rag.entities.metadata_entities import MetadataCondition
 from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
 from core.rag.rerank.rerank_type import RerankMode
+from core.rag.retrieval.retrieval_executor import search_retrieval_executor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from extensions.ext_database import db
 from models.dataset import ChildChunk, Dataset, DocumentSegment
@@ -50,58 +50,77 @@ class RetrievalService:
         if not dataset:
             return []
 
+        cache_key = retrieval_result_cache.build_key(
+            dataset_id,
+            {
+                "retrieval_method": retrieval_method,
+                "query": query,
+                "top_k": top_k,
+                "score_threshold": score_threshold,
+                "reranking_model": reranking_model,
+                "reranking_mode": reranking_mode,
+                "weights": weights,
+                "document_ids_filter": sorted(document_ids_filter) if document_ids_filter is not None else None,
+            },
+        )
+        if cache_key:
+            cached_documents = retrieval_result_cache.get(dataset_id, cache_key)
+            if cached_documents is not None:
+                return cached_documents
+
+        flask_app = current_app._get_current_object()  # type: ignore
+        # query embeddings computed by the semantic search, keyed by (provider, model), reused by the rerank
+        query_vectors: dict[tuple[str, str], list[float]] = {}
+
+        def search_task(search: Callable[..., None], **kwargs) -> Callable[[], tuple[list[Document], list[str]]]:
+            def run() -> tuple[list[Document], list[str]]:
+                # every search collects into its own lists, so a search finishing after the deadline
+                # cannot alter the results already returned
+                documents: list[Document] = []
+                search_exceptions: list[str] = []
+                search(
+                    flask_app=flask_app,
+                    dataset_id=dataset_id,
+                    query=query,
+                    top_k=top_k,
+                    all_documents=documents,
+                    exceptions=search_exceptions,
+                    document_ids_filter=document_ids_filter,
+                    **kwargs,
+                )
+                return documents, search_exceptions
+
+            return run
+
+        tasks: dict[str, Callable[[], tuple[list[Document], list[str]]]] = {}
+        if retrieval_method == "keyword_search":
+            tasks[f"{dataset_id}:keyword"] = search_task(cls.keyword_search)
+        if RetrievalMethod.is_support_semantic_search(retrieval_method):
+            tasks[f"{dataset_id}:embedding"] = search_task(
+                cls.embedding_search,
+                score_threshold=score_threshold,
+                reranking_model=reranking_model,
+                retrieval_method=retrieval_method,
+                query_vectors=query_vectors,
+            )
+        if RetrievalMethod.is_support_fulltext_search(retrieval_method):
+            tasks[f"{dataset_id}:full_text"] = search_task(
+                cls.full_text_index_search,
+                score_threshold=score_threshold,
+                reranking_model=reranking_model,
+                retrieval_method=retrieval_method,
+            )
+
         all_documents: list[Document] = []
         exceptions: list[str] = []
-
-        # Optimize multithreading with thread pools
-        with ThreadPoolExecutor(max_workers=dify_config.RETRIEVAL_SERVICE_EXECUTORS) as executor:  # type: ignore
-            futures = []
-            if retrieval_method == "keyword_search":
-                futures.append(
-                    executor.submit(
-                        cls.keyword_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        all_documents=all_documents,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
-                )
-            if RetrievalMethod.is_support_semantic_search(retrieval_method):
-                futures.append(
-                    executor.submit(
-                        cls.embedding_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        score_threshold=score_threshold,
-                        reranking_model=reranking_model,
-                        all_documents=all_documents,
-                        retrieval_method=retrieval_method,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
-                )
-            if RetrievalMethod.is_support_fulltext_search(retrieval_method):
-                futures.append(
-                    executor.submit(
-                        cls.full_text_index_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        score_threshold=score_threshold,
-                        reranking_model=reranking_model,
-                        all_documents=all_documents,
-                        retrieval_method=retrieval_method,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
-                )
-            concurrent.futures.wait(futures, timeout=30, return_when=concurrent.futures.ALL_COMPLETED)
+        task_results = search_retrieval_executor.run(tasks)
+        for task_result in task_results:
+            if task_result.error is not None:
+                exceptions.append(str(task_result.error))
+            elif task_result.result is not None:
+                documents, search_exceptions = task_result.result
+                all_documents.extend(documents)
+                exceptions.extend(search_exceptions)
 
         if exceptions:
             raise ValueError(";\n".join(exceptions))
@@ -110,13 +129,23 @@ class RetrievalService:
             data_post_processor = DataPostProcessor(
                 str(dataset.tenant_id), reranking_mode, reranking_model, weights, False
             )
+            query_vector = None
+            if weights:
+                vector_setting = weights["vector_setting"]
+                query_vector = query_vectors.get(
+                    (vector_setting["embedding_provider_name"], vector_setting["embedding_model_name"])
+                )
             all_documents = data_post_processor.invoke(
                 query=query,
                 documents=all_documents,
                 score_threshold=score_threshold,
                 top_n=top_k,
+                query_vector=query_vector,
             )
 
+        # partial results of searches that missed the deadline or were skipped are not cached
+        if cache_key and not any(task_result.timed_out or task_result.skipped for task_result in task_results):
+            retrieval_result_cache.set(cache_key, all_documents)
         return all_documents
 
     @classmethod
@@ -185,6 +214,7 @@ class RetrievalService:
         retrieval_method: str,
         exceptions: list,
         document_ids_filter: Optional[list[str]] = None,
+        query_vectors: Optional[dict[tuple[str, str], list[float]]] = None,
     ):
         with flask_app.app_context():
             try:
@@ -192,9 +222,13 @@ class RetrievalService:
                 if not dataset:
                     raise ValueError("dataset not found")
 
-                vector = Vector(dataset=dataset)
+                vector = vector_cache.get_vector(dataset)
+                query_vector = vector.embed_query(query)
+                if query_vectors is not None:
+                    query_vectors[(str(dataset.embedding_model_provider), str(dataset.embedding_model))] = query_vector
                 documents = vector.search_by_vector(
                     query,
+                    query_vector=query_vector,
                     search_type="similarity_score_threshold",
                     top_k=top_k,
                     score_threshold=score_threshold,
@@ -245,7 +279,7 @@ class RetrievalService:
                 if not dataset:
                     raise ValueError("dataset not found")
 
-                vector_processor = Vector(dataset=dataset)
+                vector_processor = vector_cache.get_vector(dataset)
 
                 documents = vector_processor.search_by_full_text(
                     cls.escape_query_for_search(query), top_k=top_k, document_ids_filter=document_ids_filter
@@ -0,0 +1,267 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Generator, Hashable
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ConnectionPoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the pool timeout."""
+
+
+class _PooledConnection:
+    __slots__ = ("connection", "created_at", "last_used_at")
+
+    def __init__(self, connection: Any) -> None:
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class Psycopg2ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 (DB-API) connections.
+
+    Callers beyond `max_connections` wait up to `timeout` seconds for a connection instead of
+    failing. Connections older than `max_lifetime` are recycled, broken connections are dropped on
+    release, and connections idle for longer than `health_check_interval` are pinged before reuse.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_connections: int,
+        max_connections: int,
+        max_lifetime: float,
+        timeout: float,
+        health_check_interval: float,
+    ) -> None:
+        self._connect = connect
+        self._min_connections = min_connections
+        self._max_connections = max(max_connections, 1)
+        self._max_lifetime = max_lifetime
+        self._timeout = timeout
+        self._health_check_interval = health_check_interval
+        self._condition = threading.Condition()
+        self._idle: deque[_PooledConnection] = deque()
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._created = 0
+        self._recycled = 0
+        for _ in range(min(min_connections, self._max_connections)):
+            self._idle.append(self._open())
+
+    def _open(self) -> _PooledConnection:
+        connection = _PooledConnection(self._connect())
+        with self._condition:
+            self._size += 1
+            self._created += 1
+        return connection
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        try:
+            pooled.connection.close()
+        except Exception:
+            logger.debug("Failed to close pooled connection", exc_info=True)
+        with self._condition:
+            self._size -= 1
+            self._recycled += 1
+            self._condition.notify()
+
+    def _is_expired(self, pooled: _PooledConnection) -> bool:
+        return time.monotonic() - pooled.created_at > self._max_lifetime
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        if pooled.connection.closed:
+            return False
+        if time.monotonic() - pooled.last_used_at < self._health_check_interval:
+            return True
+        try:
+            with pooled.connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            pooled.connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _acquire(self) -> _PooledConnection:
+        deadline = time.monotonic() + self._timeout
+        while True:
+            pooled = None
+            with self._condition:
+                while not self._idle and self._size >= self._max_connections:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ConnectionPoolTimeoutError(
+                            f"No connection available within {self._timeout}s, pool size {self._max_connections}"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._condition.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    pooled = self._idle.pop()
+                else:
+                    # reserve the slot before connecting outside of the lock
+                    self._size += 1
+                self._in_use += 1
+
+            if pooled is None:
+                try:
+                    pooled = _PooledConnection(self._connect())
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self._created += 1
+                return pooled
+
+            if not self._is_expired(pooled) and self._is_healthy(pooled):
+                return pooled
+            with self._condition:
+                self._in_use -= 1
+            self._discard(pooled)
+
+    def _release(self, pooled: _PooledConnection, broken: bool) -> None:
+        with self._condition:
+            self._in_use -= 1
+        if broken or pooled.connection.closed or self._is_expired(pooled):
+            self._discard(pooled)
+            return
+        pooled.last_used_at = time.monotonic()
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self) -> Generator[Any, None, None]:
+        pooled = self._acquire()
+        broken = False
+        try:
+            yield pooled.connection
+        except Exception:
+            broken = bool(pooled.connection.closed)
+            raise
+        finally:
+            if not broken:
+                try:
+                    # never hand over a connection in the middle of a transaction
+                    if pooled.connection.get_transaction_status():
+                        pooled.connection.rollback()
+                except Exception:
+                    broken = True
+            self._release(pooled, broken)
+
+    def stats(self) -> dict[str, int]:
+        with self._condition:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "created": self._created,
+                "recycled": self._recycled,
+                "max_connections": self._max_connections,
+            }
+
+    def close(self) -> None:
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+        for pooled in idle:
+            self._discard(pooled)
+
+
+class ConnectionPoolRegistry:
+    """
+    Process-wide registry of connection pools and clients of the SQL-backed vector stores,
+    keyed by connection config, so all vector instances of one store share their connections.
+
+    The registry is reset in forked processes, connections must not be shared across processes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pools: dict[Hashable, Any] = {}
+        self._pid = os.getpid()
+        # pools inherited from a parent process, kept referenced so their connections are never closed here
+        self._inherited: list[dict[Hashable, Any]] = []
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], T]) -> T:
+        pool = self._pools.get(key) if self._pid == os.getpid() else None
+        if pool is not None:
+            return pool
+        with self._lock:
+            if self._pid != os.getpid():
+                # the parent process still uses the inherited connections, they must not be closed
+                self._inherited.append(self._pools)
+                self._pools = {}
+                self._pid = os.getpid()
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = factory()
+                self._pools[key] = pool
+            return pool
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Pool counters summed per vector store, connection configs are not reported.
+        """
+        with self._lock:
+            pools = list(self._pools.items())
+        result: dict[str, dict[str, int]] = {}
+        for key, pool in pools:
+            store = str(key[0]) if isinstance(key, tuple) else str(key)
+            if isinstance(pool, Psycopg2ConnectionPool):
+                pool_stats = pool.stats()
+            elif hasattr(pool, "pool") and hasattr(pool.pool, "checkedout"):
+                # SQLAlchemy engine
+                pool_stats = {
+                    "size": pool.pool.size(),
+                    "in_use": pool.pool.checkedout(),
+                    "idle": pool.pool.checkedin(),
+                    "overflow": pool.pool.overflow(),
+                }
+            else:
+                continue
+            store_stats = result.setdefault(store, {"pools": 0})
+            store_stats["pools"] += 1
+            for name, value in pool_stats.items():
+                store_stats[name] = store_stats.get(name, 0) + value
+        return result
+
+    def close_all(self) -> None:
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            if isinstance(pool, Psycopg2ConnectionPool):
+                pool.close()
+            elif hasattr(pool, "dispose"):
+                pool.dispose()
+
+
+def create_psycopg2_pool(connect: Callable[[], Any], min_connections: int, max_connections: int):
+    return Psycopg2ConnectionPool(
+        connect,
+        min_connections=min_connections,
+        max_connections=max_connections,
+        max_lifetime=dify_config.VECTOR_STORE_POOL_MAX_LIFETIME,
+        timeout=dify_config.VECTOR_STORE_POOL_TIMEOUT,
+        health_check_interval=dify_config.VECTOR_STORE_POOL_HEALTH_CHECK_INTERVAL,
+    )
+
+
+connection_pool_registry = ConnectionPoolRegistry()
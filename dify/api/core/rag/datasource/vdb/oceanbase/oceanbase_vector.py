@@ -9,6 +9,7 @@ from sqlalchemy import JSON, Column, String, func
 from sqlalchemy.dialects.mysql import LONGTEXT
 
 from configs import dify_config
+from core.rag.datasource.vdb.connection_pool import connection_pool_registry
 from core.rag.datasource.vdb.vector_base import BaseVector
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
@@ -52,11 +53,15 @@ class OceanBaseVector(BaseVector):
         super().__init__(collection_name)
         self._config = config
         self._hnsw_ef_search = -1
-        self._client = ObVecClient(
-            uri=f"{self._config.host}:{self._config.port}",
-            user=self._config.user,
-            password=self._config.password,
-            db_name=self._config.database,
+        # the client owns a SQLAlchemy engine, it is shared by every vector instance of the process
+        self._client = connection_pool_registry.get_or_create(
+            (VectorType.OCEANBASE.value, config.host, config.port, config.database, config.user, config.password),
+            lambda: ObVecClient(
+                uri=f"{config.host}:{config.port}",
+                user=config.user,
+                password=config.password,
+                db_name=config.database,
+            ),
         )
         self._hybrid_search_enabled = self._check_hybrid_search_support()  # Check if hybrid search is supported
 
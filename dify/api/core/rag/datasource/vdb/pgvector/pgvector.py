@@ -1,3 +1,4 @@
+import functools
 import hashlib
 import json
 import logging
@@ -7,10 +8,14 @@ from typing import Any
 
 import psycopg2.errors
 import psycopg2.extras  # type: ignore
-import psycopg2.pool  # type: ignore
 from pydantic import BaseModel, model_validator
 
 from configs import dify_config
+from core.rag.datasource.vdb.connection_pool import (
+    Psycopg2ConnectionPool,
+    connection_pool_registry,
+    create_psycopg2_pool,
+)
 from core.rag.datasource.vdb.vector_base import BaseVector
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
 from core.rag.datasource.vdb.vector_type import VectorType
@@ -83,27 +88,33 @@ class PGVector(BaseVector):
     def get_type(self) -> str:
         return VectorType.PGVECTOR
 
-    def _create_connection_pool(self, config: PGVectorConfig):
-        return psycopg2.pool.SimpleConnectionPool(
-            config.min_connection,
-            config.max_connection,
-            host=config.host,
-            port=config.port,
-            user=config.user,
-            password=config.password,
-            database=config.database,
+    def _create_connection_pool(self, config: PGVectorConfig) -> Psycopg2ConnectionPool:
+        # one pool per process and connection config, shared by every vector instance
+        return connection_pool_registry.get_or_create(
+            (VectorType.PGVECTOR.value, config.host, config.port, config.database, config.user, config.password),
+            lambda: create_psycopg2_pool(
+                functools.partial(
+                    psycopg2.connect,
+                    host=config.host,
+                    port=config.port,
+                    user=config.user,
+                    password=config.password,
+                    database=config.database,
+                ),
+                config.min_connection,
+                config.max_connection,
+            ),
         )
 
     @contextmanager
     def _get_cursor(self):
-        conn = self.pool.getconn()
-        cur = conn.cursor()
-        try:
-            yield cur
-        finally:
-            cur.close()
-            conn.commit()
-            self.pool.putconn(conn)
+        with self.pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+                conn.commit()
 
     def create(self, texts: list[Document], embeddings: list[list[float]], **kwargs):
         dimension = len(embeddings[0])
@@ -9,6 +9,7 @@ from sqlalchemy import text as sql_text
 from sqlalchemy.orm import Session, declarative_base
 
 from configs import dify_config
+from core.rag.datasource.vdb.connection_pool import connection_pool_registry
 from core.rag.datasource.vdb.field import Field
 from core.rag.datasource.vdb.vector_base import BaseVector
 from core.rag.datasource.vdb.vector_factory import AbstractVectorFactory
@@ -78,7 +79,16 @@ class TiDBVector(BaseVector):
             f"ssl_verify_cert=true&ssl_verify_identity=true&program_name={config.program_name}"
         )
         self._distance_func = distance_func.lower()
-        self._engine = create_engine(self._url)
+        # one engine, and so one connection pool, per process and connection config
+        self._engine = connection_pool_registry.get_or_create(
+            (VectorType.TIDB_VECTOR.value, config.host, config.port, config.database, config.user, config.password),
+            lambda: create_engine(
+                self._url,
+                pool_pre_ping=True,
+                pool_recycle=dify_config.VECTOR_STORE_POOL_MAX_LIFETIME,
+                pool_timeout=dify_config.VECTOR_STORE_POOL_TIMEOUT,
+            ),
+        )
         self._orm_base = declarative_base()
         self._dimension = 1536
 
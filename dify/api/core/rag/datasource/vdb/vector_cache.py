@@ -0,0 +1,158 @@
+import hashlib
+import logging
+import threading
+import time
+from collections.abc import Callable, Hashable
+from typing import TYPE_CHECKING, Any, Optional, TypeVar
+
+from cachetools import TTLCache
+
+from configs import dify_config
+from core.helper.provider_configurations_cache import provider_configurations_cache
+from core.model_manager import ModelManager
+from core.model_runtime.entities.model_entities import ModelType
+from core.rag.datasource.vdb.vector_type import VectorType
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from models.dataset import Dataset
+
+if TYPE_CHECKING:
+    from core.rag.datasource.vdb.vector_factory import Vector
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class VectorCache:
+    """
+    Per-worker cache of ready-to-use `Vector` and `CacheEmbedding` objects.
+
+    Building them resolves the provider configurations, the model credentials and the vector
+    store client, which costs several queries per retrieval. Vectors are keyed by dataset id,
+    embedding model and index struct, so changing the embedding settings or re-creating the index
+    of a dataset misses the old entry. Both are keyed by the provider configurations version of the
+    tenant as well, so changed credentials are not used once the version is bumped. Indexing builds
+    its own vectors and embeddings.
+
+    Cached vectors are shared across threads, so only vectors of the stores whose clients are
+    pooled by the connection pool registry are cached, other stores share the embeddings only.
+    """
+
+    CACHED_VECTOR_TYPES = frozenset({VectorType.PGVECTOR, VectorType.OPENGAUSS, VectorType.VASTBASE})
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self._lock = threading.Lock()
+        self._vectors: TTLCache = TTLCache(maxsize=maxsize or 1, ttl=ttl)
+        self._embeddings: TTLCache = TTLCache(maxsize=maxsize or 1, ttl=ttl)
+        self._enabled = maxsize > 0
+        self._hits = 0
+        self._misses = 0
+        self._constructions = 0
+        self._construction_seconds = 0.0
+
+    @staticmethod
+    def _vector_key(dataset: Dataset) -> tuple:
+        index_struct_version = hashlib.sha256((dataset.index_struct or "").encode()).hexdigest()
+        return (
+            dataset.id,
+            dataset.tenant_id,
+            dataset.embedding_model_provider,
+            dataset.embedding_model,
+            index_struct_version,
+        )
+
+    def _get_or_create(self, cache: TTLCache, key: Optional[Hashable], factory: Callable[[], T]) -> T:
+        """
+        :param key: key of the value, None to construct the value without caching it
+        """
+        if self._enabled and key is not None:
+            with self._lock:
+                value = cache.get(key)
+                if value is not None:
+                    self._hits += 1
+                    return value
+                self._misses += 1
+
+        started_at = time.perf_counter()
+        value = factory()
+        elapsed = time.perf_counter() - started_at
+        logger.debug("Constructed %s in %.3fs", type(value).__name__, elapsed)
+
+        with self._lock:
+            self._constructions += 1
+            self._construction_seconds += elapsed
+            if self._enabled and key is not None:
+                cache[key] = value
+        return value
+
+    def get_vector(self, dataset: Dataset) -> "Vector":
+        """
+        Get a vector of an indexed dataset, for searches only: a dataset without index struct is
+        not cached since building its vector may still pick and record the vector store.
+        """
+        from core.rag.datasource.vdb.vector_factory import Vector
+
+        if not dataset.index_struct:
+            return Vector(dataset=dataset)
+        # without a version the cache is bypassed, like the provider configurations cache does
+        version = provider_configurations_cache.get_version(dataset.tenant_id)
+        if version is None:
+            return Vector(dataset=dataset)
+
+        def create() -> "Vector":
+            embeddings = self._get_embeddings(
+                dataset.tenant_id, dataset.embedding_model_provider, dataset.embedding_model, version
+            )
+            return Vector(dataset=dataset, embeddings=embeddings)
+
+        if dataset.index_struct_dict.get("type") not in self.CACHED_VECTOR_TYPES:
+            return self._get_or_create(self._vectors, None, create)
+        return self._get_or_create(self._vectors, (*self._vector_key(dataset), version), create)
+
+    def get_embeddings(self, tenant_id: str, provider: str, model: str) -> CacheEmbedding:
+        """
+        Get the embeddings of a model for retrieval, e.g. the query embeddings of the weighted rerank
+        """
+        return self._get_embeddings(tenant_id, provider, model, provider_configurations_cache.get_version(tenant_id))
+
+    def _get_embeddings(self, tenant_id: str, provider: str, model: str, version: Optional[int]) -> CacheEmbedding:
+        def create() -> CacheEmbedding:
+            model_instance = ModelManager().get_model_instance(
+                tenant_id=tenant_id,
+                provider=provider,
+                model_type=ModelType.TEXT_EMBEDDING,
+                model=model,
+            )
+            return CacheEmbedding(model_instance)
+
+        key = None if version is None else (tenant_id, provider, model, version)
+        return self._get_or_create(self._embeddings, key, create)
+
+    def invalidate_dataset(self, dataset_id: str) -> None:
+        with self._lock:
+            for key in [key for key in self._vectors if key[0] == dataset_id]:
+                self._vectors.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "vectors": len(self._vectors),
+                "embeddings": len(self._embeddings),
+                "constructions": self._constructions,
+                "construction_seconds": self._construction_seconds,
+                "avg_construction_seconds": self._construction_seconds / self._constructions
+                if self._constructions
+                else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors.clear()
+            self._embeddings.clear()
+
+
+vector_cache = VectorCache(maxsize=dify_config.VECTOR_CACHE_MAX_SIZE, ttl=dify_config.VECTOR_CACHE_TTL)
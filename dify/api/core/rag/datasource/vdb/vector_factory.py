@@ -4,7 +4,9 @@ from typing import Any, Optional
 from configs import dify_config
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
+from core.rag.datasource.retrieval_result_cache import retrieval_result_cache
 from core.rag.datasource.vdb.vector_base import BaseVector
+from core.rag.datasource.vdb.vector_cache import vector_cache
 from core.rag.datasource.vdb.vector_type import VectorType
 from core.rag.embedding.cached_embedding import CacheEmbedding
 from core.rag.embedding.embedding_base import Embeddings
@@ -26,24 +28,28 @@ class AbstractVectorFactory(ABC):
 
 
 class Vector:
-    def __init__(self, dataset: Dataset, attributes: Optional[list] = None):
+    def __init__(self, dataset: Dataset, attributes: Optional[list] = None, embeddings: Optional[Embeddings] = None):
         if attributes is None:
             attributes = ["doc_id", "dataset_id", "document_id", "doc_hash"]
-        self._dataset = dataset
-        self._embeddings = self._get_embeddings()
+        # plain values only, vectors of some stores are cached and shared across requests
+        self._dataset_id = dataset.id
+        self._tenant_id = dataset.tenant_id
+        self._embedding_model_provider = dataset.embedding_model_provider
+        self._embedding_model = dataset.embedding_model
+        self._embeddings = embeddings or self._get_embeddings()
         self._attributes = attributes
-        self._vector_processor = self._init_vector()
+        self._vector_processor = self._init_vector(dataset)
 
-    def _init_vector(self) -> BaseVector:
+    def _init_vector(self, dataset: Dataset) -> BaseVector:
         vector_type = dify_config.VECTOR_STORE
 
-        if self._dataset.index_struct_dict:
-            vector_type = self._dataset.index_struct_dict["type"]
+        if dataset.index_struct_dict:
+            vector_type = dataset.index_struct_dict["type"]
         else:
             if dify_config.VECTOR_STORE_WHITELIST_ENABLE:
                 whitelist = (
                     db.session.query(Whitelist)
-                    .filter(Whitelist.tenant_id == self._dataset.tenant_id, Whitelist.category == "vector_db")
+                    .filter(Whitelist.tenant_id == self._tenant_id, Whitelist.category == "vector_db")
                     .one_or_none()
                 )
                 if whitelist:
@@ -53,7 +59,7 @@ class Vector:
             raise ValueError("Vector store must be specified.")
 
         vector_factory_cls = self.get_vector_factory(vector_type)
-        return vector_factory_cls().init_vector(self._dataset, self._attributes, self._embeddings)
+        return vector_factory_cls().init_vector(dataset, self._attributes, self._embeddings)
 
     @staticmethod
     def get_vector_factory(vector_type: str) -> type[AbstractVectorFactory]:
@@ -171,6 +177,7 @@ class Vector:
         if texts:
             embeddings = self._embeddings.embed_documents([document.page_content for document in texts])
             self._vector_processor.create(texts=texts, embeddings=embeddings, **kwargs)
+            retrieval_result_cache.bump_version(self._dataset_id)
 
     def add_texts(self, documents: list[Document], **kwargs):
         if kwargs.get("duplicate_check", False):
@@ -178,18 +185,25 @@ class Vector:
 
         embeddings = self._embeddings.embed_documents([document.page_content for document in documents])
         self._vector_processor.create(texts=documents, embeddings=embeddings, **kwargs)
+        retrieval_result_cache.bump_version(self._dataset_id)
 
     def text_exists(self, id: str) -> bool:
         return self._vector_processor.text_exists(id)
 
     def delete_by_ids(self, ids: list[str]) -> None:
         self._vector_processor.delete_by_ids(ids)
+        retrieval_result_cache.bump_version(self._dataset_id)
 
     def delete_by_metadata_field(self, key: str, value: str) -> None:
         self._vector_processor.delete_by_metadata_field(key, value)
+        retrieval_result_cache.bump_version(self._dataset_id)
 
-    def search_by_vector(self, query: str, **kwargs: Any) -> list[Document]:
-        query_vector = self._embeddings.embed_query(query)
+    def embed_query(self, query: str) -> list[float]:
+        return self._embeddings.embed_query(query)
+
+    def search_by_vector(self, query: str, query_vector: Optional[list[float]] = None, **kwargs: Any) -> list[Document]:
+        if query_vector is None:
+            query_vector = self._embeddings.embed_query(query)
         return self._vector_processor.search_by_vector(query_vector, **kwargs)
 
     def search_by_full_text(self, query: str, **kwargs: Any) -> list[Document]:
@@ -197,6 +211,8 @@ class Vector:
 
     def delete(self) -> None:
         self._vector_processor.delete()
+        retrieval_result_cache.bump_version(self._dataset_id)
+        vector_cache.invalidate_dataset(self._dataset_id)
         # delete collection redis cache
         if self._vector_processor.collection_name:
             collection_exist_cache_key = "vector_indexing_{}".format(self._vector_processor.collection_name)
@@ -206,10 +222,10 @@ class Vector:
         model_manager = ModelManager()
 
         embedding_model = model_manager.get_model_instance(
-            tenant_id=self._dataset.tenant_id,
-            provider=self._dataset.embedding_model_provider,
+            tenant_id=self._tenant_id,
+            provider=self._embedding_model_provider,
             model_type=ModelType.TEXT_EMBEDDING,
-            model=self._dataset.embedding_model,
+            model=self._embedding_model,
         )
         return CacheEmbedding(embedding_model)
 
@@ -3,7 +3,10 @@ import logging
 from typing import Any, Optional, cast
 
 import numpy as np
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from configs import dify_config
 from core.entities.embedding_type import EmbeddingInputType
@@ -11,6 +14,8 @@ from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.embedding.embedding_base import Embeddings
+from core.rag.embedding.embedding_cache import EmbeddingCacheKey, document_embedding_cache
+from core.rag.embedding.vector_codec import decode_vector, encode_vector, is_encoded_vector
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from libs import helper
@@ -25,31 +30,41 @@ class CacheEmbedding(Embeddings):
         self._user = user
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        """Embed search docs in batches of 10."""
-        # use doc embedding cache or store if not exists
-        text_embeddings: list[Any] = [None for _ in range(len(texts))]
-        embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
-            else:
-                embedding_queue_indices.append(i)
-        if embedding_queue_indices:
-            embedding_queue_texts = [texts[i] for i in embedding_queue_indices]
-            embedding_queue_embeddings = []
+        """
+        Embed search docs.
+
+        Embeddings are looked up tier by tier: the process-local LRU cache first, then the
+        `embeddings` table with one bulk query per batch of hashes, and only the remaining
+        texts are sent to the model. New embeddings are written back with a bulk upsert.
+        """
+        provider_name = self._model_instance.provider
+        model_name = self._model_instance.model
+        text_hashes = [helper.generate_text_hash(text) for text in texts]
+        cache_keys = [document_embedding_cache.build_key(provider_name, model_name, h) for h in text_hashes]
+        unique_keys = list(dict.fromkeys(cache_keys))
+
+        # tier 1: process-local cache
+        resolved: dict[EmbeddingCacheKey, np.ndarray] = document_embedding_cache.get_many(unique_keys)
+        document_embedding_cache.stats.incr("local", len(resolved))
+
+        # tier 2: embeddings table, one bulk query per batch
+        missing_keys = [key for key in unique_keys if key not in resolved]
+        if missing_keys:
+            db_embeddings = self._load_cached_embeddings([key[2] for key in missing_keys])
+            db_resolved = {key: db_embeddings[key[2]] for key in missing_keys if db_embeddings.get(key[2]) is not None}
+            document_embedding_cache.put_many(db_resolved)
+            document_embedding_cache.stats.incr("database", len(db_resolved))
+            resolved.update(db_resolved)
+            missing_keys = [key for key in missing_keys if key not in resolved]
+
+        # tier 3: embedding model
+        if missing_keys:
+            text_by_key = dict(zip(cache_keys, texts))
+            embedding_queue_texts = [text_by_key[key] for key in missing_keys]
+            new_embeddings: dict[EmbeddingCacheKey, np.ndarray] = {}
             try:
                 model_type_instance = cast(TextEmbeddingModel, self._model_instance.model_type_instance)
-                model_schema = model_type_instance.get_model_schema(
-                    self._model_instance.model, self._model_instance.credentials
-                )
+                model_schema = model_type_instance.get_model_schema(model_name, self._model_instance.credentials)
                 max_chunks = (
                     model_schema.model_properties[ModelPropertyKey.MAX_CHUNKS]
                     if model_schema and ModelPropertyKey.MAX_CHUNKS in model_schema.model_properties
@@ -57,49 +72,109 @@ class CacheEmbedding(Embeddings):
                 )
                 for i in range(0, len(embedding_queue_texts), max_chunks):
                     batch_texts = embedding_queue_texts[i : i + max_chunks]
+                    batch_keys = missing_keys[i : i + max_chunks]
 
                     embedding_result = self._model_instance.invoke_text_embedding(
                         texts=batch_texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
                     )
 
-                    for vector in embedding_result.embeddings:
+                    for key, vector in zip(batch_keys, embedding_result.embeddings):
                         try:
-                            # FIXME: type ignore for numpy here
-                            normalized_embedding = (vector / np.linalg.norm(vector)).tolist()  # type: ignore
+                            vector_array = np.asarray(vector, dtype=np.float64)
+                            normalized_embedding = vector_array / np.linalg.norm(vector_array)
                             # stackoverflow best way: https://stackoverflow.com/questions/20319813/how-to-check-list-containing-nan
                             if np.isnan(normalized_embedding).any():
                                 # for issue #11827  float values are not json compliant
                                 logger.warning(f"Normalized embedding is nan: {normalized_embedding}")
                                 continue
-                            embedding_queue_embeddings.append(normalized_embedding)
-                        except IntegrityError:
-                            db.session.rollback()
+                            new_embeddings[key] = normalized_embedding
                         except Exception:
                             logging.exception("Failed transform embedding")
-                cache_embeddings = []
-                try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+                document_embedding_cache.stats.incr("model", len(new_embeddings))
+                resolved.update(new_embeddings)
+                self._save_cached_embeddings({key[2]: vector for key, vector in new_embeddings.items()})
+                document_embedding_cache.put_many(new_embeddings)
             except Exception as ex:
                 db.session.rollback()
                 logger.exception("Failed to embed documents: %s")
                 raise ex
 
+        text_embeddings: list[Any] = []
+        for key in cache_keys:
+            vector = resolved.get(key)
+            text_embeddings.append(vector.tolist() if vector is not None else None)
         return text_embeddings
 
+    def _load_cached_embeddings(self, text_hashes: list[str]) -> dict[str, np.ndarray]:
+        """Load stored embeddings of the given hashes, one `IN (...)` query per batch."""
+        embeddings: dict[str, np.ndarray] = {}
+        batch_size = dify_config.EMBEDDING_CACHE_QUERY_BATCH_SIZE
+        for i in range(0, len(text_hashes), batch_size):
+            batch_hashes = text_hashes[i : i + batch_size]
+            rows = (
+                db.session.query(Embedding)
+                .filter(
+                    Embedding.model_name == self._model_instance.model,
+                    Embedding.provider_name == self._model_instance.provider,
+                    Embedding.hash.in_(batch_hashes),
+                )
+                .all()
+            )
+            legacy_rows = []
+            for row in rows:
+                embeddings[row.hash] = row.get_embedding_array()
+                if row.is_legacy_format:
+                    legacy_rows.append(row)
+            if legacy_rows:
+                self._migrate_legacy_embeddings(legacy_rows, embeddings)
+        return embeddings
+
+    @staticmethod
+    def _migrate_legacy_embeddings(rows: list[Embedding], embeddings: dict[str, np.ndarray]) -> None:
+        """Lazily rewrite pickled rows in the binary vector format the first time they are read."""
+        storage_format = dify_config.EMBEDDING_STORAGE_FORMAT
+        values = [{"id": row.id, "embedding": encode_vector(embeddings[row.hash], storage_format)} for row in rows]
+        try:
+            # reading the cache must not commit or discard the pending changes of the caller's session
+            with Session(db.engine) as session:
+                session.execute(update(Embedding), values)
+                session.commit()
+        except Exception:
+            logger.exception("Failed to migrate legacy embeddings")
+
+    def _save_cached_embeddings(self, embeddings: dict[str, np.ndarray]) -> None:
+        """Bulk upsert new embeddings, rows written concurrently by another worker are kept as is."""
+        if not embeddings:
+            return
+        rows = []
+        for text_hash, vector in embeddings.items():
+            embedding_cache = Embedding(
+                model_name=self._model_instance.model,
+                hash=text_hash,
+                provider_name=self._model_instance.provider,
+            )
+            embedding_cache.set_embedding(vector)
+            rows.append(
+                {
+                    "model_name": embedding_cache.model_name,
+                    "hash": embedding_cache.hash,
+                    "provider_name": embedding_cache.provider_name,
+                    "embedding": embedding_cache.embedding,
+                }
+            )
+        try:
+            batch_size = dify_config.EMBEDDING_CACHE_QUERY_BATCH_SIZE
+            for i in range(0, len(rows), batch_size):
+                stmt = (
+                    insert(Embedding)
+                    .values(rows[i : i + batch_size])
+                    .on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+                )
+                db.session.execute(stmt)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+
     def embed_query(self, text: str) -> list[float]:
         """Embed query text."""
         # use doc embedding cache or store if not exists
@@ -108,8 +183,10 @@ class CacheEmbedding(Embeddings):
         embedding = redis_client.get(embedding_cache_key)
         if embedding:
             redis_client.expire(embedding_cache_key, 600)
-            decoded_embedding = np.frombuffer(base64.b64decode(embedding), dtype="float")
-            return [float(x) for x in decoded_embedding]
+            if is_encoded_vector(embedding):
+                return cast(list[float], decode_vector(embedding).tolist())
+            # entries written before the binary vector format are base64 encoded float64 bytes
+            return cast(list[float], np.frombuffer(base64.b64decode(embedding), dtype="float").tolist())
         try:
             embedding_result = self._model_instance.invoke_text_embedding(
                 texts=[text], user=self._user, input_type=EmbeddingInputType.QUERY
@@ -126,14 +203,8 @@ class CacheEmbedding(Embeddings):
             raise ex
 
         try:
-            # encode embedding to base64
-            embedding_vector = np.array(embedding_results)
-            vector_bytes = embedding_vector.tobytes()
-            # Transform to Base64
-            encoded_vector = base64.b64encode(vector_bytes)
-            # Transform to string
-            encoded_str = encoded_vector.decode("utf-8")
-            redis_client.setex(embedding_cache_key, 600, encoded_str)
+            encoded_vector = encode_vector(embedding_results, dify_config.EMBEDDING_STORAGE_FORMAT)
+            redis_client.setex(embedding_cache_key, 600, encoded_vector)
         except Exception as ex:
             if dify_config.DEBUG:
                 logging.exception(f"Failed to add embedding to redis for the text '{text[:10]}...({len(text)} chars)'")
@@ -0,0 +1,90 @@
+import threading
+from collections.abc import Iterable, Mapping
+from typing import Optional
+
+import numpy as np
+from cachetools import LRUCache
+
+from configs import dify_config
+
+EmbeddingCacheKey = tuple[str, str, str]
+
+
+class EmbeddingCacheStats:
+    """
+    Per-tier lookup counters of the document embedding cache.
+    """
+
+    TIERS = ("local", "database", "model")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = dict.fromkeys(self.TIERS, 0)
+
+    def incr(self, tier: str, count: int = 1) -> None:
+        if count <= 0:
+            return
+        with self._lock:
+            self._counters[tier] += count
+
+    def snapshot(self) -> dict[str, float]:
+        """
+        Return the hit counters of every tier and the hit rate of the cache tiers.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+        total = sum(counters.values())
+        result: dict[str, float] = {f"{tier}_hits": float(count) for tier, count in counters.items()}
+        result["total"] = float(total)
+        result["local_hit_rate"] = counters["local"] / total if total else 0.0
+        result["database_hit_rate"] = counters["database"] / total if total else 0.0
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = dict.fromkeys(self.TIERS, 0)
+
+
+class DocumentEmbeddingCache:
+    """
+    Process-local LRU cache of decoded document embeddings.
+
+    It sits in front of the `embeddings` table so repeated indexing of the same chunks
+    (re-index, segment edits, duplicated documents) does not hit the database at all.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self._lock = threading.Lock()
+        self._cache: LRUCache = LRUCache(maxsize=capacity)
+        self.stats = EmbeddingCacheStats()
+
+    @staticmethod
+    def build_key(provider_name: str, model_name: str, text_hash: str) -> EmbeddingCacheKey:
+        return provider_name, model_name, text_hash
+
+    def get_many(self, keys: Iterable[EmbeddingCacheKey]) -> dict[EmbeddingCacheKey, np.ndarray]:
+        found: dict[EmbeddingCacheKey, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                vector: Optional[np.ndarray] = self._cache.get(key)
+                if vector is not None:
+                    found[key] = vector
+        return found
+
+    def put_many(self, items: Mapping[EmbeddingCacheKey, np.ndarray]) -> None:
+        if self._cache.maxsize <= 0:
+            return
+        with self._lock:
+            for key, vector in items.items():
+                self._cache[key] = vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+        self.stats.reset()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+document_embedding_cache = DocumentEmbeddingCache(capacity=dify_config.EMBEDDING_LOCAL_CACHE_SIZE)
@@ -0,0 +1,111 @@
+"""
+Compact, versioned binary encoding of embedding vectors.
+
+Layout (little endian)::
+
+    magic (4 bytes, b"DVEC") | version (uint8) | dtype code (uint8) | reserved (uint16) | dimension (uint32)
+    | scale (float32, int8 only) | payload
+
+float32 and float16 payloads decode zero-copy with `np.frombuffer`, int8 payloads are
+symmetrically quantized and are rescaled on decode.
+"""
+
+import pickle
+import struct
+from collections.abc import Sequence
+from enum import StrEnum
+from typing import Union, cast
+
+import numpy as np
+
+MAGIC = b"DVEC"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sBBHI")
+_SCALE = struct.Struct("<f")
+
+
+class VectorStorageFormat(StrEnum):
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT8 = "int8"
+
+
+_DTYPE_CODES: dict[VectorStorageFormat, int] = {
+    VectorStorageFormat.FLOAT32: 1,
+    VectorStorageFormat.FLOAT16: 2,
+    VectorStorageFormat.INT8: 3,
+}
+_CODE_FORMATS = {code: storage_format for storage_format, code in _DTYPE_CODES.items()}
+_NUMPY_DTYPES: dict[VectorStorageFormat, str] = {
+    VectorStorageFormat.FLOAT32: "<f4",
+    VectorStorageFormat.FLOAT16: "<f2",
+    VectorStorageFormat.INT8: "i1",
+}
+
+
+class VectorCodecError(ValueError):
+    pass
+
+
+def is_encoded_vector(data: bytes) -> bool:
+    return bytes(data[: len(MAGIC)]) == MAGIC
+
+
+def encode_vector(
+    vector: Union[Sequence[float], np.ndarray],
+    storage_format: Union[VectorStorageFormat, str] = VectorStorageFormat.FLOAT32,
+) -> bytes:
+    """
+    Encode a vector into the compact binary format.
+    :param vector: embedding vector
+    :param storage_format: float32, float16 or int8
+    :return: encoded bytes
+    """
+    storage_format = VectorStorageFormat(storage_format)
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    header = _HEADER.pack(MAGIC, VERSION, _DTYPE_CODES[storage_format], 0, array.shape[0])
+
+    if storage_format == VectorStorageFormat.INT8:
+        max_abs = float(np.max(np.abs(array))) if array.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+        return header + _SCALE.pack(scale) + quantized.tobytes()
+
+    return header + array.astype(_NUMPY_DTYPES[storage_format]).tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """
+    Decode a vector from the compact binary format.
+    float32 and float16 payloads are returned as read-only views over `data`.
+    :param data: encoded bytes
+    :return: numpy array
+    """
+    if len(data) < _HEADER.size or not is_encoded_vector(data):
+        raise VectorCodecError("Data is not an encoded vector")
+
+    _, version, dtype_code, _, dimension = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise VectorCodecError(f"Unsupported vector encoding version: {version}")
+    if dtype_code not in _CODE_FORMATS:
+        raise VectorCodecError(f"Unsupported vector dtype code: {dtype_code}")
+
+    storage_format = _CODE_FORMATS[dtype_code]
+    offset = _HEADER.size
+    if storage_format == VectorStorageFormat.INT8:
+        (scale,) = _SCALE.unpack_from(data, offset)
+        offset += _SCALE.size
+        quantized = np.frombuffer(data, dtype=_NUMPY_DTYPES[storage_format], count=dimension, offset=offset)
+        return quantized.astype(np.float32) * np.float32(scale)
+
+    return np.frombuffer(data, dtype=_NUMPY_DTYPES[storage_format], count=dimension, offset=offset)
+
+
+def decode_stored_vector(data: bytes) -> np.ndarray:
+    """
+    Decode a stored vector, falling back to the legacy pickled float list.
+    """
+    if is_encoded_vector(data):
+        return decode_vector(data)
+    return np.asarray(cast(list[float], pickle.loads(data)), dtype=np.float64)  # noqa: S301
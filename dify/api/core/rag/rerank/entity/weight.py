@@ -1,6 +1,13 @@
+from enum import StrEnum
+
 from pydantic import BaseModel
 
 
+class KeywordScoringMethod(StrEnum):
+    TF_IDF = "tf_idf"
+    BM25 = "bm25"
+
+
 class VectorSetting(BaseModel):
     vector_weight: float
 
@@ -12,6 +19,8 @@ class VectorSetting(BaseModel):
 class KeywordSetting(BaseModel):
     keyword_weight: float
 
+    scoring_method: KeywordScoringMethod = KeywordScoringMethod.TF_IDF
+
 
 class Weights(BaseModel):
     """Model for weighted rerank."""
@@ -0,0 +1,155 @@
+from collections.abc import Sequence
+from typing import Optional
+
+import numpy as np
+
+from core.rag.datasource.keyword.jieba.jieba import KeywordTableConfig
+from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.models.document import Document
+from core.rag.rerank.entity.weight import KeywordScoringMethod
+from extensions.ext_database import db
+from models.dataset import DocumentSegment
+
+
+class KeywordTermMatrix:
+    """
+    Sparse binary term matrix of the candidate documents, built once per request.
+
+    The matrix is kept in coordinate form: `doc_indices[i]` contains `term_indices[i]`.
+    """
+
+    def __init__(self, documents_keywords: Sequence[Sequence[str]]) -> None:
+        vocabulary: dict[str, int] = {}
+        doc_indices: list[int] = []
+        term_indices: list[int] = []
+        for doc_index, document_keywords in enumerate(documents_keywords):
+            for keyword in set(document_keywords):
+                term_index = vocabulary.setdefault(keyword, len(vocabulary))
+                doc_indices.append(doc_index)
+                term_indices.append(term_index)
+
+        self.vocabulary = vocabulary
+        self.num_documents = len(documents_keywords)
+        self.doc_indices = np.asarray(doc_indices, dtype=np.int64)
+        self.term_indices = np.asarray(term_indices, dtype=np.int64)
+        # number of documents containing each term
+        self.document_frequency = np.bincount(self.term_indices, minlength=len(vocabulary)).astype(np.float64)
+        # number of terms of each document
+        self.document_lengths = np.bincount(self.doc_indices, minlength=self.num_documents).astype(np.float64)
+
+    def query_term_weights(self, query_keywords: Sequence[str]) -> np.ndarray:
+        weights = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for keyword in query_keywords:
+            term_index = self.vocabulary.get(keyword)
+            if term_index is not None:
+                weights[term_index] += 1
+        return weights
+
+    def tfidf_cosine_scores(self, query_keywords: Sequence[str]) -> np.ndarray:
+        """
+        Cosine similarity of the TF-IDF vectors of the query and of every document,
+        IDF is the smoothed `log((1 + N) / (1 + df)) + 1`.
+        """
+        if not self.num_documents:
+            return np.zeros(0, dtype=np.float64)
+        idf = np.log((1 + self.num_documents) / (1 + self.document_frequency)) + 1
+        query_tfidf = self.query_term_weights(query_keywords) * idf
+
+        entry_idf = idf[self.term_indices]
+        numerators = np.bincount(
+            self.doc_indices, weights=query_tfidf[self.term_indices] * entry_idf, minlength=self.num_documents
+        )
+        document_norms = np.sqrt(np.bincount(self.doc_indices, weights=entry_idf**2, minlength=self.num_documents))
+        denominators = document_norms * np.linalg.norm(query_tfidf)
+
+        scores = np.zeros(self.num_documents, dtype=np.float64)
+        np.divide(numerators, denominators, out=scores, where=denominators > 0)
+        return scores
+
+    def bm25_scores(self, query_keywords: Sequence[str], k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+        """
+        Okapi BM25 of every document, normalized by the best score so it can be weighted
+        against vector scores.
+        """
+        if not self.num_documents:
+            return np.zeros(0, dtype=np.float64)
+        idf = np.log(1 + (self.num_documents - self.document_frequency + 0.5) / (self.document_frequency + 0.5))
+        query_weights = self.query_term_weights(query_keywords)
+
+        average_length = self.document_lengths.mean() or 1.0
+        length_norms = k1 * (1 - b + b * self.document_lengths / average_length)
+        # keyword sets carry no term frequency, every posting has tf = 1
+        entry_scores = idf[self.term_indices] * (k1 + 1) / (1 + length_norms[self.doc_indices])
+        scores = np.bincount(
+            self.doc_indices, weights=query_weights[self.term_indices] * entry_scores, minlength=self.num_documents
+        )
+
+        max_score = scores.max()
+        return scores / max_score if max_score > 0 else scores
+
+
+class KeywordScorer:
+    """
+    Keyword scoring of retrieved documents, shared by the weighted rerank and the
+    multiple dataset retrieval.
+    """
+
+    def __init__(self, method: KeywordScoringMethod = KeywordScoringMethod.TF_IDF) -> None:
+        self._method = method
+        self._keyword_table_handler = JiebaKeywordTableHandler()
+
+    def score(self, query: str, documents: list[Document]) -> list[float]:
+        """
+        Calculate keyword scores
+        :param query: search query
+        :param documents: documents to score
+
+        :return: one score per document
+        """
+        query_keywords = list(self._keyword_table_handler.extract_keywords(query, None))
+        matrix = KeywordTermMatrix(self._get_documents_keywords(documents))
+        if self._method == KeywordScoringMethod.BM25:
+            scores = matrix.bm25_scores(query_keywords)
+        else:
+            scores = matrix.tfidf_cosine_scores(query_keywords)
+        return scores.tolist()
+
+    def _get_documents_keywords(self, documents: list[Document]) -> list[list[str]]:
+        """
+        Reuse keywords already attached to the documents or stored on their segments,
+        only the remaining documents are tokenized.
+        """
+        documents_keywords: list[Optional[list[str]]] = []
+        missing_node_ids = []
+        for document in documents:
+            keywords = document.metadata.get("keywords") if document.metadata else None
+            documents_keywords.append(list(keywords) if keywords else None)
+            if not keywords and document.metadata and document.metadata.get("doc_id"):
+                missing_node_ids.append(document.metadata["doc_id"])
+
+        segment_keywords = self._load_segment_keywords(missing_node_ids)
+        max_keywords_per_chunk = KeywordTableConfig().max_keywords_per_chunk
+        result = []
+        for document, keywords in zip(documents, documents_keywords):
+            if keywords is None and document.metadata:
+                keywords = segment_keywords.get(document.metadata.get("doc_id", ""))
+            if keywords is None:
+                # extract with the same limit as the keyword index, so reused and extracted keywords compare
+                keywords = list(
+                    self._keyword_table_handler.extract_keywords(document.page_content, max_keywords_per_chunk)
+                )
+            if document.metadata is not None:
+                document.metadata["keywords"] = keywords
+            result.append(keywords)
+        return result
+
+    @staticmethod
+    def _load_segment_keywords(index_node_ids: list[str]) -> dict[str, list[str]]:
+        if not index_node_ids:
+            return {}
+        segments = (
+            db.session.query(DocumentSegment.index_node_id, DocumentSegment.keywords)
+            .filter(DocumentSegment.index_node_id.in_(index_node_ids))
+            .all()
+        )
+        return {index_node_id: list(keywords) for index_node_id, keywords in segments if keywords}
@@ -13,6 +13,7 @@ class BaseRerankRunner(ABC):
         score_threshold: Optional[float] = None,
         top_n: Optional[int] = None,
         user: Optional[str] = None,
+        query_vector: Optional[list[float]] = None,
     ) -> list[Document]:
         """
         Run rerank model
@@ -21,6 +22,7 @@ class BaseRerankRunner(ABC):
         :param score_threshold: score threshold
         :param top_n: top n
         :param user: unique user id if needed
+        :param query_vector: query embedding already computed by the retrieval, if any
         :return:
         """
         raise NotImplementedError
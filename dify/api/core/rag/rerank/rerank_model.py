@@ -16,6 +16,7 @@ class RerankModelRunner(BaseRerankRunner):
         score_threshold: Optional[float] = None,
         top_n: Optional[int] = None,
         user: Optional[str] = None,
+        query_vector: Optional[list[float]] = None,
     ) -> list[Document]:
         """
         Run rerank model
@@ -24,6 +25,7 @@ class RerankModelRunner(BaseRerankRunner):
         :param score_threshold: score threshold
         :param top_n: top n
         :param user: unique user id if needed
+        :param query_vector: unused by rerank models
         :return:
         """
         docs = []
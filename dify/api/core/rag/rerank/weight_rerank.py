@@ -1,15 +1,11 @@
-import math
-from collections import Counter
 from typing import Optional
 
 import numpy as np
 
-from core.model_manager import ModelManager
-from core.model_runtime.entities.model_entities import ModelType
-from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
-from core.rag.embedding.cached_embedding import CacheEmbedding
+from core.rag.datasource.vdb.vector_cache import vector_cache
 from core.rag.models.document import Document
 from core.rag.rerank.entity.weight import VectorSetting, Weights
+from core.rag.rerank.keyword_scorer import KeywordScorer
 from core.rag.rerank.rerank_base import BaseRerankRunner
 
 
@@ -25,6 +21,7 @@ class WeightRerankRunner(BaseRerankRunner):
         score_threshold: Optional[float] = None,
         top_n: Optional[int] = None,
         user: Optional[str] = None,
+        query_vector: Optional[list[float]] = None,
     ) -> list[Document]:
         """
         Run rerank model
@@ -33,6 +30,7 @@ class WeightRerankRunner(BaseRerankRunner):
         :param score_threshold: score threshold
         :param top_n: top n
         :param user: unique user id if needed
+        :param query_vector: query embedding already computed by the retrieval, if any
 
         :return:
         """
@@ -46,7 +44,9 @@ class WeightRerankRunner(BaseRerankRunner):
         documents = unique_documents
 
         query_scores = self._calculate_keyword_score(query, documents)
-        query_vector_scores = self._calculate_cosine(self.tenant_id, query, documents, self.weights.vector_setting)
+        query_vector_scores = self._calculate_cosine(
+            self.tenant_id, query, documents, self.weights.vector_setting, query_vector
+        )
 
         rerank_documents = []
         for document, query_score, query_vector_score in zip(documents, query_scores, query_vector_scores):
@@ -65,121 +65,60 @@ class WeightRerankRunner(BaseRerankRunner):
 
     def _calculate_keyword_score(self, query: str, documents: list[Document]) -> list[float]:
         """
-        Calculate BM25 scores
+        Calculate keyword scores
         :param query: search query
         :param documents: documents for reranking
 
         :return:
         """
-        keyword_table_handler = JiebaKeywordTableHandler()
-        query_keywords = keyword_table_handler.extract_keywords(query, None)
-        documents_keywords = []
-        for document in documents:
-            # get the document keywords
-            document_keywords = keyword_table_handler.extract_keywords(document.page_content, None)
-            if document.metadata is not None:
-                document.metadata["keywords"] = document_keywords
-                documents_keywords.append(document_keywords)
-
-        # Counter query keywords(TF)
-        query_keyword_counts = Counter(query_keywords)
-
-        # total documents
-        total_documents = len(documents)
-
-        # calculate all documents' keywords IDF
-        all_keywords = set()
-        for document_keywords in documents_keywords:
-            all_keywords.update(document_keywords)
-
-        keyword_idf = {}
-        for keyword in all_keywords:
-            # calculate include query keywords' documents
-            doc_count_containing_keyword = sum(1 for doc_keywords in documents_keywords if keyword in doc_keywords)
-            # IDF
-            keyword_idf[keyword] = math.log((1 + total_documents) / (1 + doc_count_containing_keyword)) + 1
-
-        query_tfidf = {}
-
-        for keyword, count in query_keyword_counts.items():
-            tf = count
-            idf = keyword_idf.get(keyword, 0)
-            query_tfidf[keyword] = tf * idf
-
-        # calculate all documents' TF-IDF
-        documents_tfidf = []
-        for document_keywords in documents_keywords:
-            document_keyword_counts = Counter(document_keywords)
-            document_tfidf = {}
-            for keyword, count in document_keyword_counts.items():
-                tf = count
-                idf = keyword_idf.get(keyword, 0)
-                document_tfidf[keyword] = tf * idf
-            documents_tfidf.append(document_tfidf)
-
-        def cosine_similarity(vec1, vec2):
-            intersection = set(vec1.keys()) & set(vec2.keys())
-            numerator = sum(vec1[x] * vec2[x] for x in intersection)
-
-            sum1 = sum(vec1[x] ** 2 for x in vec1)
-            sum2 = sum(vec2[x] ** 2 for x in vec2)
-            denominator = math.sqrt(sum1) * math.sqrt(sum2)
-
-            if not denominator:
-                return 0.0
-            else:
-                return float(numerator) / denominator
-
-        similarities = []
-        for document_tfidf in documents_tfidf:
-            similarity = cosine_similarity(query_tfidf, document_tfidf)
-            similarities.append(similarity)
-
-        # for idx, similarity in enumerate(similarities):
-        #     print(f"Document {idx + 1} similarity: {similarity}")
-
-        return similarities
+        return KeywordScorer(self.weights.keyword_setting.scoring_method).score(query, documents)
 
     def _calculate_cosine(
-        self, tenant_id: str, query: str, documents: list[Document], vector_setting: VectorSetting
+        self,
+        tenant_id: str,
+        query: str,
+        documents: list[Document],
+        vector_setting: VectorSetting,
+        query_vector: Optional[list[float]] = None,
     ) -> list[float]:
         """
         Calculate Cosine scores
         :param query: search query
         :param documents: documents for reranking
+        :param query_vector: query embedding already computed by the retrieval, if any
 
         :return:
         """
-        query_vector_scores = []
-
-        model_manager = ModelManager()
+        query_vector_scores = np.zeros(len(documents), dtype=np.float64)
 
-        embedding_model = model_manager.get_model_instance(
-            tenant_id=tenant_id,
-            provider=vector_setting.embedding_provider_name,
-            model_type=ModelType.TEXT_EMBEDDING,
-            model=vector_setting.embedding_model_name,
-        )
-        cache_embedding = CacheEmbedding(embedding_model)
-        query_vector = cache_embedding.embed_query(query)
-        for document in documents:
-            # calculate cosine similarity
+        # documents returned by the vector search already carry their similarity score
+        unscored_indices = []
+        for i, document in enumerate(documents):
             if document.metadata and "score" in document.metadata:
-                query_vector_scores.append(document.metadata["score"])
-            else:
-                # transform to NumPy
-                vec1 = np.array(query_vector)
-                vec2 = np.array(document.vector)
-
-                # calculate dot product
-                dot_product = np.dot(vec1, vec2)
-
-                # calculate norm
-                norm_vec1 = np.linalg.norm(vec1)
-                norm_vec2 = np.linalg.norm(vec2)
-
-                # calculate cosine similarity
-                cosine_sim = dot_product / (norm_vec1 * norm_vec2)
-                query_vector_scores.append(cosine_sim)
+                query_vector_scores[i] = document.metadata["score"]
+            elif document.vector:
+                unscored_indices.append(i)
+        if not unscored_indices:
+            return query_vector_scores.tolist()
+
+        if query_vector is None:
+            cache_embedding = vector_cache.get_embeddings(
+                tenant_id, vector_setting.embedding_provider_name, vector_setting.embedding_model_name
+            )
+            query_vector = cache_embedding.embed_query(query)
+
+        # normalize once, the cosine similarity of all candidates is then a single matmul
+        query_array = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query_array)
+        if query_norm == 0:
+            # an all-zero query embedding is similar to nothing
+            return query_vector_scores.tolist()
+        query_array = query_array / query_norm
+        document_matrix = np.asarray([documents[i].vector for i in unscored_indices], dtype=np.float32)
+        document_norms = np.linalg.norm(document_matrix, axis=1, keepdims=True)
+        document_matrix = np.divide(
+            document_matrix, document_norms, out=np.zeros_like(document_matrix), where=document_norms > 0
+        )
+        query_vector_scores[unscored_indices] = document_matrix @ query_array
 
-        return query_vector_scores
+        return query_vector_scores.tolist()
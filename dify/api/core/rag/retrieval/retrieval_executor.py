@@ -0,0 +1,223 @@
+import contextvars
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Generic, Optional, TypeVar
+
+from cachetools import LRUCache
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# number of task keys, e.g. dataset ids, the latency stats are kept for
+_STATS_MAX_KEYS = 1000
+
+# absolute deadline, in `time.monotonic()` seconds, of the run a task belongs to
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("retrieval_deadline", default=None)
+
+
+@dataclass
+class RetrievalTaskResult(Generic[T]):
+    """Outcome of one retrieval task, `result` is only set when the task finished in time without error."""
+
+    key: str
+    result: Optional[T] = None
+    latency: float = 0.0
+    error: Optional[BaseException] = None
+    timed_out: bool = False
+    # not run at all, earlier tasks of the key that timed out still hold threads of the pool
+    skipped: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None and not self.timed_out and not self.skipped
+
+
+class RetrievalExecutor:
+    """
+    Process-wide bounded thread pool running retrieval tasks under a deadline.
+
+    Tasks still running when the deadline expires are reported as timed out and their
+    results are discarded, pending tasks are cancelled, so a slow data source only
+    drops its own results instead of blocking the whole request. A run started by a
+    task of another run only gets what remains of the deadline of that run.
+
+    Running tasks cannot be interrupted: a timed out task keeps its thread until the data
+    source answers or its own client timeout expires. To keep one stalled data source from
+    filling the pool, at most `max_overdue` timed out tasks per key may still be running,
+    further tasks of that key are skipped without running until one of them finishes.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_overdue: int = 1) -> None:
+        self._name = name
+        self._max_workers = max(max_workers, 1)
+        self._max_overdue = max(max_overdue, 1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats: LRUCache[str, dict[str, Any]] = LRUCache(maxsize=_STATS_MAX_KEYS)
+        # per key, timed out tasks still holding a thread of the pool
+        self._overdue: dict[str, int] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self._max_workers, thread_name_prefix=f"retrieval-{self._name}"
+                    )
+        return self._executor
+
+    def run(
+        self, tasks: Mapping[str, Callable[[], T]], timeout: Optional[float] = None
+    ) -> list[RetrievalTaskResult[T]]:
+        """
+        Run tasks concurrently and wait for them until the deadline
+        :param tasks: callables keyed by a name used in results and logs, e.g. the dataset id
+        :param timeout: deadline in seconds, defaults to RETRIEVAL_TIMEOUT, capped by the deadline of the
+            run the calling task belongs to
+        :return: one result per task, in the order of `tasks`
+        """
+        if not tasks:
+            return []
+        if timeout is None:
+            timeout = dify_config.RETRIEVAL_TIMEOUT
+        deadline = time.monotonic() + timeout
+        outer_deadline = _deadline.get()
+        if outer_deadline is not None:
+            deadline = min(deadline, outer_deadline)
+        timeout = max(deadline - time.monotonic(), 0.0)
+
+        latencies: dict[str, float] = {}
+
+        def timed(key: str, task: Callable[[], T]) -> T:
+            # each task runs in a context of its own, runs it starts inherit the deadline
+            _deadline.set(deadline)
+            started_at = time.perf_counter()
+            try:
+                return task()
+            finally:
+                latencies[key] = time.perf_counter() - started_at
+
+        with self._lock:
+            skipped = {key for key in tasks if self._overdue.get(key, 0) >= self._max_overdue}
+        executor = self._get_executor()
+        futures: dict[str, Future[T]] = {
+            key: executor.submit(contextvars.Context().run, timed, key, task)
+            for key, task in tasks.items()
+            if key not in skipped
+        }
+        wait(futures.values(), timeout=timeout)
+
+        results: list[RetrievalTaskResult[T]] = []
+        for key in tasks:
+            if key in skipped:
+                logger.warning(
+                    "Retrieval %s task %s skipped, %d timed out tasks of it are still running",
+                    self._name,
+                    key,
+                    self._max_overdue,
+                )
+                results.append(RetrievalTaskResult(key=key, skipped=True))
+                continue
+            future = futures[key]
+            if not future.done() or future.cancelled():
+                if not future.cancel():
+                    self._hold_overdue(key, future)
+                logger.warning("Retrieval %s task %s timed out after %.2fs", self._name, key, timeout)
+                results.append(RetrievalTaskResult(key=key, latency=timeout, timed_out=True))
+                continue
+            latency = latencies.get(key, 0.0)
+            error = future.exception()
+            if error is not None:
+                logger.warning("Retrieval %s task %s failed after %.3fs: %s", self._name, key, latency, error)
+                results.append(RetrievalTaskResult(key=key, latency=latency, error=error))
+            else:
+                logger.debug("Retrieval %s task %s finished in %.3fs", self._name, key, latency)
+                results.append(RetrievalTaskResult(key=key, result=future.result(), latency=latency))
+        self._observe(results)
+        return results
+
+    def _hold_overdue(self, key: str, future: Future) -> None:
+        """Count a timed out task against its key until it releases its thread."""
+        with self._lock:
+            self._overdue[key] = self._overdue.get(key, 0) + 1
+
+        def release(_: Future) -> None:
+            with self._lock:
+                remaining = self._overdue.get(key, 0) - 1
+                if remaining > 0:
+                    self._overdue[key] = remaining
+                else:
+                    self._overdue.pop(key, None)
+
+        future.add_done_callback(release)
+
+    def _observe(self, results: list[RetrievalTaskResult]) -> None:
+        with self._lock:
+            for result in results:
+                stats = self._stats.get(result.key)
+                if stats is None:
+                    stats = self._stats[result.key] = {
+                        "count": 0,
+                        "errors": 0,
+                        "timeouts": 0,
+                        "skipped": 0,
+                        "total": 0.0,
+                        "max": 0.0,
+                    }
+                stats["count"] += 1
+                stats["errors"] += result.error is not None
+                stats["timeouts"] += result.timed_out
+                stats["skipped"] += result.skipped
+                stats["total"] += result.latency
+                stats["max"] = max(stats["max"], result.latency)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        """
+        Latencies of the tasks per key, e.g. per dataset, for the most recently run keys
+        """
+        with self._lock:
+            return {
+                key: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "timeouts": stats["timeouts"],
+                    "skipped": stats["skipped"],
+                    "avg": stats["total"] / stats["count"],
+                    "max": stats["max"],
+                }
+                for key, stats in self._stats.items()
+            }
+
+    def overdue(self) -> dict[str, int]:
+        """
+        Timed out tasks per key still holding a thread of the pool
+        """
+        with self._lock:
+            return dict(self._overdue)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+# datasets and the searches they issue use separate pools, so a dataset task waiting on its
+# searches can never starve the pool the searches need to run on
+dataset_retrieval_executor = RetrievalExecutor(
+    "dataset", dify_config.RETRIEVAL_DATASET_EXECUTORS, dify_config.RETRIEVAL_MAX_OVERDUE_TASKS
+)
+search_retrieval_executor = RetrievalExecutor(
+    "search", dify_config.RETRIEVAL_SERVICE_EXECUTORS, dify_config.RETRIEVAL_MAX_OVERDUE_TASKS
+)
@@ -0,0 +1,171 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Sequence
+from datetime import UTC, datetime
+from typing import Any, Optional
+
+from flask import Flask, current_app
+from sqlalchemy import insert
+
+from configs import dify_config
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from models.dataset import ChildChunk, DatasetQuery, DocumentSegment
+
+logger = logging.getLogger(__name__)
+
+# (dataset id or None when unknown, index node id) of a retrieved chunk
+HitKey = tuple[Optional[str], str]
+
+
+class RetrievalStatsBuffer:
+    """
+    In-process write-behind buffer of the retrieval side effects: segment hit counts and dataset queries.
+
+    Hits are aggregated per chunk and queries are accumulated, a background thread writes them in bulk
+    every flush interval, or earlier once the flush threshold is reached, so the request path does no
+    database round trip for them. Counts are best effort, a failed flush is logged and dropped.
+    """
+
+    QUERY_BATCH_SIZE = 500
+
+    def __init__(self, flush_interval: float, flush_threshold: int) -> None:
+        self._flush_interval = flush_interval
+        self._flush_threshold = flush_threshold
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._hits: Counter[HitKey] = Counter()
+        self._queries: list[dict[str, Any]] = []
+        self._flask_app: Optional[Flask] = None
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        atexit.register(self._flush_in_app_context)
+
+    def record_query(
+        self, query: str, dataset_ids: Iterable[str], app_id: Optional[str], created_by_role: str, created_by: str
+    ) -> None:
+        created_at = datetime.now(UTC).replace(tzinfo=None)
+        rows = [
+            {
+                "dataset_id": dataset_id,
+                "content": query,
+                "source": "app",
+                "source_app_id": app_id,
+                "created_by_role": created_by_role,
+                "created_by": created_by,
+                "created_at": created_at,
+            }
+            for dataset_id in dataset_ids
+        ]
+        if rows:
+            with self._lock:
+                self._queries.extend(rows)
+            self._after_record()
+
+    def record_hits(self, documents: Sequence[Document]) -> None:
+        keys: list[HitKey] = [
+            (document.metadata.get("dataset_id"), document.metadata["doc_id"])
+            for document in documents
+            if document.metadata and document.metadata.get("doc_id")
+        ]
+        if keys:
+            with self._lock:
+                self._hits.update(keys)
+            self._after_record()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._hits) + len(self._queries)
+
+    def flush(self) -> None:
+        """Write everything buffered so far, must be called inside an app context."""
+        with self._flush_lock:
+            with self._lock:
+                hits, self._hits = self._hits, Counter()
+                queries, self._queries = self._queries, []
+            if not hits and not queries:
+                return
+            try:
+                if queries:
+                    for i in range(0, len(queries), self.QUERY_BATCH_SIZE):
+                        db.session.execute(insert(DatasetQuery), queries[i : i + self.QUERY_BATCH_SIZE])
+                if hits:
+                    self._increment_hit_counts(hits)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception("Failed to write %d segment hits and %d dataset queries", len(hits), len(queries))
+
+    def _after_record(self) -> None:
+        self._ensure_worker()
+        if self.pending() >= self._flush_threshold:
+            self._wakeup.set()
+
+    def _ensure_worker(self) -> None:
+        # the worker is (re)started lazily so forked processes get their own
+        if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive() and self._worker_pid == os.getpid():
+                return
+            self._flask_app = current_app._get_current_object()  # type: ignore
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name="retrieval_stats_buffer", daemon=True)
+            self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(self._flush_interval)
+            self._wakeup.clear()
+            self._flush_in_app_context()
+
+    def _flush_in_app_context(self) -> None:
+        if self._flask_app is None:
+            return
+        try:
+            with self._flask_app.app_context():
+                self.flush()
+        except Exception:
+            logger.exception("Failed to flush retrieval stats")
+
+    def _increment_hit_counts(self, hits: Counter[HitKey]) -> None:
+        segment_hits: Counter[str] = Counter()
+        index_node_ids = list({index_node_id for _, index_node_id in hits})
+        matched: set[str] = set()
+        # chunks of general documents are segments, chunks of parent-child documents are child chunks
+        for model, segment_id_column in (
+            (DocumentSegment, DocumentSegment.id),
+            (ChildChunk, ChildChunk.segment_id),
+        ):
+            remaining_ids = [index_node_id for index_node_id in index_node_ids if index_node_id not in matched]
+            for i in range(0, len(remaining_ids), self.QUERY_BATCH_SIZE):
+                rows = (
+                    db.session.query(segment_id_column, model.dataset_id, model.index_node_id)
+                    .filter(model.index_node_id.in_(remaining_ids[i : i + self.QUERY_BATCH_SIZE]))
+                    .all()
+                )
+                for segment_id, dataset_id, index_node_id in rows:
+                    count = hits.get((dataset_id, index_node_id), 0) + hits.get((None, index_node_id), 0)
+                    if count:
+                        segment_hits[segment_id] += count
+                        matched.add(index_node_id)
+
+        # one update per distinct increment, usually a single statement for the whole batch
+        segment_ids_by_count: defaultdict[int, list[str]] = defaultdict(list)
+        for segment_id, count in sorted(segment_hits.items()):
+            segment_ids_by_count[count].append(segment_id)
+        for count, segment_ids in segment_ids_by_count.items():
+            for i in range(0, len(segment_ids), self.QUERY_BATCH_SIZE):
+                db.session.query(DocumentSegment).filter(
+                    DocumentSegment.id.in_(segment_ids[i : i + self.QUERY_BATCH_SIZE])
+                ).update({DocumentSegment.hit_count: DocumentSegment.hit_count + count}, synchronize_session=False)
+
+
+retrieval_stats_buffer = RetrievalStatsBuffer(
+    flush_interval=dify_config.RETRIEVAL_STATS_FLUSH_INTERVAL,
+    flush_threshold=dify_config.RETRIEVAL_STATS_FLUSH_THRESHOLD,
+)
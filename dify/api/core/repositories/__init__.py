@@ -6,7 +6,11 @@ defined in the core.workflow.repository package.
 """
 
 from core.repositories.sqlalchemy_workflow_node_execution_repository import SQLAlchemyWorkflowNodeExecutionRepository
+from core.repositories.write_behind_workflow_node_execution_repository import (
+    WriteBehindWorkflowNodeExecutionRepository,
+)
 
 __all__ = [
     "SQLAlchemyWorkflowNodeExecutionRepository",
+    "WriteBehindWorkflowNodeExecutionRepository",
 ]
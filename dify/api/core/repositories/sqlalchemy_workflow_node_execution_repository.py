@@ -4,13 +4,18 @@ SQLAlchemy implementation of the WorkflowNodeExecutionRepository.
 
 import json
 import logging
-from collections.abc import Sequence
-from typing import Optional, Union
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from typing import Any, Optional, Union
 
 from sqlalchemy import UnaryExpression, asc, delete, desc, select
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
+from configs import dify_config
 from core.model_runtime.utils.encoders import jsonable_encoder
 from core.workflow.entities.workflow_node_execution import (
     WorkflowNodeExecution,
@@ -29,6 +34,114 @@ from models import (
 
 logger = logging.getLogger(__name__)
 
+_node_execution_caches: "weakref.WeakSet[InFlightNodeExecutionCache]" = weakref.WeakSet()
+
+
+def _payload_size(value: Any) -> int:
+    """
+    Estimated memory held by a payload: the shallow sizes of its containers, keys and values.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, Mapping):
+        size += sum(_payload_size(key) + _payload_size(item) for key, item in value.items())
+    elif isinstance(value, list | tuple | set | frozenset):
+        size += sum(_payload_size(item) for item in value)
+    return size
+
+
+def _execution_payload_size(execution: WorkflowNodeExecution) -> int:
+    return sum(
+        _payload_size(payload)
+        for payload in (execution.inputs, execution.process_data, execution.outputs, execution.metadata)
+        if payload is not None
+    )
+
+
+class InFlightNodeExecutionCache:
+    """
+    Bounded cache of the domain state of in-flight node executions, keyed by node_execution_id.
+
+    Only running executions are kept, an execution is evicted once it is saved finished. When more than
+    `maxsize` executions are in flight the least recently used ones are evicted and read back on demand.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._executions: OrderedDict[str, WorkflowNodeExecution] = OrderedDict()
+        self._payload_sizes: dict[str, int] = {}
+        self._payload_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        _node_execution_caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._executions)
+
+    def put(self, execution: WorkflowNodeExecution) -> None:
+        if not execution.node_execution_id:
+            return
+        with self._lock:
+            if execution.status != WorkflowNodeExecutionStatus.RUNNING:
+                if self._pop(execution.node_execution_id):
+                    self._evictions += 1
+                return
+            # the caller keeps changing its instance, the state of this put is kept
+            self._pop(execution.node_execution_id)
+            self._executions[execution.node_execution_id] = execution.model_copy()
+            payload_size = _execution_payload_size(execution)
+            self._payload_sizes[execution.node_execution_id] = payload_size
+            self._payload_bytes += payload_size
+            while len(self._executions) > self.maxsize:
+                self._pop(next(iter(self._executions)))
+                self._evictions += 1
+
+    def _pop(self, node_execution_id: str) -> bool:
+        if self._executions.pop(node_execution_id, None) is None:
+            return False
+        self._payload_bytes -= self._payload_sizes.pop(node_execution_id, 0)
+        return True
+
+    def get(self, node_execution_id: str) -> Optional[WorkflowNodeExecution]:
+        with self._lock:
+            execution = self._executions.get(node_execution_id)
+            if execution is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._executions.move_to_end(node_execution_id)
+        return execution.model_copy()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._executions.clear()
+            self._payload_sizes.clear()
+            self._payload_bytes = 0
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._executions),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "payload_bytes": self._payload_bytes,
+            }
+
+
+def node_execution_cache_stats() -> dict[str, Any]:
+    """
+    Aggregated stats of the node execution caches of the live repositories of the process,
+    `payload_bytes` estimates the memory held by the inputs, process data, outputs and metadata.
+    """
+    caches = list(_node_execution_caches)
+    stats = {"caches": len(caches), "entries": 0, "hits": 0, "misses": 0, "evictions": 0, "payload_bytes": 0}
+    for cache in caches:
+        for key, value in cache.stats().items():
+            stats[key] += value
+    return stats
+
 
 class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository):
     """
@@ -38,8 +151,8 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
     Each method creates its own session, handles the transaction, and commits changes
     to the database. This prevents long-running connections in the workflow core.
 
-    This implementation also includes an in-memory cache for node executions to improve
-    performance by reducing database queries.
+    This implementation also keeps the domain state of in-flight node executions in a bounded
+    in-memory cache, so finishing a node does not query the database.
     """
 
     def __init__(
@@ -84,9 +197,8 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         # Determine user role based on user type
         self._creator_user_role = CreatorUserRole.ACCOUNT if isinstance(user, Account) else CreatorUserRole.END_USER
 
-        # Initialize in-memory cache for node executions
-        # Key: node_execution_id, Value: WorkflowNodeExecution (DB model)
-        self._node_execution_cache: dict[str, WorkflowNodeExecutionModel] = {}
+        # Key: node_execution_id, Value: WorkflowNodeExecution of a running node
+        self._node_execution_cache = InFlightNodeExecutionCache(dify_config.WORKFLOW_NODE_EXECUTION_CACHE_SIZE)
 
     def _to_domain_model(self, db_model: WorkflowNodeExecutionModel) -> WorkflowNodeExecution:
         """
@@ -183,7 +295,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         1. Converts the domain entity to its database representation
         2. Persists the database model using SQLAlchemy's merge operation
         3. Maintains proper multi-tenancy by including tenant context during conversion
-        4. Updates the in-memory cache for faster subsequent lookups
+        4. Keeps running executions in the in-memory cache and evicts finished ones
 
         The method handles both creating new records and updating existing ones through
         SQLAlchemy's merge operation.
@@ -201,18 +313,18 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
             session.merge(db_model)
             session.commit()
 
-            # Update the in-memory cache for faster subsequent lookups
-            # Only cache if we have a node_execution_id to use as the cache key
-            if db_model.node_execution_id:
-                logger.debug(f"Updating cache for node_execution_id: {db_model.node_execution_id}")
-                self._node_execution_cache[db_model.node_execution_id] = db_model
+        self._node_execution_cache.put(execution)
+
+    def flush(self) -> None:
+        """
+        Executions are written on save, there is nothing to flush.
+        """
 
     def get_by_node_execution_id(self, node_execution_id: str) -> Optional[WorkflowNodeExecution]:
         """
         Retrieve a NodeExecution by its node_execution_id.
 
-        First checks the in-memory cache, and if not found, queries the database.
-        If found in the database, adds it to the cache for future lookups.
+        First checks the in-memory cache of running executions, and if not found, queries the database.
 
         Args:
             node_execution_id: The node execution ID
@@ -221,14 +333,11 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
             The NodeExecution instance if found, None otherwise
         """
         # First check the cache
-        if node_execution_id in self._node_execution_cache:
-            logger.debug(f"Cache hit for node_execution_id: {node_execution_id}")
-            # Convert cached DB model to domain model
-            cached_db_model = self._node_execution_cache[node_execution_id]
-            return self._to_domain_model(cached_db_model)
+        execution = self._node_execution_cache.get(node_execution_id)
+        if execution is not None:
+            return execution
 
         # If not in cache, query the database
-        logger.debug(f"Cache miss for node_execution_id: {node_execution_id}, querying database")
         with self._session_factory() as session:
             stmt = select(WorkflowNodeExecutionModel).where(
                 WorkflowNodeExecutionModel.node_execution_id == node_execution_id,
@@ -240,11 +349,9 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
 
             db_model = session.scalar(stmt)
             if db_model:
-                # Add DB model to cache
-                self._node_execution_cache[node_execution_id] = db_model
-
-                # Convert to domain model and return
-                return self._to_domain_model(db_model)
+                execution = self._to_domain_model(db_model)
+                self._node_execution_cache.put(execution)
+                return execution
 
             return None
 
@@ -258,7 +365,6 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
 
         This method directly returns database models without converting to domain models,
         which is useful when you need to access database-specific fields like triggered_from.
-        It also updates the in-memory cache with the retrieved models.
 
         Args:
             workflow_run_id: The workflow run ID
@@ -294,14 +400,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
                 if order_columns:
                     stmt = stmt.order_by(*order_columns)
 
-            db_models = session.scalars(stmt).all()
-
-            # Update the cache with the retrieved DB models
-            for model in db_models:
-                if model.node_execution_id:
-                    self._node_execution_cache[model.node_execution_id] = model
-
-            return db_models
+            return session.scalars(stmt).all()
 
     def get_by_workflow_run(
         self,
@@ -311,8 +410,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         """
         Retrieve all NodeExecution instances for a specific workflow run.
 
-        This method always queries the database to ensure complete and ordered results,
-        but updates the cache with any retrieved executions.
+        This method always queries the database to ensure complete and ordered results.
 
         Args:
             workflow_run_id: The workflow run ID
@@ -338,8 +436,8 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         """
         Retrieve all running NodeExecution instances for a specific workflow run.
 
-        This method queries the database directly and updates the cache with any
-        retrieved executions that have a node_execution_id.
+        This method queries the database directly and updates the cache with the
+        retrieved executions.
 
         Args:
             workflow_run_id: The workflow run ID
@@ -362,12 +460,8 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
             domain_models = []
 
             for model in db_models:
-                # Update cache if node_execution_id is present
-                if model.node_execution_id:
-                    self._node_execution_cache[model.node_execution_id] = model
-
-                # Convert to domain model
                 domain_model = self._to_domain_model(model)
+                self._node_execution_cache.put(domain_model)
                 domain_models.append(domain_model)
 
             return domain_models
@@ -0,0 +1,301 @@
+"""
+Write-behind implementation of the WorkflowNodeExecutionRepository.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any, Optional, Union
+
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from configs import dify_config
+from core.repositories.sqlalchemy_workflow_node_execution_repository import SQLAlchemyWorkflowNodeExecutionRepository
+from core.workflow.entities.workflow_node_execution import WorkflowNodeExecution
+from core.workflow.repositories.workflow_node_execution_repository import OrderConfig
+from libs.latency_histogram import LatencyHistogram
+from models import Account, EndUser, WorkflowNodeExecutionModel, WorkflowNodeExecutionTriggeredFrom
+
+logger = logging.getLogger(__name__)
+
+_MAX_RETRY_DELAY = 60.0
+
+_COLUMN_KEYS = [attr.key for attr in inspect(WorkflowNodeExecutionModel).column_attrs]
+
+
+class NodeExecutionFlusher:
+    """
+    Background thread flushing the pending writes of write-behind repositories of the process.
+
+    A repository is scheduled on its first pending write and flushed after `interval` seconds, so the
+    writes of the interval are coalesced, or right away once it holds `batch_size` pending writes.
+    Executions failing to be written are retried with an exponential backoff and dropped after
+    `max_attempts` attempts. Pending writes left at interpreter exit are flushed by an atexit hook.
+    """
+
+    def __init__(self, interval: float, batch_size: int, max_attempts: int) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._condition = threading.Condition()
+        # Key: scheduled repository, Value: monotonic time it is flushed at
+        self._scheduled: dict[WriteBehindWorkflowNodeExecutionRepository, float] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._histogram = LatencyHistogram()
+        self._flushed_rows = 0
+        self._errors = 0
+        self._dropped_rows = 0
+
+    def schedule(
+        self, repository: "WriteBehindWorkflowNodeExecutionRepository", full: bool = False, attempt: int = 0
+    ) -> None:
+        """
+        Schedule a flush of the repository.
+
+        :param full: flush right away
+        :param attempt: number of failed attempts of the pending writes, delaying the flush exponentially
+        """
+        delay = 0.0 if full else min(self.interval * 2**attempt, _MAX_RETRY_DELAY)
+        with self._condition:
+            if self._thread is None or self._pid != os.getpid():
+                # threads are not inherited by forked processes
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="node-execution-flusher", daemon=True)
+                self._thread.start()
+            deadline = time.monotonic() + delay
+            self._scheduled[repository] = min(self._scheduled.get(repository, deadline), deadline)
+            self._condition.notify()
+
+    def observe(self, latency: float, rows: int, errors: int = 0, dropped_rows: int = 0) -> None:
+        with self._condition:
+            self._histogram.observe(latency)
+            self._flushed_rows += rows
+            self._errors += errors
+            self._dropped_rows += dropped_rows
+
+    def stats(self) -> dict[str, Any]:
+        with self._condition:
+            scheduled = list(self._scheduled)
+            stats = {
+                "flush_latency": self._histogram.to_dict(),
+                "flushed_rows": self._flushed_rows,
+                "errors": self._errors,
+                "dropped_rows": self._dropped_rows,
+            }
+        stats["queue_depth"] = sum(repository.pending_count for repository in scheduled)
+        return stats
+
+    def flush_all(self) -> None:
+        with self._condition:
+            repositories = list(self._scheduled)
+            self._scheduled.clear()
+        self._flush(repositories)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    due = [repository for repository, deadline in self._scheduled.items() if deadline <= now]
+                    if due:
+                        break
+                    timeout = min(self._scheduled.values()) - now if self._scheduled else None
+                    self._condition.wait(timeout)
+                for repository in due:
+                    del self._scheduled[repository]
+            self._flush(due)
+
+    def _flush(self, repositories: Sequence["WriteBehindWorkflowNodeExecutionRepository"]) -> None:
+        for repository in repositories:
+            try:
+                repository.flush()
+            except Exception:
+                # failed writes are rescheduled by the repository, this is a bug
+                logger.exception("Failed to flush workflow node executions")
+                with self._condition:
+                    self._errors += 1
+
+
+class WriteBehindWorkflowNodeExecutionRepository(SQLAlchemyWorkflowNodeExecutionRepository):
+    """
+    SQLAlchemy repository which persists node executions behind the workflow run.
+
+    Saved executions are kept in memory and written in batches by the process-wide flusher, the
+    start and the finish of a node within a flush interval become a single row write. Reads of a run
+    flush first, and the workflow cycle manager flushes when the run ends. With
+    `WORKFLOW_NODE_EXECUTION_WRITE_STRICT` every save is written right away, for debugging.
+    """
+
+    def __init__(
+        self,
+        session_factory: sessionmaker | Engine,
+        user: Union[Account, EndUser],
+        app_id: Optional[str],
+        triggered_from: Optional[WorkflowNodeExecutionTriggeredFrom],
+    ):
+        super().__init__(session_factory=session_factory, user=user, app_id=app_id, triggered_from=triggered_from)
+        self._strict = dify_config.WORKFLOW_NODE_EXECUTION_WRITE_STRICT
+        self._lock = threading.Lock()
+        # serializes flushes, so a newer state of an execution is never overwritten by an older one
+        self._flush_lock = threading.Lock()
+        # Key: id, Value: latest state not written yet
+        self._pending: dict[str, WorkflowNodeExecution] = {}
+        # Key: id, Value: failed attempts to write the execution
+        self._attempts: dict[str, int] = {}
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def save(self, execution: WorkflowNodeExecution) -> None:
+        """
+        Save or update a NodeExecution domain entity, it is written by the next flush.
+
+        Args:
+            execution: The NodeExecution domain entity to persist
+        """
+        if self._strict:
+            super().save(execution)
+            return
+
+        # the caller keeps changing its instance, the state of this save is kept
+        snapshot = execution.model_copy()
+        with self._lock:
+            self._pending[snapshot.id] = snapshot
+            pending_count = len(self._pending)
+        self._node_execution_cache.put(snapshot)
+
+        if pending_count == 1 or pending_count >= node_execution_flusher.batch_size:
+            node_execution_flusher.schedule(self, full=pending_count >= node_execution_flusher.batch_size)
+
+    def flush(self) -> None:
+        """
+        Write the pending executions in batches, one transaction per batch.
+
+        The executions of a failing batch are written one by one, so only the failing ones are kept
+        pending. They are retried with a backoff and dropped after `max_attempts` failed attempts.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, {}
+
+            start = time.perf_counter()
+            executions = list(pending.values())
+            failed: list[WorkflowNodeExecution] = []
+            errors = 0
+            for i in range(0, len(executions), node_execution_flusher.batch_size):
+                batch = executions[i : i + node_execution_flusher.batch_size]
+                try:
+                    self._write(batch)
+                except Exception:
+                    errors += 1
+                    if len(batch) == 1:
+                        failed.extend(batch)
+                        continue
+                    for execution in batch:
+                        try:
+                            self._write([execution])
+                        except Exception:
+                            errors += 1
+                            failed.append(execution)
+
+            dropped: list[WorkflowNodeExecution] = []
+            attempt = 0
+            failed_ids = {execution.id for execution in failed}
+            with self._lock:
+                for execution in executions:
+                    if execution.id not in failed_ids:
+                        self._attempts.pop(execution.id, None)
+                for execution in failed:
+                    attempts = self._attempts.get(execution.id, 0) + 1
+                    if attempts >= node_execution_flusher.max_attempts:
+                        self._attempts.pop(execution.id, None)
+                        dropped.append(execution)
+                        continue
+                    self._attempts[execution.id] = attempts
+                    # a state saved meanwhile is newer than the failed one
+                    self._pending.setdefault(execution.id, execution)
+                    attempt = max(attempt, attempts)
+
+            node_execution_flusher.observe(
+                time.perf_counter() - start, len(executions) - len(failed), errors, len(dropped)
+            )
+            for execution in dropped:
+                logger.error(
+                    "Dropping workflow node execution %s of workflow run %s after %s failed writes",
+                    execution.id,
+                    execution.workflow_execution_id,
+                    node_execution_flusher.max_attempts,
+                )
+            if attempt:
+                logger.warning("Failed to write %s workflow node executions, retrying", len(failed) - len(dropped))
+                node_execution_flusher.schedule(self, attempt=attempt)
+
+    def _write(self, executions: Sequence[WorkflowNodeExecution]) -> None:
+        db_models = [self.to_db_model(execution) for execution in executions]
+        with self._session_factory() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                stmt = insert(WorkflowNodeExecutionModel).values(
+                    [{key: getattr(db_model, key) for key in _COLUMN_KEYS} for db_model in db_models]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["id"],
+                    set_={key: stmt.excluded[key] for key in _COLUMN_KEYS if key != "id"},
+                )
+                session.execute(stmt)
+            else:
+                for db_model in db_models:
+                    session.merge(db_model)
+            session.commit()
+
+    def get_by_node_execution_id(self, node_execution_id: str) -> Optional[WorkflowNodeExecution]:
+        """
+        Retrieve a NodeExecution by its node_execution_id, running executions are served from memory.
+
+        Args:
+            node_execution_id: The node execution ID
+
+        Returns:
+            The NodeExecution instance if found, None otherwise
+        """
+        execution = self._node_execution_cache.get(node_execution_id)
+        if execution is not None:
+            return execution
+        # finished or evicted executions are read back once written
+        self.flush()
+        return super().get_by_node_execution_id(node_execution_id)
+
+    def get_db_models_by_workflow_run(
+        self,
+        workflow_run_id: str,
+        order_config: Optional[OrderConfig] = None,
+    ) -> Sequence[WorkflowNodeExecutionModel]:
+        self.flush()
+        return super().get_db_models_by_workflow_run(workflow_run_id, order_config)
+
+    def get_running_executions(self, workflow_run_id: str) -> Sequence[WorkflowNodeExecution]:
+        self.flush()
+        return super().get_running_executions(workflow_run_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._attempts.clear()
+        super().clear()
+
+
+node_execution_flusher = NodeExecutionFlusher(
+    interval=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL,
+    batch_size=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_BATCH_SIZE,
+    max_attempts=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_MAX_ATTEMPTS,
+)
+atexit.register(node_execution_flusher.flush_all)
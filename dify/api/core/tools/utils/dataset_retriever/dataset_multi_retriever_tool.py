@@ -1,4 +1,4 @@
-import threading
+import functools
 from typing import Any
 
 from flask import Flask, current_app
@@ -11,6 +11,7 @@ from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.entities.citation_metadata import RetrievalSourceMetadata
 from core.rag.models.document import Document as RagDocument
 from core.rag.rerank.rerank_model import RerankModelRunner
+from core.rag.retrieval.retrieval_executor import dataset_retrieval_executor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from core.tools.utils.dataset_retriever.dataset_retriever_base_tool import DatasetRetrieverBaseTool
 from extensions.ext_database import db
@@ -46,23 +47,21 @@ class DatasetMultiRetrieverTool(DatasetRetrieverBaseTool):
         )
 
     def _run(self, query: str) -> str:
-        threads = []
-        all_documents: list[RagDocument] = []
-        for dataset_id in self.dataset_ids:
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "all_documents": all_documents,
-                    "hit_callbacks": self.hit_callbacks,
-                },
+        flask_app = current_app._get_current_object()  # type: ignore
+        tasks = {
+            dataset_id: functools.partial(
+                self._retriever,
+                flask_app=flask_app,
+                dataset_id=dataset_id,
+                query=query,
+                hit_callbacks=self.hit_callbacks,
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+            for dataset_id in self.dataset_ids
+        }
+        all_documents: list[RagDocument] = []
+        for task_result in dataset_retrieval_executor.run(tasks):
+            if task_result.result:
+                all_documents.extend(task_result.result)
         # do rerank for searched documents
         model_manager = ModelManager()
         rerank_model_instance = model_manager.get_model_instance(
@@ -158,9 +157,9 @@ class DatasetMultiRetrieverTool(DatasetRetrieverBaseTool):
         flask_app: Flask,
         dataset_id: str,
         query: str,
-        all_documents: list,
         hit_callbacks: list[DatasetIndexToolCallbackHandler],
-    ):
+    ) -> list[RagDocument]:
+        all_documents: list[RagDocument] = []
         with flask_app.app_context():
             dataset = (
                 db.session.query(Dataset).filter(Dataset.tenant_id == self.tenant_id, Dataset.id == dataset_id).first()
@@ -204,3 +203,4 @@ class DatasetMultiRetrieverTool(DatasetRetrieverBaseTool):
                     )
 
                     all_documents.extend(documents)
+        return all_documents
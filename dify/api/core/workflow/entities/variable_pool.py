@@ -1,13 +1,13 @@
 import re
 from collections import defaultdict
 from collections.abc import Mapping, Sequence
-from typing import Any, Union
+from typing import Any, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 from core.file import File, FileAttribute, file_manager
 from core.variables import Segment, SegmentGroup, Variable
-from core.variables.segments import FileSegment, NoneSegment
+from core.variables.segments import FileSegment, NoneSegment, ObjectSegment
 from factories import variable_factory
 
 from ..constants import CONVERSATION_VARIABLE_NODE_ID, ENVIRONMENT_VARIABLE_NODE_ID, SYSTEM_VARIABLE_NODE_ID
@@ -18,12 +18,29 @@ VariableValue = Union[str, int, float, dict, list, File]
 VARIABLE_PATTERN = re.compile(r"\{\{#([a-zA-Z0-9_]{1,50}(?:\.[a-zA-Z_][a-zA-Z0-9_]{0,29}){1,10})#\}\}")
 
 
+def _validate_value(value: Any, /) -> None:
+    """
+    Raise for a value `variable_factory.build_segment` does not support, without building segments.
+    Values nested in an object are resolved on read, they are checked when the object is added.
+    """
+    if isinstance(value, dict):
+        for item in value.values():
+            _validate_value(item)
+    elif isinstance(value, list):
+        for item in value:
+            # objects in arrays are not resolved on read
+            if not isinstance(item, dict):
+                _validate_value(item)
+    elif value is not None and not isinstance(value, str | int | float | File):
+        raise ValueError(f"not supported value {value}")
+
+
 class VariablePool(BaseModel):
     # Variable dictionary is a dictionary for looking up variables by their selector.
     # The first element of the selector is the node id, it's the first-level key in the dictionary.
-    # Other elements of the selector are the keys in the second-level dictionary. To get the key, we hash the
-    # elements of the selector except the first one.
-    variable_dictionary: dict[str, dict[int, Segment]] = Field(
+    # The other elements of the selector, as a tuple, are the key in the second-level dictionary.
+    # Keys nested in an object are not stored on their own, they are resolved from the object on read.
+    variable_dictionary: dict[str, dict[tuple[str, ...], Segment]] = Field(
         description="Variables mapping",
         default=defaultdict(dict),
     )
@@ -42,6 +59,10 @@ class VariablePool(BaseModel):
         description="Conversation variables.",
         default_factory=list,
     )
+    # A child scope reads through to its parent pool and only stores its own writes and removals.
+    _parent: Optional["VariablePool"] = PrivateAttr(default=None)
+    _removed_nodes: set[str] = PrivateAttr(default_factory=set)
+    _removed_keys: set[tuple[str, tuple[str, ...]]] = PrivateAttr(default_factory=set)
 
     def __init__(
         self,
@@ -99,11 +120,12 @@ class VariablePool(BaseModel):
         if isinstance(value, Segment):
             variable = variable_factory.segment_to_variable(segment=value, selector=selector)
         else:
+            if isinstance(value, dict):
+                _validate_value(value)
             segment = variable_factory.build_segment(value)
             variable = variable_factory.segment_to_variable(segment=segment, selector=selector)
 
-        hash_key = hash(tuple(selector[1:]))
-        self.variable_dictionary[selector[0]][hash_key] = variable
+        self.variable_dictionary[selector[0]][tuple(selector[1:])] = variable
 
     def get(self, selector: Sequence[str], /) -> Segment | None:
         """
@@ -121,8 +143,9 @@ class VariablePool(BaseModel):
         if len(selector) < 2:
             return None
 
-        hash_key = hash(tuple(selector[1:]))
-        value = self.variable_dictionary[selector[0]].get(hash_key)
+        value = self._lookup(selector[0], tuple(selector[1:]))
+        if value is None:
+            value = self._get_nested(selector)
 
         if value is None:
             selector, attr = selector[:-1], selector[-1]
@@ -154,9 +177,65 @@ class VariablePool(BaseModel):
             return
         if len(selector) == 1:
             self.variable_dictionary[selector[0]] = {}
+            if self._parent is not None:
+                self._removed_nodes.add(selector[0])
             return
-        hash_key = hash(tuple(selector[1:]))
-        self.variable_dictionary[selector[0]].pop(hash_key, None)
+        key = tuple(selector[1:])
+        self.variable_dictionary[selector[0]].pop(key, None)
+        if self._parent is not None:
+            self._removed_keys.add((selector[0], key))
+
+    def create_child(self) -> "VariablePool":
+        """
+        Create a copy-on-write scope of the pool, e.g. for a parallel iteration run.
+
+        The child reads through to this pool and shares its segments, its writes and removals
+        are only visible in the child. This pool must not be changed while the child is in use.
+
+        Returns:
+            VariablePool: The child pool.
+        """
+        child = VariablePool.model_construct(
+            variable_dictionary=defaultdict(dict),
+            user_inputs=self.user_inputs,
+            system_variables=self.system_variables,
+            environment_variables=self.environment_variables,
+            conversation_variables=self.conversation_variables,
+        )
+        child._parent = self
+        return child
+
+    def _lookup(self, node_id: str, key: tuple[str, ...], /) -> Segment | None:
+        pool: Optional[VariablePool] = self
+        while pool is not None:
+            variables = pool.variable_dictionary.get(node_id)
+            if variables is not None and key in variables:
+                return variables[key]
+            if node_id in pool._removed_nodes or (node_id, key) in pool._removed_keys:
+                return None
+            pool = pool._parent
+        return None
+
+    def _get_nested(self, selector: Sequence[str], /) -> Segment | None:
+        """
+        Resolve a selector pointing into an object, e.g. `["node", "body", "a", "b"]` for the value added
+        as `["node", "body"]`. The closest added object is walked and only the value found becomes a segment.
+        """
+        node_id, keys = selector[0], tuple(selector[1:])
+        for end in range(len(keys) - 1, 0, -1):
+            parent = self._lookup(node_id, keys[:end])
+            if parent is None:
+                continue
+            if not isinstance(parent, ObjectSegment):
+                return None
+            value: Any = parent.value
+            for key in keys[end:]:
+                if not isinstance(value, Mapping) or key not in value:
+                    return None
+                value = value[key]
+            segment = variable_factory.build_segment(value)
+            return variable_factory.segment_to_variable(segment=segment, selector=list(selector))
+        return None
 
     def convert_template(self, template: str, /):
         parts = VARIABLE_PATTERN.split(template)
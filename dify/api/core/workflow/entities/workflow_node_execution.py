@@ -39,6 +39,7 @@ class WorkflowNodeExecutionMetadataKey(StrEnum):
     LOOP_DURATION_MAP = "loop_duration_map"  # single loop duration if loop node runs
     ERROR_STRATEGY = "error_strategy"  # node in continue on error mode return the field
     LOOP_VARIABLE_MAP = "loop_variable_map"  # single loop variable output
+    SCHEDULING_LATENCY = "scheduling_latency"  # seconds from the node being ready until it started
 
 
 class WorkflowNodeExecutionStatus(StrEnum):
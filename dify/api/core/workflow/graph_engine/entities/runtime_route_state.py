@@ -46,6 +46,9 @@ class RouteNodeState(BaseModel):
 
     index: int = 1
 
+    scheduling_latency: float = 0.0
+    """time in seconds from the node being ready until it started"""
+
     def set_finished(self, run_result: NodeRunResult) -> None:
         """
         Node finished
@@ -5,7 +5,7 @@ import time
 import uuid
 from collections.abc import Generator, Mapping
 from concurrent.futures import ThreadPoolExecutor, wait
-from copy import copy, deepcopy
+from copy import copy
 from datetime import UTC, datetime
 from typing import Any, Optional, cast
 
@@ -15,7 +15,7 @@ from configs import dify_config
 from core.app.apps.base_app_queue_manager import GenerateTaskStoppedError
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.workflow.entities.node_entities import AgentNodeStrategyInit, NodeRunResult
-from core.workflow.entities.variable_pool import VariablePool, VariableValue
+from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.entities.workflow_node_execution import WorkflowNodeExecutionMetadataKey, WorkflowNodeExecutionStatus
 from core.workflow.graph_engine.condition_handlers.condition_manager import ConditionManager
 from core.workflow.graph_engine.entities.event import (
@@ -42,6 +42,7 @@ from core.workflow.graph_engine.entities.graph import Graph, GraphEdge
 from core.workflow.graph_engine.entities.graph_init_params import GraphInitParams
 from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntimeState
 from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
+from core.workflow.graph_engine.node_scheduler import node_scheduler
 from core.workflow.nodes import NodeType
 from core.workflow.nodes.agent.agent_node import AgentNode
 from core.workflow.nodes.agent.entities import AgentNodeData
@@ -228,12 +229,14 @@ class GraphEngine:
         parent_parallel_id: Optional[str] = None,
         parent_parallel_start_node_id: Optional[str] = None,
         handle_exceptions: list[str] = [],
+        ready_at: Optional[float] = None,
     ) -> Generator[GraphEngineEvent, None, None]:
         parallel_start_node_id = None
         if in_parallel_id:
             parallel_start_node_id = start_node_id
 
         next_node_id = start_node_id
+        ready_at = ready_at or time.perf_counter()
         previous_route_node_state: Optional[RouteNodeState] = None
         while True:
             # max steps reached
@@ -283,6 +286,7 @@ class GraphEngine:
                     parent_parallel_id=parent_parallel_id,
                     parent_parallel_start_node_id=parent_parallel_start_node_id,
                     handle_exceptions=handle_exceptions,
+                    ready_at=ready_at,
                 )
 
                 for item in generator:
@@ -437,6 +441,8 @@ class GraphEngine:
             if in_parallel_id and self.graph.node_parallel_mapping.get(next_node_id, "") != in_parallel_id:
                 break
 
+            ready_at = time.perf_counter()
+
     def _run_parallel_branches(
         self,
         edge_mappings: list[GraphEdge],
@@ -488,6 +494,7 @@ class GraphEngine:
                     "parent_parallel_id": in_parallel_id,
                     "parent_parallel_start_node_id": parallel_start_node_id,
                     "handle_exceptions": handle_exceptions,
+                    "ready_at": time.perf_counter(),
                 },
             )
 
@@ -497,23 +504,21 @@ class GraphEngine:
 
         succeeded_count = 0
         while True:
-            try:
-                event = q.get(timeout=1)
-                if event is None:
-                    break
+            # every branch ends with a succeeded or failed event, so the queue is waited on without polling
+            event = q.get()
+            if event is None:
+                break
 
-                yield event
-                if not isinstance(event, BaseAgentEvent) and event.parallel_id == parallel_id:
-                    if isinstance(event, ParallelBranchRunSucceededEvent):
-                        succeeded_count += 1
-                        if succeeded_count == len(futures):
-                            q.put(None)
-
-                        continue
-                    elif isinstance(event, ParallelBranchRunFailedEvent):
-                        raise GraphRunFailedError(event.error)
-            except queue.Empty:
-                continue
+            yield event
+            if not isinstance(event, BaseAgentEvent) and event.parallel_id == parallel_id:
+                if isinstance(event, ParallelBranchRunSucceededEvent):
+                    succeeded_count += 1
+                    if succeeded_count == len(futures):
+                        q.put(None)
+
+                    continue
+                elif isinstance(event, ParallelBranchRunFailedEvent):
+                    raise GraphRunFailedError(event.error)
 
         # wait all threads
         wait(futures)
@@ -533,6 +538,7 @@ class GraphEngine:
         parent_parallel_id: Optional[str] = None,
         parent_parallel_start_node_id: Optional[str] = None,
         handle_exceptions: list[str] = [],
+        ready_at: Optional[float] = None,
     ) -> None:
         """
         Run parallel nodes
@@ -571,6 +577,7 @@ class GraphEngine:
                     parent_parallel_id=parent_parallel_id,
                     parent_parallel_start_node_id=parent_parallel_start_node_id,
                     handle_exceptions=handle_exceptions,
+                    ready_at=ready_at,
                 )
 
                 for item in generator:
@@ -616,6 +623,42 @@ class GraphEngine:
         parent_parallel_id: Optional[str] = None,
         parent_parallel_start_node_id: Optional[str] = None,
         handle_exceptions: list[str] = [],
+        ready_at: Optional[float] = None,
+    ) -> Generator[GraphEngineEvent, None, None]:
+        """
+        Run node once the node scheduler grants it a slot
+        """
+        # iteration and loop nodes wait for the nodes they run, they must not hold a slot meanwhile
+        acquired = node_instance.node_type not in {NodeType.ITERATION, NodeType.LOOP} and node_scheduler.acquire(
+            self.thread_pool_id
+        )
+        try:
+            if ready_at is not None:
+                route_node_state.scheduling_latency = time.perf_counter() - ready_at
+                node_scheduler.observe(node_instance.node_type.value, route_node_state.scheduling_latency)
+            route_node_state.start_at = datetime.now(UTC).replace(tzinfo=None)
+            yield from self._execute_node(
+                node_instance=node_instance,
+                route_node_state=route_node_state,
+                parallel_id=parallel_id,
+                parallel_start_node_id=parallel_start_node_id,
+                parent_parallel_id=parent_parallel_id,
+                parent_parallel_start_node_id=parent_parallel_start_node_id,
+                handle_exceptions=handle_exceptions,
+            )
+        finally:
+            if acquired:
+                node_scheduler.release(self.thread_pool_id)
+
+    def _execute_node(
+        self,
+        node_instance: BaseNode[BaseNodeData],
+        route_node_state: RouteNodeState,
+        parallel_id: Optional[str] = None,
+        parallel_start_node_id: Optional[str] = None,
+        parent_parallel_id: Optional[str] = None,
+        parent_parallel_start_node_id: Optional[str] = None,
+        handle_exceptions: list[str] = [],
     ) -> Generator[GraphEngineEvent, None, None]:
         """
         Run node
@@ -651,8 +694,6 @@ class GraphEngine:
             try:
                 # run node
                 retry_start_at = datetime.now(UTC).replace(tzinfo=None)
-                # yield control to other threads
-                time.sleep(0.001)
                 generator = node_instance.run()
                 for item in generator:
                     if isinstance(item, GraphEngineEvent):
@@ -701,6 +742,13 @@ class GraphEngine:
                                     )
                                     time.sleep(retry_interval)
                                     break
+                            if route_node_state.scheduling_latency:
+                                run_result.metadata = {
+                                    **(run_result.metadata or {}),
+                                    WorkflowNodeExecutionMetadataKey.SCHEDULING_LATENCY: round(
+                                        route_node_state.scheduling_latency, 6
+                                    ),
+                                }
                             route_node_state.set_finished(run_result=run_result)
 
                             if run_result.status == WorkflowNodeExecutionStatus.FAILED:
@@ -716,11 +764,9 @@ class GraphEngine:
                                     route_node_state.status = RouteNodeState.Status.EXCEPTION
                                     if run_result.outputs:
                                         for variable_key, variable_value in run_result.outputs.items():
-                                            # append variables to variable pool recursively
-                                            self._append_variables_recursively(
-                                                node_id=node_instance.node_id,
-                                                variable_key_list=[variable_key],
-                                                variable_value=variable_value,
+                                            # keys nested in objects are resolved by the variable pool on read
+                                            self.graph_runtime_state.variable_pool.add(
+                                                [node_instance.node_id, variable_key], variable_value
                                             )
                                     yield NodeRunExceptionEvent(
                                         error=run_result.error or "System Error",
@@ -771,11 +817,9 @@ class GraphEngine:
                                 # append node output variables to variable pool
                                 if run_result.outputs:
                                     for variable_key, variable_value in run_result.outputs.items():
-                                        # append variables to variable pool recursively
-                                        self._append_variables_recursively(
-                                            node_id=node_instance.node_id,
-                                            variable_key_list=[variable_key],
-                                            variable_value=variable_value,
+                                        # keys nested in objects are resolved by the variable pool on read
+                                        self.graph_runtime_state.variable_pool.add(
+                                            [node_instance.node_id, variable_key], variable_value
                                         )
 
                                 # When setting metadata, convert to dict first
@@ -860,25 +904,6 @@ class GraphEngine:
                 logger.exception(f"Node {node_instance.node_data.title} run failed")
                 raise e
 
-    def _append_variables_recursively(self, node_id: str, variable_key_list: list[str], variable_value: VariableValue):
-        """
-        Append variables recursively
-        :param node_id: node id
-        :param variable_key_list: variable key list
-        :param variable_value: variable value
-        :return:
-        """
-        self.graph_runtime_state.variable_pool.add([node_id] + variable_key_list, variable_value)
-
-        # if variable_value is a dict, then recursively append variables
-        if isinstance(variable_value, dict):
-            for key, value in variable_value.items():
-                # construct new key list
-                new_key_list = variable_key_list + [key]
-                self._append_variables_recursively(
-                    node_id=node_id, variable_key_list=new_key_list, variable_value=value
-                )
-
     def _is_timed_out(self, start_at: float, max_execution_time: int) -> bool:
         """
         Check timeout
@@ -891,11 +916,11 @@ class GraphEngine:
     def create_copy(self):
         """
         create a graph engine copy
-        :return: graph engine with a new variable pool and initialized total tokens
+        :return: graph engine with a child scope of the variable pool and initialized total tokens
         """
         new_instance = copy(self)
         new_instance.graph_runtime_state = copy(self.graph_runtime_state)
-        new_instance.graph_runtime_state.variable_pool = deepcopy(self.graph_runtime_state.variable_pool)
+        new_instance.graph_runtime_state.variable_pool = self.graph_runtime_state.variable_pool.create_child()
         new_instance.graph_runtime_state.total_tokens = 0
         return new_instance
 
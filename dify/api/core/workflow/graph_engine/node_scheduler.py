@@ -0,0 +1,110 @@
+import contextvars
+import threading
+from collections import OrderedDict, deque
+from typing import Any
+
+from configs import dify_config
+from libs.latency_histogram import LatencyHistogram
+
+# set while the current context executes a node, nested workflow runs started by the node reuse its slot
+_holding_slot: contextvars.ContextVar[bool] = contextvars.ContextVar("node_scheduler_holding_slot", default=False)
+
+
+class NodeScheduler:
+    """
+    Process-wide admission of node executions, shared by the graph runs of the process.
+
+    At most `max_concurrency` nodes execute at once, and at most `max_concurrency_per_run` of them belong to
+    the same run. Freed slots are handed to the waiting runs in turn, so a run with many parallel branches
+    does not starve the other runs. Latencies from a node being ready until it starts are recorded per node type.
+    """
+
+    def __init__(self, max_concurrency: int, max_concurrency_per_run: int) -> None:
+        self._max_concurrency = max_concurrency
+        self._max_concurrency_per_run = max_concurrency_per_run
+        self._lock = threading.Lock()
+        self._running: dict[str, int] = {}
+        self._running_count = 0
+        # waiting runs in turn order, each with its waiters in arrival order
+        self._waiting: OrderedDict[str, deque[threading.Event]] = OrderedDict()
+        self._histograms: dict[str, LatencyHistogram] = {}
+
+    def acquire(self, run_id: str) -> bool:
+        """
+        Wait for a slot of the run.
+
+        :return: whether a slot was taken, False if the current context already holds one
+        """
+        if _holding_slot.get():
+            return False
+        with self._lock:
+            if run_id not in self._waiting and self._can_run(run_id):
+                self._take(run_id)
+                event = None
+            else:
+                event = threading.Event()
+                self._waiting.setdefault(run_id, deque()).append(event)
+        if event is not None:
+            event.wait()
+        _holding_slot.set(True)
+        return True
+
+    def release(self, run_id: str) -> None:
+        _holding_slot.set(False)
+        with self._lock:
+            self._running[run_id] -= 1
+            if not self._running[run_id]:
+                del self._running[run_id]
+            self._running_count -= 1
+            self._dispatch()
+
+    def observe(self, node_type: str, latency: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(node_type)
+            if histogram is None:
+                histogram = self._histograms[node_type] = LatencyHistogram()
+            histogram.observe(latency)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "running": self._running_count,
+                "waiting": sum(len(events) for events in self._waiting.values()),
+                "scheduling_latency": {
+                    node_type: histogram.to_dict() for node_type, histogram in self._histograms.items()
+                },
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def _can_run(self, run_id: str) -> bool:
+        return (
+            self._running_count < self._max_concurrency and self._running.get(run_id, 0) < self._max_concurrency_per_run
+        )
+
+    def _take(self, run_id: str) -> None:
+        self._running[run_id] = self._running.get(run_id, 0) + 1
+        self._running_count += 1
+
+    def _dispatch(self) -> None:
+        while self._running_count < self._max_concurrency:
+            run_id = next((run_id for run_id in self._waiting if self._can_run(run_id)), None)
+            if run_id is None:
+                return
+            events = self._waiting[run_id]
+            event = events.popleft()
+            if events:
+                # the run waits again behind the other waiting runs
+                self._waiting.move_to_end(run_id)
+            else:
+                del self._waiting[run_id]
+            self._take(run_id)
+            event.set()
+
+
+node_scheduler = NodeScheduler(
+    max_concurrency=dify_config.WORKFLOW_NODE_MAX_CONCURRENCY,
+    max_concurrency_per_run=dify_config.WORKFLOW_NODE_MAX_CONCURRENCY_PER_RUN,
+)
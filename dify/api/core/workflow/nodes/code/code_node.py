@@ -1,13 +1,15 @@
 from collections.abc import Mapping, Sequence
 from typing import Any, Optional
 
+import contexts
 from configs import dify_config
 from core.helper.code_executor.code_executor import CodeExecutionError, CodeExecutor, CodeLanguage
 from core.helper.code_executor.code_node_provider import CodeNodeProvider
 from core.helper.code_executor.javascript.javascript_code_provider import JavascriptCodeProvider
 from core.helper.code_executor.python3.python3_code_provider import Python3CodeProvider
-from core.variables.segments import ArrayFileSegment
+from core.variables.segments import ArrayFileSegment, IntegerSegment
 from core.workflow.entities.node_entities import NodeRunResult
+from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.entities.workflow_node_execution import WorkflowNodeExecutionStatus
 from core.workflow.nodes.base import BaseNode
 from core.workflow.nodes.code.entities import CodeNodeData
@@ -46,21 +48,22 @@ class CodeNode(BaseNode[CodeNodeData]):
         code = self.node_data.code
 
         # Get variables
-        variables = {}
-        for variable_selector in self.node_data.variables:
-            variable_name = variable_selector.variable
-            variable = self.graph_runtime_state.variable_pool.get(variable_selector.value_selector)
-            if isinstance(variable, ArrayFileSegment):
-                variables[variable_name] = [v.to_dict() for v in variable.value] if variable.value else None
-            else:
-                variables[variable_name] = variable.to_object() if variable else None
+        variables = self.build_inputs(self.node_data, self.graph_runtime_state.variable_pool)
         # Run code
         try:
-            result = CodeExecutor.execute_workflow_code_template(
-                language=code_language,
-                code=code,
-                inputs=variables,
-            )
+            # an iteration may have planned the executions of all its items in batches
+            result = None
+            if planned := contexts.code_execution_batches.get({}).get(self.node_id):
+                iteration_node_id, batch = planned
+                index = self.graph_runtime_state.variable_pool.get([iteration_node_id, "index"])
+                if isinstance(index, IntegerSegment):
+                    result = batch.execute(index.value, variables)
+            if result is None:
+                result = CodeExecutor.execute_workflow_code_template(
+                    language=code_language,
+                    code=code,
+                    inputs=variables,
+                )
 
             # Transform result
             result = self._transform_result(result=result, output_schema=self.node_data.outputs)
@@ -71,6 +74,24 @@ class CodeNode(BaseNode[CodeNodeData]):
 
         return NodeRunResult(status=WorkflowNodeExecutionStatus.SUCCEEDED, inputs=variables, outputs=result)
 
+    @classmethod
+    def build_inputs(cls, node_data: CodeNodeData, variable_pool: VariablePool) -> dict[str, Any]:
+        """
+        Build the inputs of the code from the variable pool
+        :param node_data: node data
+        :param variable_pool: variable pool
+        :return:
+        """
+        variables: dict[str, Any] = {}
+        for variable_selector in node_data.variables:
+            variable_name = variable_selector.variable
+            variable = variable_pool.get(variable_selector.value_selector)
+            if isinstance(variable, ArrayFileSegment):
+                variables[variable_name] = [v.to_dict() for v in variable.value] if variable.value else None
+            else:
+                variables[variable_name] = variable.to_object() if variable else None
+        return variables
+
     def _check_string(self, value: str | None, variable: str) -> str | None:
         """
         Check string
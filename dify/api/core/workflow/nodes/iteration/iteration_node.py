@@ -4,12 +4,14 @@ import uuid
 from collections.abc import Generator, Mapping, Sequence
 from concurrent.futures import Future, wait
 from datetime import UTC, datetime
-from queue import Empty, Queue
+from queue import Queue
 from typing import TYPE_CHECKING, Any, Optional, cast
 
 from flask import Flask, current_app, has_request_context
 
+import contexts
 from configs import dify_config
+from core.helper.code_executor.code_executor import CodeExecutionBatch
 from core.variables import ArrayVariable, IntegerVariable, NoneVariable
 from core.workflow.entities.node_entities import (
     NodeRunResult,
@@ -34,6 +36,8 @@ from core.workflow.graph_engine.entities.event import (
 )
 from core.workflow.graph_engine.entities.graph import Graph
 from core.workflow.nodes.base import BaseNode
+from core.workflow.nodes.code.code_node import CodeNode
+from core.workflow.nodes.code.entities import CodeNodeData
 from core.workflow.nodes.enums import NodeType
 from core.workflow.nodes.event import NodeEvent, RunCompletedEvent
 from core.workflow.nodes.iteration.entities import ErrorHandleMode, IterationNodeData
@@ -162,6 +166,11 @@ class IterationNode(BaseNode[IterationNodeData]):
         )
         iter_run_map: dict[str, float] = {}
         outputs: list[Any] = [None] * len(iterator_list_value)
+        code_node_id = self._plan_code_execution_batch(
+            iteration_graph=iteration_graph,
+            iterator_list_value=iterator_list_value,
+            variable_pool=variable_pool,
+        )
         try:
             if self.node_data.is_parallel:
                 futures: list[Future] = []
@@ -189,26 +198,24 @@ class IterationNode(BaseNode[IterationNodeData]):
                     futures.append(future)
                 succeeded_count = 0
                 while True:
-                    try:
-                        event = q.get(timeout=1)
-                        if event is None:
-                            break
-                        if isinstance(event, IterationRunNextEvent):
-                            succeeded_count += 1
-                            if succeeded_count == len(futures):
-                                q.put(None)
-                        yield event
-                        if isinstance(event, RunCompletedEvent):
-                            q.put(None)
-                            for f in futures:
-                                if not f.done():
-                                    f.cancel()
-                            yield event
-                        if isinstance(event, IterationRunFailedEvent):
+                    # nothing is done between events, so the queue is waited on without polling
+                    event = q.get()
+                    if event is None:
+                        break
+                    if isinstance(event, IterationRunNextEvent):
+                        succeeded_count += 1
+                        if succeeded_count == len(futures):
                             q.put(None)
-                            yield event
-                    except Empty:
-                        continue
+                    yield event
+                    if isinstance(event, RunCompletedEvent):
+                        q.put(None)
+                        for f in futures:
+                            if not f.done():
+                                f.cancel()
+                        yield event
+                    if isinstance(event, IterationRunFailedEvent):
+                        q.put(None)
+                        yield event
 
                 # wait all threads
                 wait(futures)
@@ -276,10 +283,61 @@ class IterationNode(BaseNode[IterationNodeData]):
                 )
             )
         finally:
+            if code_node_id:
+                contexts.code_execution_batches.get({}).pop(code_node_id, None)
             # remove iteration variable (item, index) from variable pool after iteration run completed
             variable_pool.remove([self.node_id, "index"])
             variable_pool.remove([self.node_id, "item"])
 
+    def _plan_code_execution_batch(
+        self, *, iteration_graph: Graph, iterator_list_value: Sequence[Any], variable_pool: VariablePool
+    ) -> Optional[str]:
+        """
+        Plan the executions of a code node run first in every iteration, so the items are sent to the
+        code execution service in batches instead of one request per item.
+        Only a code node whose inputs are known before the iteration runs, and which is not retried, qualifies.
+        :return: id of the planned code node
+        """
+        if not dify_config.CODE_EXECUTION_BATCH_SIZE or len(iterator_list_value) < 2:
+            return None
+
+        node_id = iteration_graph.root_node_id
+        node_config = iteration_graph.node_id_config_mapping.get(node_id, {})
+        if node_config.get("data", {}).get("type") == NodeType.ITERATION_START.value:
+            edges = iteration_graph.edge_mapping.get(node_id, [])
+            if len(edges) != 1 or edges[0].run_condition:
+                return None
+            node_id = edges[0].target_node_id
+            node_config = iteration_graph.node_id_config_mapping.get(node_id, {})
+        if node_config.get("data", {}).get("type") != NodeType.CODE.value:
+            return None
+
+        node_data = CodeNodeData.model_validate(node_config["data"])
+        if node_data.retry_config.retry_enabled:
+            return None
+        if any(
+            selector.value_selector[0] in iteration_graph.node_ids and selector.value_selector[0] != self.node_id
+            for selector in node_data.variables
+        ):
+            # inputs produced inside the iteration are only known once it runs
+            return None
+
+        inputs_list = []
+        for index, item in enumerate(iterator_list_value):
+            variable_pool.add([self.node_id, "index"], index)
+            variable_pool.add([self.node_id, "item"], item)
+            inputs_list.append(CodeNode.build_inputs(node_data, variable_pool))
+        variable_pool.add([self.node_id, "index"], 0)
+        variable_pool.add([self.node_id, "item"], iterator_list_value[0])
+
+        try:
+            batches = contexts.code_execution_batches.get()
+        except LookupError:
+            batches = {}
+            contexts.code_execution_batches.set(batches)
+        batches[node_id] = (self.node_id, CodeExecutionBatch(node_data.code_language, node_data.code, inputs_list))
+        return node_id
+
     @classmethod
     def _extract_variable_selector_to_variable_mapping(
         cls,
@@ -9,6 +9,7 @@ from configs import dify_config
 from core.app.entities.app_invoke_entities import ModelConfigWithCredentialsEntity
 from core.entities.provider_entities import QuotaUnit
 from core.file.models import File
+from core.helper.provider_configurations_cache import provider_configurations_cache
 from core.memory.token_buffer_memory import TokenBufferMemory
 from core.model_manager import ModelInstance, ModelManager
 from core.model_runtime.entities.llm_entities import LLMUsage
@@ -151,6 +152,10 @@ def deduct_llm_quota(tenant_id: str, model_instance: ModelInstance, usage: LLMUs
                     quota_used=Provider.quota_used + used_quota,
                     last_used=datetime.now(tz=UTC).replace(tzinfo=None),
                 )
+                .returning(Provider.quota_limit, Provider.quota_used)
             )
-            session.execute(stmt)
+            quotas = session.execute(stmt).all()
             session.commit()
+        # cached provider configurations only need a rebuild once the quota is exhausted
+        if any(quota_used >= quota_limit for quota_limit, quota_used in quotas):
+            provider_configurations_cache.bump_version(tenant_id)
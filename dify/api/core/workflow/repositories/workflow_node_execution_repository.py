@@ -39,6 +39,14 @@ class WorkflowNodeExecutionRepository(Protocol):
         """
         ...
 
+    def flush(self) -> None:
+        """
+        Persist the saved NodeExecution instances which are not written yet.
+
+        Implementations writing on every save have nothing to do.
+        """
+        ...
+
     def get_by_node_execution_id(self, node_execution_id: str) -> Optional[WorkflowNodeExecution]:
         """
         Retrieve a NodeExecution by its node_execution_id.
@@ -110,6 +110,8 @@ class WorkflowCycleManager:
                 )
             )
 
+        # node executions written behind must be persisted before the run is finished
+        self._workflow_node_execution_repository.flush()
         self._workflow_execution_repository.save(workflow_execution)
         return workflow_execution
 
@@ -144,6 +146,8 @@ class WorkflowCycleManager:
                 )
             )
 
+        # node executions written behind must be persisted before the run is finished
+        self._workflow_node_execution_repository.flush()
         self._workflow_execution_repository.save(execution)
         return execution
 
@@ -196,6 +200,8 @@ class WorkflowCycleManager:
                 )
             )
 
+        # node executions written behind must be persisted before the run is finished
+        self._workflow_node_execution_repository.flush()
         self._workflow_execution_repository.save(workflow_execution)
         return workflow_execution
 
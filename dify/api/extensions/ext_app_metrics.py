@@ -9,6 +9,8 @@ from dify_app import DifyApp
 
 
 def init_app(app: DifyApp):
+    from controllers.inner_api.wraps import enterprise_inner_api_only
+
     @app.after_request
     def after_request(response):
         """Add Version headers to the response."""
@@ -65,3 +67,83 @@ def init_app(app: DifyApp):
             "connection_timeout": engine.pool.timeout(),  # type: ignore
             "recycle_time": db.engine.pool._recycle,  # type: ignore
         }
+
+    @app.route("/ssrf-pool-stat")
+    @enterprise_inner_api_only
+    def ssrf_pool_stat():
+        from core.helper import ssrf_proxy
+
+        return {
+            "pid": os.getpid(),
+            "pools": ssrf_proxy.pool_stats(),
+        }
+
+    @app.route("/node-execution-flush-stat")
+    @enterprise_inner_api_only
+    def node_execution_flush_stat():
+        from core.repositories.write_behind_workflow_node_execution_repository import node_execution_flusher
+
+        return {
+            "pid": os.getpid(),
+            **node_execution_flusher.stats(),
+        }
+
+    @app.route("/node-execution-cache-stat")
+    @enterprise_inner_api_only
+    def node_execution_cache_stat():
+        from core.repositories.sqlalchemy_workflow_node_execution_repository import node_execution_cache_stats
+
+        return {
+            "pid": os.getpid(),
+            **node_execution_cache_stats(),
+        }
+
+    @app.route("/vector-pool-stat")
+    @enterprise_inner_api_only
+    def vector_pool_stat():
+        from core.rag.datasource.vdb.connection_pool import connection_pool_registry
+
+        return {
+            "pid": os.getpid(),
+            "pools": connection_pool_registry.stats(),
+        }
+
+    @app.route("/vector-cache-stat")
+    @enterprise_inner_api_only
+    def vector_cache_stat():
+        from core.rag.datasource.vdb.vector_cache import vector_cache
+
+        return {
+            "pid": os.getpid(),
+            **vector_cache.stats(),
+        }
+
+    @app.route("/embedding-cache-stat")
+    @enterprise_inner_api_only
+    def embedding_cache_stat():
+        from core.rag.embedding.embedding_cache import document_embedding_cache
+
+        return {
+            "pid": os.getpid(),
+            **document_embedding_cache.stats.snapshot(),
+        }
+
+    @app.route("/keyword-table-cache-stat")
+    @enterprise_inner_api_only
+    def keyword_table_cache_stat():
+        from core.rag.datasource.keyword.keyword_table_cache import keyword_table_cache
+
+        return {
+            "pid": os.getpid(),
+            **keyword_table_cache.stats(),
+        }
+
+    @app.route("/retrieval-cache-stat")
+    @enterprise_inner_api_only
+    def retrieval_cache_stat():
+        from core.rag.datasource.retrieval_result_cache import retrieval_result_cache
+
+        return {
+            "pid": os.getpid(),
+            **retrieval_result_cache.total_stats(),
+        }
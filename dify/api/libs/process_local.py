@@ -0,0 +1,48 @@
+import os
+import threading
+from collections.abc import Callable
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ProcessLocal(Generic[T]):
+    """
+    Lazily created object of the current process, e.g. a client keeping connections alive.
+
+    Forked processes create their own object on first use, the one inherited from the parent
+    process is left alone so connections are never shared between processes.
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._pid: Optional[int] = None
+
+    def get(self) -> T:
+        value = self._value
+        if value is not None and self._pid == os.getpid():
+            return value
+        with self._lock:
+            if self._value is None or self._pid != os.getpid():
+                self._value = self._factory()
+                self._pid = os.getpid()
+            return self._value
+
+    def peek(self) -> Optional[T]:
+        """
+        Get the object of the current process, None when it was not created yet
+        """
+        with self._lock:
+            return self._value if self._pid == os.getpid() else None
+
+    def pop(self) -> Optional[T]:
+        """
+        Drop the object, the next `get` creates a new one
+        :return: the object to close, None when the current process did not create it
+        """
+        with self._lock:
+            value, self._value = self._value, None
+            owned, self._pid = self._pid == os.getpid(), None
+        return value if owned else None
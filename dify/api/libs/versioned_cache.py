@@ -0,0 +1,127 @@
+import logging
+import threading
+from collections.abc import Callable, Hashable, Iterable, Mapping
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class VersionCounter:
+    """
+    Version counters kept in Redis, one per scope, e.g. a tenant or a dataset.
+
+    Bumping the counter of a scope invalidates whatever every worker cached under the previous
+    version. Redis errors are logged, a version of None means the cache must be bypassed.
+    """
+
+    def __init__(self, key_template: str) -> None:
+        """
+        :param key_template: Redis key of a counter, formatted with the scope id
+        """
+        self._key_template = key_template
+
+    def get(self, scope_id: str) -> Optional[int]:
+        try:
+            version = redis_client.get(self._key_template.format(scope_id))
+        except Exception:
+            logger.exception("Failed to load version %s", self._key_template.format(scope_id))
+            return None
+        return int(version) if version else 0
+
+    def bump(self, scope_id: str) -> None:
+        try:
+            redis_client.incr(self._key_template.format(scope_id))
+        except Exception:
+            logger.exception("Failed to bump version %s", self._key_template.format(scope_id))
+
+
+class VersionedCache:
+    """
+    Per-worker TTL cache of values keyed by scope id, scope version and key.
+
+    Lookups with a version of None, i.e. while Redis is unavailable, always miss and nothing is
+    stored for them. Hits and misses are counted for `stats()`.
+    """
+
+    def __init__(
+        self, version_key: str, maxsize: int, ttl: int, getsizeof: Optional[Callable[[Any], int]] = None
+    ) -> None:
+        """
+        :param version_key: Redis key of the version counter of a scope, formatted with the scope id
+        :param maxsize: maximum number of entries, or maximum size when `getsizeof` is given, 0 to disable
+        :param ttl: time to live of the entries in seconds
+        :param getsizeof: size of a value
+        """
+        self.versions = VersionCounter(version_key)
+        self._lock = threading.Lock()
+        self._entries: TTLCache = TTLCache(maxsize=maxsize or 1, ttl=ttl, getsizeof=getsizeof)
+        self._enabled = maxsize > 0
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def get_version(self, scope_id: str) -> Optional[int]:
+        return self.versions.get(scope_id)
+
+    def bump_version(self, scope_id: str) -> None:
+        self.versions.bump(scope_id)
+
+    def get(self, scope_id: str, version: Optional[int], key: Hashable = None) -> Any:
+        """
+        :return: cached value, None on a miss
+        """
+        return self.get_many(scope_id, version, [key]).get(key)
+
+    def get_many(self, scope_id: str, version: Optional[int], keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        """
+        :return: cached values of the keys that hit
+        """
+        keys = list(keys)
+        found: dict[Hashable, Any] = {}
+        with self._lock:
+            if version is not None:
+                for key in keys:
+                    value = self._entries.get((scope_id, version, key))
+                    if value is not None:
+                        found[key] = value
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        return found
+
+    def set(self, scope_id: str, version: Optional[int], value: Any, key: Hashable = None) -> None:
+        self.set_many(scope_id, version, {key: value})
+
+    def set_many(self, scope_id: str, version: Optional[int], values: Mapping[Hashable, Any]) -> None:
+        if not self._enabled or version is None:
+            return
+        with self._lock:
+            for key, value in values.items():
+                try:
+                    self._entries[(scope_id, version, key)] = value
+                except ValueError:
+                    # values larger than the whole cache are not cached
+                    continue
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "size": self._entries.currsize,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
@@ -1,7 +1,7 @@
 import json
 import re
 import uuid
-from collections.abc import Mapping
+from collections.abc import Callable, Mapping, Sequence
 from datetime import datetime
 from enum import Enum, StrEnum
 from typing import TYPE_CHECKING, Any, Literal, Optional, cast
@@ -708,8 +708,11 @@ class Conversation(Base):
                 else:
                     model_config["configs"] = override_model_configs
             else:
-                app_model_config = (
-                    db.session.query(AppModelConfig).filter(AppModelConfig.id == self.app_model_config_id).first()
+                app_model_config = self._aggregate(
+                    "app_model_config",
+                    lambda: db.session.query(AppModelConfig)
+                    .filter(AppModelConfig.id == self.app_model_config_id)
+                    .first(),
                 )
                 if app_model_config:
                     model_config = app_model_config.to_dict()
@@ -732,47 +735,39 @@ class Conversation(Base):
 
     @property
     def annotated(self):
-        return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).count() > 0
+        return self._aggregate(
+            "annotated",
+            lambda: db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).count()
+            > 0,
+        )
 
     @property
     def annotation(self):
-        return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).first()
+        return self._aggregate(
+            "annotation",
+            lambda: db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).first(),
+        )
 
     @property
     def message_count(self):
-        return db.session.query(Message).filter(Message.conversation_id == self.id).count()
+        return self._aggregate(
+            "message_count", lambda: db.session.query(Message).filter(Message.conversation_id == self.id).count()
+        )
 
     @property
     def user_feedback_stats(self):
-        like = (
-            db.session.query(MessageFeedback)
-            .filter(
-                MessageFeedback.conversation_id == self.id,
-                MessageFeedback.from_source == "user",
-                MessageFeedback.rating == "like",
-            )
-            .count()
-        )
-
-        dislike = (
-            db.session.query(MessageFeedback)
-            .filter(
-                MessageFeedback.conversation_id == self.id,
-                MessageFeedback.from_source == "user",
-                MessageFeedback.rating == "dislike",
-            )
-            .count()
-        )
-
-        return {"like": like, "dislike": dislike}
+        return self._aggregate("user_feedback_stats", lambda: self._feedback_stats("user"))
 
     @property
     def admin_feedback_stats(self):
+        return self._aggregate("admin_feedback_stats", lambda: self._feedback_stats("admin"))
+
+    def _feedback_stats(self, from_source: str) -> dict[str, int]:
         like = (
             db.session.query(MessageFeedback)
             .filter(
                 MessageFeedback.conversation_id == self.id,
-                MessageFeedback.from_source == "admin",
+                MessageFeedback.from_source == from_source,
                 MessageFeedback.rating == "like",
             )
             .count()
@@ -782,7 +777,7 @@ class Conversation(Base):
             db.session.query(MessageFeedback)
             .filter(
                 MessageFeedback.conversation_id == self.id,
-                MessageFeedback.from_source == "admin",
+                MessageFeedback.from_source == from_source,
                 MessageFeedback.rating == "dislike",
             )
             .count()
@@ -792,6 +787,9 @@ class Conversation(Base):
 
     @property
     def status_count(self):
+        return self._aggregate("status_count", self._status_count)
+
+    def _status_count(self) -> Optional[dict[str, int]]:
         messages = db.session.query(Message).filter(Message.conversation_id == self.id).all()
         status_counts = {
             WorkflowExecutionStatus.RUNNING: 0,
@@ -817,14 +815,19 @@ class Conversation(Base):
 
     @property
     def first_message(self):
-        return db.session.query(Message).filter(Message.conversation_id == self.id).first()
+        return self._aggregate(
+            "first_message", lambda: db.session.query(Message).filter(Message.conversation_id == self.id).first()
+        )
 
     @property
     def app(self):
-        return db.session.query(App).filter(App.id == self.app_id).first()
+        return self._aggregate("app", lambda: db.session.query(App).filter(App.id == self.app_id).first())
 
     @property
     def from_end_user_session_id(self):
+        return self._aggregate("from_end_user_session_id", self._from_end_user_session_id)
+
+    def _from_end_user_session_id(self) -> Optional[str]:
         if self.from_end_user_id:
             end_user = db.session.query(EndUser).filter(EndUser.id == self.from_end_user_id).first()
             if end_user:
@@ -834,6 +837,9 @@ class Conversation(Base):
 
     @property
     def from_account_name(self):
+        return self._aggregate("from_account_name", self._from_account_name)
+
+    def _from_account_name(self) -> Optional[str]:
         if self.from_account_id:
             account = db.session.query(Account).filter(Account.id == self.from_account_id).first()
             if account:
@@ -841,6 +847,154 @@ class Conversation(Base):
 
         return None
 
+    def _aggregate(self, name: str, load: Callable[[], Any]) -> Any:
+        """
+        Get an aggregate attached by `load_aggregates`, or load it for this conversation alone.
+        """
+        aggregates = self.__dict__.get("_aggregates")
+        if aggregates is not None and name in aggregates:
+            return aggregates[name]
+        return load()
+
+    @staticmethod
+    def load_aggregates(conversations: Sequence["Conversation"]) -> None:
+        """
+        Load the aggregates of a page of conversations with a few grouped queries and attach them to the
+        conversations, so marshalling the page does not query per conversation.
+
+        :param conversations: conversations of the page
+        """
+        if not conversations:
+            return
+
+        from .workflow import WorkflowRun
+
+        conversation_ids = [conversation.id for conversation in conversations]
+        aggregates: dict[str, dict[str, Any]] = {
+            conversation_id: {
+                "message_count": 0,
+                "annotated": False,
+                "annotation": None,
+                "user_feedback_stats": {"like": 0, "dislike": 0},
+                "admin_feedback_stats": {"like": 0, "dislike": 0},
+                "first_message": None,
+            }
+            for conversation_id in conversation_ids
+        }
+
+        # message counts by workflow run status, NULL for messages without workflow run
+        status_counts: dict[str, dict[Optional[str], int]] = {
+            conversation_id: {} for conversation_id in conversation_ids
+        }
+        for conversation_id, status, count in (
+            db.session.query(Message.conversation_id, WorkflowRun.status, func.count(Message.id))
+            .outerjoin(WorkflowRun, WorkflowRun.id == Message.workflow_run_id)
+            .filter(Message.conversation_id.in_(conversation_ids))
+            .group_by(Message.conversation_id, WorkflowRun.status)
+            .all()
+        ):
+            status_counts[conversation_id][status] = count
+            aggregates[conversation_id]["message_count"] += count
+        for conversation_id, counts in status_counts.items():
+            aggregates[conversation_id]["status_count"] = (
+                {
+                    "success": counts.get(WorkflowExecutionStatus.SUCCEEDED, 0),
+                    "failed": counts.get(WorkflowExecutionStatus.FAILED, 0),
+                    "partial_success": counts.get(WorkflowExecutionStatus.PARTIAL_SUCCEEDED, 0),
+                }
+                if counts
+                else None
+            )
+
+        for annotation in (
+            db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id.in_(conversation_ids)).all()
+        ):
+            if not aggregates[annotation.conversation_id]["annotated"]:
+                aggregates[annotation.conversation_id]["annotated"] = True
+                aggregates[annotation.conversation_id]["annotation"] = annotation
+
+        for conversation_id, from_source, rating, count in (
+            db.session.query(
+                MessageFeedback.conversation_id,
+                MessageFeedback.from_source,
+                MessageFeedback.rating,
+                func.count(MessageFeedback.id),
+            )
+            .filter(MessageFeedback.conversation_id.in_(conversation_ids))
+            .group_by(MessageFeedback.conversation_id, MessageFeedback.from_source, MessageFeedback.rating)
+            .all()
+        ):
+            if from_source in {"user", "admin"} and rating in {"like", "dislike"}:
+                aggregates[conversation_id][f"{from_source}_feedback_stats"][rating] = count
+
+        ranked_messages = (
+            db.session.query(
+                Message.id.label("id"),
+                func.row_number()
+                .over(partition_by=Message.conversation_id, order_by=Message.created_at)
+                .label("position"),
+            )
+            .filter(Message.conversation_id.in_(conversation_ids))
+            .subquery()
+        )
+        for message in (
+            db.session.query(Message)
+            .join(ranked_messages, ranked_messages.c.id == Message.id)
+            .filter(ranked_messages.c.position == 1)
+            .all()
+        ):
+            aggregates[message.conversation_id]["first_message"] = message
+
+        apps = {
+            app.id: app
+            for app in db.session.query(App)
+            .filter(App.id.in_({conversation.app_id for conversation in conversations}))
+            .all()
+        }
+
+        end_user_ids = {
+            conversation.from_end_user_id for conversation in conversations if conversation.from_end_user_id
+        }
+        session_ids = (
+            dict(db.session.query(EndUser.id, EndUser.session_id).filter(EndUser.id.in_(end_user_ids)).all())
+            if end_user_ids
+            else {}
+        )
+
+        account_ids = {conversation.from_account_id for conversation in conversations if conversation.from_account_id}
+        account_names = (
+            dict(db.session.query(Account.id, Account.name).filter(Account.id.in_(account_ids)).all())
+            if account_ids
+            else {}
+        )
+
+        # only conversations whose model config is not overridden read the app model config
+        app_model_config_ids = {
+            conversation.app_model_config_id
+            for conversation in conversations
+            if conversation.app_model_config_id
+            and not conversation.override_model_configs
+            and conversation.mode != AppMode.ADVANCED_CHAT.value
+        }
+        app_model_configs = (
+            {
+                app_model_config.id: app_model_config
+                for app_model_config in db.session.query(AppModelConfig)
+                .filter(AppModelConfig.id.in_(app_model_config_ids))
+                .all()
+            }
+            if app_model_config_ids
+            else {}
+        )
+
+        for conversation in conversations:
+            conversation_aggregates = aggregates[conversation.id]
+            conversation_aggregates["app"] = apps.get(conversation.app_id)
+            conversation_aggregates["from_end_user_session_id"] = session_ids.get(conversation.from_end_user_id)
+            conversation_aggregates["from_account_name"] = account_names.get(conversation.from_account_id)
+            conversation_aggregates["app_model_config"] = app_model_configs.get(conversation.app_model_config_id)
+            conversation.__dict__["_aggregates"] = conversation_aggregates
+
     @property
     def in_debug_mode(self):
         return self.override_model_configs is not None
@@ -899,6 +1053,12 @@ class Message(Base):
     message_price_unit = db.Column(db.Numeric(10, 7), nullable=False, server_default=db.text("0.001"))
     answer: Mapped[str] = db.Column(db.Text, nullable=False)
     answer_tokens = db.Column(db.Integer, nullable=False, server_default=db.text("0"))
+    # tokens of the query and the answer as history prompt messages of conversation memory, counted on first use
+    # by the "provider:model" in memory_tokens_model, followed by the number of files and the image detail when the
+    # query has files
+    memory_tokens_model: Mapped[Optional[str]] = mapped_column(db.String(255), nullable=True)
+    memory_query_tokens: Mapped[Optional[int]] = mapped_column(db.Integer, nullable=True)
+    memory_answer_tokens: Mapped[Optional[int]] = mapped_column(db.Integer, nullable=True)
     answer_unit_price = db.Column(db.Numeric(10, 4), nullable=False)
     answer_price_unit = db.Column(db.Numeric(10, 7), nullable=False, server_default=db.text("0.001"))
     parent_message_id = db.Column(StringUUID, nullable=True)
@@ -742,6 +742,33 @@ class DocumentService:
 
         return documents
 
+    @staticmethod
+    def get_segment_progress(document_ids: list[str]) -> dict[str, tuple[int, int]]:
+        """
+        Get the completed and total segments of documents in one grouped query, segments being
+        re-segmented are not counted.
+
+        :param document_ids: document ids
+        :return: (completed segments, total segments) by document id, (0, 0) for documents without segments
+        """
+        progress = dict.fromkeys(document_ids, (0, 0))
+        if not document_ids:
+            return progress
+
+        rows = (
+            db.session.query(
+                DocumentSegment.document_id,
+                func.count(DocumentSegment.completed_at),
+                func.count(DocumentSegment.id),
+            )
+            .filter(DocumentSegment.document_id.in_(document_ids), DocumentSegment.status != "re_segment")
+            .group_by(DocumentSegment.document_id)
+            .all()
+        )
+        for document_id, completed_segments, total_segments in rows:
+            progress[document_id] = (completed_segments, total_segments)
+        return progress
+
     @staticmethod
     def get_document_file_detail(file_id: str):
         file_detail = db.session.query(UploadFile).filter(UploadFile.id == file_id).one_or_none()
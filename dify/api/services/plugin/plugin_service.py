@@ -9,6 +9,8 @@ from configs import dify_config
 from core.helper import marketplace
 from core.helper.download import download_with_size_limit
 from core.helper.marketplace import download_plugin_pkg
+from core.helper.plugin_model_cache import plugin_model_cache
+from core.helper.provider_configurations_cache import provider_configurations_cache
 from core.plugin.entities.bundle import PluginBundleDependency
 from core.plugin.entities.plugin import (
     GenericProviderID,
@@ -17,7 +19,12 @@ from core.plugin.entities.plugin import (
     PluginInstallation,
     PluginInstallationSource,
 )
-from core.plugin.entities.plugin_daemon import PluginInstallTask, PluginListResponse, PluginUploadResponse
+from core.plugin.entities.plugin_daemon import (
+    PluginInstallTask,
+    PluginInstallTaskStatus,
+    PluginListResponse,
+    PluginUploadResponse,
+)
 from core.plugin.impl.asset import PluginAssetManager
 from core.plugin.impl.debugging import PluginDebuggingClient
 from core.plugin.impl.plugin import PluginInstaller
@@ -34,6 +41,16 @@ class PluginService:
 
     REDIS_KEY_PREFIX = "plugin_service:latest_plugin:"
     REDIS_TTL = 60 * 5  # 5 minutes
+    INSTALL_TASK_BUMPED_KEY = "plugin_install_bumped:{}"
+    INSTALL_TASK_BUMPED_TTL = 60 * 60 * 24  # 1 day
+
+    @staticmethod
+    def _invalidate_plugin_caches(tenant_id: str) -> None:
+        """
+        Drop the cached plugin model providers, model schemas and provider configurations of a tenant
+        """
+        plugin_model_cache.bump_version(tenant_id)
+        provider_configurations_cache.bump_version(tenant_id)
 
     @staticmethod
     def fetch_latest_plugin_version(plugin_ids: Sequence[str]) -> Mapping[str, Optional[LatestPluginCache]]:
@@ -164,7 +181,28 @@ class PluginService:
     @staticmethod
     def fetch_install_task(tenant_id: str, task_id: str) -> PluginInstallTask:
         manager = PluginInstaller()
-        return manager.fetch_plugin_installation_task(tenant_id, task_id)
+        task = manager.fetch_plugin_installation_task(tenant_id, task_id)
+        # installations complete asynchronously, the polled task is the first place to see them done,
+        # the caches are dropped once per task however often a finished task is polled
+        if task.status == PluginInstallTaskStatus.Success and PluginService._claim_install_task_bump(task_id):
+            PluginService._invalidate_plugin_caches(tenant_id)
+        return task
+
+    @staticmethod
+    def _claim_install_task_bump(task_id: str) -> bool:
+        try:
+            return bool(
+                redis_client.set(
+                    PluginService.INSTALL_TASK_BUMPED_KEY.format(task_id),
+                    1,
+                    ex=PluginService.INSTALL_TASK_BUMPED_TTL,
+                    nx=True,
+                )
+            )
+        except Exception:
+            # without Redis the caches cannot be shared either, dropping them again is harmless
+            logger.exception("Failed to claim the cache invalidation of plugin install task %s", task_id)
+            return True
 
     @staticmethod
     def delete_install_task(tenant_id: str, task_id: str) -> bool:
@@ -217,7 +255,7 @@ class PluginService:
             pkg = download_plugin_pkg(new_plugin_unique_identifier)
             manager.upload_pkg(tenant_id, pkg, verify_signature=False)
 
-        return manager.upgrade_plugin(
+        result = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -226,6 +264,8 @@ class PluginService:
                 "plugin_unique_identifier": new_plugin_unique_identifier,
             },
         )
+        PluginService._invalidate_plugin_caches(tenant_id)
+        return result
 
     @staticmethod
     def upgrade_plugin_with_github(
@@ -240,7 +280,7 @@ class PluginService:
         Upgrade plugin with github
         """
         manager = PluginInstaller()
-        return manager.upgrade_plugin(
+        result = manager.upgrade_plugin(
             tenant_id,
             original_plugin_unique_identifier,
             new_plugin_unique_identifier,
@@ -251,6 +291,8 @@ class PluginService:
                 "package": package,
             },
         )
+        PluginService._invalidate_plugin_caches(tenant_id)
+        return result
 
     @staticmethod
     def upload_pkg(tenant_id: str, pkg: bytes, verify_signature: bool = False) -> PluginUploadResponse:
@@ -294,12 +336,14 @@ class PluginService:
     @staticmethod
     def install_from_local_pkg(tenant_id: str, plugin_unique_identifiers: Sequence[str]):
         manager = PluginInstaller()
-        return manager.install_from_identifiers(
+        result = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Package,
             [{}],
         )
+        PluginService._invalidate_plugin_caches(tenant_id)
+        return result
 
     @staticmethod
     def install_from_github(tenant_id: str, plugin_unique_identifier: str, repo: str, version: str, package: str):
@@ -308,7 +352,7 @@ class PluginService:
         returns plugin_unique_identifier
         """
         manager = PluginInstaller()
-        return manager.install_from_identifiers(
+        result = manager.install_from_identifiers(
             tenant_id,
             [plugin_unique_identifier],
             PluginInstallationSource.Github,
@@ -320,6 +364,8 @@ class PluginService:
                 }
             ],
         )
+        PluginService._invalidate_plugin_caches(tenant_id)
+        return result
 
     @staticmethod
     def fetch_marketplace_pkg(
@@ -363,7 +409,7 @@ class PluginService:
                 pkg = download_plugin_pkg(plugin_unique_identifier)
                 manager.upload_pkg(tenant_id, pkg, verify_signature)
 
-        return manager.install_from_identifiers(
+        result = manager.install_from_identifiers(
             tenant_id,
             plugin_unique_identifiers,
             PluginInstallationSource.Marketplace,
@@ -374,11 +420,15 @@ class PluginService:
                 for plugin_unique_identifier in plugin_unique_identifiers
             ],
         )
+        PluginService._invalidate_plugin_caches(tenant_id)
+        return result
 
     @staticmethod
     def uninstall(tenant_id: str, plugin_installation_id: str) -> bool:
         manager = PluginInstaller()
-        return manager.uninstall(tenant_id, plugin_installation_id)
+        result = manager.uninstall(tenant_id, plugin_installation_id)
+        PluginService._invalidate_plugin_caches(tenant_id)
+        return result
 
     @staticmethod
     def check_tools_existence(tenant_id: str, provider_ids: Sequence[GenericProviderID]) -> Sequence[bool]:
@@ -6,6 +6,7 @@ import requests
 from _pytest.monkeypatch import MonkeyPatch
 
 from core.plugin.entities.plugin_daemon import PluginDaemonBasicResponse
+from core.plugin.impl.session import plugin_daemon_session
 from core.tools.entities.common_entities import I18nObject
 from core.tools.entities.tool_entities import ToolProviderEntity, ToolProviderIdentity
 
@@ -30,7 +31,7 @@ class MockedHttp:
         cls, method: Literal["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD"], url: str, **kwargs
     ) -> requests.Response:
         """
-        Mocked requests.request
+        Mocked plugin daemon session request
         """
         request = requests.PreparedRequest()
         request.method = method
@@ -55,7 +56,7 @@ MOCK_SWITCH = os.getenv("MOCK_SWITCH", "false").lower() == "true"
 @pytest.fixture
 def setup_http_mock(request, monkeypatch: MonkeyPatch):
     if MOCK_SWITCH:
-        monkeypatch.setattr(requests, "request", MockedHttp.requests_request)
+        monkeypatch.setattr(plugin_daemon_session, "request", MockedHttp.requests_request)
 
         def unpatch():
             monkeypatch.undo()
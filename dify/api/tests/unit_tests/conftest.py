@@ -21,3 +21,29 @@ def app() -> Flask:
 def _provide_app_context(app: Flask):
     with app.app_context():
         yield
+
+
+class FakeRedis:
+    """In-memory stand-in of the Redis commands used by the per-worker caches."""
+
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value if isinstance(value, bytes) else str(value).encode()
+
+    def incr(self, key):
+        value = int(self.values.get(key, b"0")) + 1
+        self.values[key] = str(value).encode()
+        return value
+
+
+@pytest.fixture
+def fake_redis(mocker) -> FakeRedis:
+    """Redis of the version counters of the versioned caches."""
+    redis = FakeRedis()
+    mocker.patch("libs.versioned_cache.redis_client", redis)
+    return redis
@@ -0,0 +1,36 @@
+import json
+import subprocess
+import sys
+
+from tests.unit_tests.utils.local_http_server import LocalHTTPServer, LocalRequestHandler
+
+RUNNERS = {"python3": [sys.executable, "-c"], "nodejs": ["node", "-e"]}
+
+
+class _Handler(LocalRequestHandler):
+    def handle_request(self) -> None:
+        request = json.loads(self.read_body())
+        if self.path != "/v1/sandbox/run" or not self.authorized:
+            self.send_json({"code": -401, "message": "unauthorized", "data": None}, status=401)
+            return
+
+        # the preload runs before the code in the same interpreter, like in the sandbox
+        script = f"{request.get('preload') or ''}\n{request['code']}"
+        process = subprocess.run(
+            [*RUNNERS[request["language"]], script], capture_output=True, text=True, timeout=60, check=False
+        )
+        error = process.stderr if process.returncode else None
+        self.send_json({"code": 0, "message": "success", "data": {"stdout": process.stdout, "error": error}})
+
+
+class FakeSandbox(LocalHTTPServer):
+    """
+    Local stand-in of the code execution sandbox, it runs python3 and nodejs code in subprocesses.
+    Accepted connections and runs are counted.
+    """
+
+    handler_class = _Handler
+
+    @property
+    def runs(self) -> int:
+        return self.requests
@@ -0,0 +1,175 @@
+import shutil
+
+import pytest
+from yarl import URL
+
+from configs import dify_config
+from core.helper.code_executor import code_executor
+from core.helper.code_executor.code_executor import (
+    CodeExecutionBatch,
+    CodeExecutionError,
+    CodeExecutor,
+    CodeLanguage,
+)
+from tests.unit_tests.core.helper.code_executor.fake_sandbox import FakeSandbox
+
+PYTHON_CODE = """
+def main(x: int) -> dict:
+    return {"result": 12 // x}
+"""
+
+JAVASCRIPT_CODE = """
+function main({x}) {
+    if (x === 0) throw new Error("division by zero")
+    return {result: Math.floor(12 / x)}
+}
+"""
+
+
+@pytest.fixture
+def sandbox(monkeypatch):
+    with FakeSandbox(api_key=dify_config.CODE_EXECUTION_API_KEY) as sandbox:
+        monkeypatch.setattr(code_executor, "code_execution_endpoint_url", URL(sandbox.url))
+        monkeypatch.setattr(dify_config, "CODE_EXECUTION_BATCH_SIZE", 4)
+        yield sandbox
+
+
+def test_executions_reuse_connections(sandbox):
+    for x in range(1, 6):
+        result = CodeExecutor.execute_workflow_code_template(CodeLanguage.PYTHON3, PYTHON_CODE, {"x": x})
+        assert result == {"result": 12 // x}
+
+    assert sandbox.runs == 5
+    assert sandbox.connections == 1
+
+
+def test_batch_executes_inputs_in_chunks(sandbox):
+    inputs_list = [{"x": x} for x in range(10)]
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.PYTHON3, PYTHON_CODE, inputs_list)
+
+    assert sandbox.runs == 3
+    assert isinstance(results[0], CodeExecutionError)
+    assert "ZeroDivisionError" in str(results[0])
+    assert results[1:] == [{"result": 12 // x} for x in range(1, 10)]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="nodejs is not installed")
+def test_batch_executes_javascript(sandbox):
+    inputs_list = [{"x": x} for x in range(3)]
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.JAVASCRIPT, JAVASCRIPT_CODE, inputs_list)
+
+    assert sandbox.runs == 1
+    assert isinstance(results[0], CodeExecutionError)
+    assert "division by zero" in str(results[0])
+    assert results[1:] == [{"result": 12}, {"result": 6}]
+
+
+def test_batch_falls_back_to_single_executions_when_a_chunk_fails(sandbox):
+    inputs_list = [{"x": x} for x in range(1, 4)]
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.PYTHON3, "def main(x:\n", inputs_list)
+
+    assert sandbox.runs == 1 + len(inputs_list)
+    assert all(isinstance(result, CodeExecutionError) for result in results)
+
+
+def test_code_execution_batch_runs_chunks_on_first_use(sandbox):
+    inputs_list = [{"x": x} for x in range(1, 11)]
+    batch = CodeExecutionBatch(CodeLanguage.PYTHON3, PYTHON_CODE, inputs_list)
+
+    assert batch.execute(0, {"x": 1}) == {"result": 12}
+    assert batch.execute(3, {"x": 4}) == {"result": 3}
+    assert sandbox.runs == 1
+    assert batch.execute(5, {"x": 6}) == {"result": 2}
+    assert sandbox.runs == 2
+    assert batch.execute(6, {"x": 42}) is None
+    assert batch.execute(10, {"x": 1}) is None
+    assert sandbox.runs == 2
+
+
+def test_code_execution_batch_keys_duplicate_inputs_by_position(sandbox):
+    batch = CodeExecutionBatch(CodeLanguage.PYTHON3, PYTHON_CODE, [{"x": 1}, {"x": 2}, {"x": 1}])
+
+    assert [batch.execute(position, {"x": 1}) for position in range(3)] == [{"result": 12}, None, {"result": 12}]
+    assert sandbox.runs == 1
+
+
+def test_batch_runs_each_input_in_a_fresh_namespace(sandbox):
+    code = """
+calls = []
+
+def main(x: int, seen: list = []) -> dict:
+    calls.append(x)
+    seen.append(x)
+    return {"calls": len(calls), "seen": len(seen)}
+"""
+    inputs_list = [{"x": x} for x in range(3)]
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.PYTHON3, code, inputs_list)
+
+    assert sandbox.runs == 1
+    assert results == [{"calls": 1, "seen": 1}] * 3
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="nodejs is not installed")
+def test_batch_runs_each_javascript_input_in_a_fresh_scope(sandbox):
+    code = """
+const path = require("path")
+var calls = []
+
+function main({x}) {
+    calls.push(x)
+    return {calls: calls.length, name: path.basename("/a/b")}
+}
+"""
+    inputs_list = [{"x": x} for x in range(3)]
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.JAVASCRIPT, code, inputs_list)
+
+    assert sandbox.runs == 1
+    assert results == [{"calls": 1, "name": "b"}] * 3
+
+
+def test_batch_reruns_only_inputs_not_started(sandbox):
+    code = """
+import sys
+
+def main(x: int) -> dict:
+    if x == 2:
+        sys.exit(0)
+    return {"result": x}
+"""
+    inputs_list = [{"x": x} for x in range(1, 5)]
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.PYTHON3, code, inputs_list)
+
+    assert results[0] == {"result": 1}
+    assert isinstance(results[1], CodeExecutionError)
+    assert results[2:] == [{"result": 3}, {"result": 4}]
+    assert sandbox.runs == 1 + 2
+
+
+def test_batch_does_not_rerun_the_input_running_when_a_chunk_fails(sandbox, tmp_path):
+    log_path = tmp_path / "runs.log"
+    code = f"""
+import os
+
+def main(x: int) -> dict:
+    with open({str(log_path)!r}, "a") as log:
+        log.write(f"{{x}}\\n")
+    if x == 3:
+        # e.g. killed by the time limit of the sandbox
+        os._exit(1)
+    return {{"result": x}}
+"""
+    inputs_list = [{"x": x} for x in range(1, 5)]
+
+    results = CodeExecutor.execute_workflow_code_template_batch(CodeLanguage.PYTHON3, code, inputs_list)
+
+    assert results[:2] == [{"result": 1}, {"result": 2}]
+    assert isinstance(results[2], CodeExecutionError)
+    assert results[3] == {"result": 4}
+    assert sandbox.runs == 1 + 1
+    assert log_path.read_text().split() == ["1", "2", "3", "4"]
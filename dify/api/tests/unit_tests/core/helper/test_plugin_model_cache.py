@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from core.helper.plugin_model_cache import PluginModelCache
+
+
+def test_model_providers_are_cached_per_tenant(fake_redis):
+    cache = PluginModelCache(maxsize=10, ttl=60)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return ["provider"]
+
+    first = cache.get_model_providers("tenant-1", loader)
+    second = cache.get_model_providers("tenant-1", loader)
+    cache.get_model_providers("tenant-2", loader)
+
+    assert first is second
+    assert len(calls) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_invalidate_reloads_only_the_tenant(fake_redis):
+    cache = PluginModelCache(maxsize=10, ttl=60)
+    cache.get_model_schema("tenant-1", "schema", lambda: "v1")
+    cache.get_model_schema("tenant-2", "schema", lambda: "v1")
+
+    cache.bump_version("tenant-1")
+
+    assert cache.get_model_schema("tenant-1", "schema", lambda: "v2") == "v2"
+    assert cache.get_model_schema("tenant-2", "schema", lambda: "v2") == "v1"
+
+
+def test_empty_schemas_are_not_cached(fake_redis):
+    cache = PluginModelCache(maxsize=10, ttl=60)
+
+    assert cache.get_model_schema("tenant-1", "schema", lambda: None) is None
+    assert cache.get_model_schema("tenant-1", "schema", lambda: "schema") == "schema"
+
+
+def test_concurrent_misses_share_one_load(fake_redis):
+    cache = PluginModelCache(maxsize=10, ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return ["provider"]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_model_providers("tenant-1", loader))) for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    while cache.stats()["misses"] < 5:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.stats()["shared_loads"] == 4
+
+
+def test_load_errors_are_raised_to_every_waiter(fake_redis):
+    cache = PluginModelCache(maxsize=10, ttl=60)
+
+    def loader():
+        raise ValueError("daemon unavailable")
+
+    with pytest.raises(ValueError):
+        cache.get_model_providers("tenant-1", loader)
+    assert cache.get_model_providers("tenant-1", lambda: ["provider"]) == ["provider"]
+
+
+def test_cache_is_bypassed_when_redis_fails(mocker, fake_redis):
+    mocker.patch.object(fake_redis, "get", side_effect=ConnectionError)
+    cache = PluginModelCache(maxsize=10, ttl=60)
+
+    assert cache.get_model_providers("tenant-1", lambda: ["provider"]) == ["provider"]
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core import provider_manager
+from core.entities.provider_entities import ProviderQuotaType
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
+from core.model_runtime.entities.model_entities import ModelType
+from core.provider_manager import ProviderManager
+
+
+@pytest.fixture
+def cache(mocker, fake_redis):
+    cache = ProviderConfigurationsCache(maxsize=10, ttl=60)
+    mocker.patch("core.provider_manager.provider_configurations_cache", cache)
+    return cache
+
+
+def test_configurations_are_built_once_per_version(mocker, cache):
+    get_configurations = mocker.patch.object(ProviderManager, "get_configurations", side_effect=lambda _: object())
+    manager = ProviderManager()
+
+    first = manager.get_cached_configurations("tenant-1")
+    second = manager.get_cached_configurations("tenant-1")
+    other = manager.get_cached_configurations("tenant-2")
+
+    assert first is second
+    assert other is not first
+    assert get_configurations.call_count == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_bumping_the_version_rebuilds_configurations(mocker, cache):
+    mocker.patch.object(ProviderManager, "get_configurations", side_effect=lambda _: object())
+    manager = ProviderManager()
+
+    first = manager.get_cached_configurations("tenant-1")
+    cache.bump_version("tenant-1")
+    second = manager.get_cached_configurations("tenant-1")
+
+    assert second is not first
+    assert manager.get_cached_configurations("tenant-1") is second
+
+
+def test_cache_is_bypassed_when_redis_fails(mocker, cache, fake_redis):
+    mocker.patch.object(fake_redis, "get", side_effect=ConnectionError)
+    get_configurations = mocker.patch.object(ProviderManager, "get_configurations", side_effect=lambda _: object())
+    manager = ProviderManager()
+
+    assert manager.get_cached_configurations("tenant-1") is not manager.get_cached_configurations("tenant-1")
+    assert get_configurations.call_count == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_stores_nothing(mocker, fake_redis):
+    cache = ProviderConfigurationsCache(maxsize=0, ttl=60)
+    mocker.patch("core.provider_manager.provider_configurations_cache", cache)
+    mocker.patch.object(ProviderManager, "get_configurations", side_effect=lambda _: object())
+    manager = ProviderManager()
+
+    assert manager.get_cached_configurations("tenant-1") is not manager.get_cached_configurations("tenant-1")
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.fixture
+def bundle_manager(mocker, cache):
+    configuration = SimpleNamespace(
+        provider=SimpleNamespace(provider="langgenius/openai/openai"),
+        system_configuration=SimpleNamespace(
+            enabled=True,
+            quota_configurations=[
+                SimpleNamespace(quota_type=ProviderQuotaType.TRIAL, quota_limit=200, is_valid=False),
+            ],
+        ),
+        get_model_type_instance=lambda model_type: None,
+    )
+    get_configurations = mocker.patch.object(
+        ProviderManager, "get_configurations", side_effect=lambda _: {"langgenius/openai/openai": configuration}
+    )
+    mocker.patch("core.provider_manager.ProviderModelBundle", side_effect=lambda **kwargs: kwargs)
+    mocker.patch("core.provider_manager.Session")
+    mocker.patch("core.provider_manager.db")
+    return get_configurations
+
+
+def test_bundles_are_served_from_the_cached_configurations(mocker, bundle_manager):
+    manager = ProviderManager()
+
+    manager.get_provider_model_bundle("tenant-1", "langgenius/openai/openai", ModelType.LLM)
+    manager.get_provider_model_bundle("tenant-1", "langgenius/openai/openai", ModelType.LLM)
+
+    assert bundle_manager.call_count == 1
+    # no provider records are read per bundle
+    assert not provider_manager.Session.called
+
+
+def test_bundles_rebuild_configurations_when_a_quota_changes(mocker, cache, bundle_manager):
+    manager = ProviderManager()
+    manager.get_provider_model_bundle("tenant-1", "langgenius/openai/openai", ModelType.LLM)
+
+    cache.bump_version("tenant-1")
+    manager.get_provider_model_bundle("tenant-1", "langgenius/openai/openai", ModelType.LLM)
+
+    assert bundle_manager.call_count == 2
@@ -1,12 +1,47 @@
+import asyncio
 import secrets
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
 
-from core.helper.ssrf_proxy import SSRF_DEFAULT_MAX_RETRIES, STATUS_FORCELIST, make_request
+from configs import dify_config
+from core.helper import ssrf_proxy
+from core.helper.ssrf_proxy import (
+    SSRF_DEFAULT_MAX_RETRIES,
+    STATUS_FORCELIST,
+    MaxRetriesExceededError,
+    make_request,
+    make_request_async,
+)
+from tests.unit_tests.utils.local_http_server import LocalHTTPServer, LocalRequestHandler
 
 
-@patch("httpx.Client.request")
+class _LoginRedirectHandler(LocalRequestHandler):
+    """`/login` sets a session cookie and redirects to `/home`, which echoes the cookies it got."""
+
+    def handle_request(self) -> None:
+        if self.path == "/login":
+            self.send_response(302)
+            self.send_header("Set-Cookie", "s=1; Path=/")
+            self.send_header("Location", "/home")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        else:
+            self.send_json({"cookie": self.headers.get("Cookie")})
+
+
+class _LoginRedirectServer(LocalHTTPServer):
+    handler_class = _LoginRedirectHandler
+
+
+@pytest.fixture
+def login_server():
+    with _LoginRedirectServer(api_key="") as server:
+        yield server
+
+
+@patch("httpx.Client.send")
 def test_successful_request(mock_request):
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -16,7 +51,7 @@ def test_successful_request(mock_request):
     assert response.status_code == 200
 
 
-@patch("httpx.Client.request")
+@patch("httpx.Client.send")
 def test_retry_exceed_max_retries(mock_request):
     mock_response = MagicMock()
     mock_response.status_code = 500
@@ -29,7 +64,7 @@ def test_retry_exceed_max_retries(mock_request):
     assert str(e.value) == f"Reached maximum retries ({SSRF_DEFAULT_MAX_RETRIES - 1}) for URL http://example.com"
 
 
-@patch("httpx.Client.request")
+@patch("httpx.Client.send")
 def test_retry_logic_success(mock_request):
     side_effects = []
 
@@ -49,4 +84,81 @@ def test_retry_logic_success(mock_request):
 
     assert response.status_code == 200
     assert mock_request.call_count == SSRF_DEFAULT_MAX_RETRIES + 1
-    assert mock_request.call_args_list[0][1].get("method") == "GET"
+    # the responses of the retried attempts are closed, their connections go back to the pool
+    assert all(retried.close.called for retried in side_effects[:-1])
+    assert mock_request.call_args_list[0][0][0].method == "GET"
+
+
+def test_clients_are_pooled_per_ssl_verify():
+    assert ssrf_proxy._client_pool.get_client(True) is ssrf_proxy._client_pool.get_client(True)
+    assert ssrf_proxy._client_pool.get_client(False) is not ssrf_proxy._client_pool.get_client(True)
+    assert ssrf_proxy.pool_stats()["sync:direct:True"]["waiting"] == 0
+
+
+def test_pooled_clients_do_not_keep_response_cookies():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers={"Set-Cookie": "session=tenant-a"}, text=request.headers.get("Cookie", ""))
+
+    kwargs = ssrf_proxy._client_kwargs(True, httpx.HTTPTransport)
+    with httpx.Client(cookies=kwargs["cookies"], transport=httpx.MockTransport(handler)) as client:
+        client.get("http://example.com")
+        assert not client.cookies
+        assert client.get("http://example.com").text == ""
+
+
+def test_redirects_send_cookies_set_within_the_chain(login_server):
+    response = make_request("GET", f"{login_server.url}/login", follow_redirects=True, max_retries=0)
+
+    assert response.json() == {"cookie": "s=1"}
+    assert [r.status_code for r in response.history] == [302]
+    # cookies of a chain are never sent by other calls on the pooled client
+    assert make_request("GET", f"{login_server.url}/home", max_retries=0).json() == {"cookie": None}
+    assert make_request("GET", f"{login_server.url}/login", max_retries=0).status_code == 302
+
+
+def test_async_redirects_send_cookies_set_within_the_chain(login_server):
+    async def request(path: str, **kwargs) -> httpx.Response:
+        return await make_request_async("GET", f"{login_server.url}{path}", max_retries=0, **kwargs)
+
+    assert asyncio.run(request("/login", follow_redirects=True)).json() == {"cookie": "s=1"}
+    assert asyncio.run(request("/home")).json() == {"cookie": None}
+
+
+def test_redirects_keep_the_cookies_of_the_caller(login_server):
+    response = make_request("GET", f"{login_server.url}/home", cookies={"t": "2"}, follow_redirects=True, max_retries=0)
+
+    assert response.json() == {"cookie": "t=2"}
+
+
+@patch("httpx.Client.send")
+def test_timeout_without_pool_timeout_gets_one(mock_request):
+    mock_request.return_value = MagicMock(status_code=200)
+
+    make_request("GET", "http://example.com", timeout=(1, 2, 3))
+
+    timeout = mock_request.call_args.args[0].extensions["timeout"]
+    assert (timeout["connect"], timeout["read"], timeout["write"]) == (1, 2, 3)
+    assert timeout["pool"] == dify_config.SSRF_DEFAULT_TIME_OUT
+
+
+@patch("asyncio.sleep", new_callable=AsyncMock)
+@patch("httpx.AsyncClient.send", new_callable=AsyncMock)
+def test_async_requests_fan_out_with_retries(mock_request, mock_sleep):
+    mock_request.side_effect = [httpx.Response(503)] + [httpx.Response(200) for _ in range(3)]
+
+    async def fan_out():
+        return await asyncio.gather(*(make_request_async("GET", f"http://example.com/{i}") for i in range(3)))
+
+    responses = asyncio.run(fan_out())
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert mock_request.call_count == 4
+
+
+@patch("httpx.AsyncClient.send", new_callable=AsyncMock)
+def test_async_retry_exceed_max_retries(mock_request):
+    mock_request.return_value = httpx.Response(500)
+
+    with pytest.raises(MaxRetriesExceededError):
+        asyncio.run(make_request_async("GET", "http://example.com", max_retries=0))
+    assert mock_request.return_value.is_closed
@@ -0,0 +1,196 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from configs import dify_config
+from core.memory import token_buffer_memory
+from core.memory.token_buffer_memory import TokenBufferMemory
+from core.model_runtime.entities import ImagePromptMessageContent
+from models.model import AppMode
+
+
+def _message(index: int, query_tokens=None, answer_tokens=None, tokens_model="provider:model") -> SimpleNamespace:
+    return SimpleNamespace(
+        id=f"message-{index}",
+        query="q" * index,
+        answer="a" * index,
+        workflow_run_id=None,
+        parent_message_id=f"message-{index - 1}" if index > 1 else None,
+        answer_tokens=index,
+        memory_tokens_model=tokens_model if query_tokens is not None else None,
+        memory_query_tokens=query_tokens,
+        memory_answer_tokens=answer_tokens,
+    )
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    with Flask(__name__).app_context():
+        yield
+
+
+@pytest.fixture
+def session(mocker, monkeypatch):
+    monkeypatch.setattr(dify_config, "PLUGIN_BASED_TOKEN_COUNTING_ENABLED", True)
+    monkeypatch.setattr(dify_config, "MEMORY_TOKEN_ESTIMATION_ENABLED", False)
+    session = MagicMock()
+    session.messages = []
+
+    def query(*entities):
+        query_mock = MagicMock()
+        query_mock.filter.return_value = query_mock
+        query_mock.order_by.return_value = query_mock
+        query_mock.limit.return_value = query_mock
+        # newest first, like the ordered query of the conversation
+        query_mock.all.return_value = list(reversed(session.messages)) if len(entities) > 1 else []
+        return query_mock
+
+    session.query.side_effect = query
+    mocker.patch.object(token_buffer_memory, "db", SimpleNamespace(session=session, engine=MagicMock()))
+    # counts are written through a session of their own
+    session.write_session = MagicMock()
+    session_class = mocker.patch.object(token_buffer_memory, "Session")
+    session_class.return_value.__enter__.return_value = session.write_session
+    return session
+
+
+@pytest.fixture
+def model_instance():
+    instance = MagicMock()
+    instance.provider = "provider"
+    instance.model = "model"
+    instance.get_llm_num_tokens.side_effect = lambda prompt_messages: sum(len(m.content) for m in prompt_messages)
+    return instance
+
+
+def _memory(model_instance) -> TokenBufferMemory:
+    conversation = SimpleNamespace(id="conversation", app=SimpleNamespace(tenant_id="tenant"), mode=AppMode.CHAT)
+    return TokenBufferMemory(conversation=conversation, model_instance=model_instance)  # type: ignore[arg-type]
+
+
+def test_history_within_limit_is_counted_in_one_call(session, model_instance):
+    session.messages = [_message(index) for index in range(1, 5)]
+
+    prompt_messages = _memory(model_instance).get_history_prompt_messages(max_token_limit=20)
+
+    assert len(prompt_messages) == 8
+    assert model_instance.get_llm_num_tokens.call_count == 1
+    assert len(model_instance.get_llm_num_tokens.call_args.args[0]) == 8
+    session.write_session.execute.assert_not_called()
+
+
+def test_tokens_are_counted_per_message_and_persisted_to_prune(session, model_instance):
+    session.messages = [_message(index) for index in range(1, 5)]
+
+    prompt_messages = _memory(model_instance).get_history_prompt_messages(max_token_limit=10)
+
+    assert [m.content for m in prompt_messages] == ["qqqq", "aaaa"]
+    # the total of the history, then each message
+    assert model_instance.get_llm_num_tokens.call_count == 1 + 8
+    update_rows = session.write_session.execute.call_args.args[1]
+    assert update_rows[0] == {
+        "id": "message-1",
+        "memory_tokens_model": "provider:model",
+        "memory_query_tokens": 1,
+        "memory_answer_tokens": 1,
+    }
+    session.write_session.commit.assert_called_once()
+    session.commit.assert_not_called()
+
+
+def test_persisted_token_counts_are_reused(session, model_instance):
+    session.messages = [_message(index, query_tokens=index, answer_tokens=index) for index in range(1, 5)]
+
+    prompt_messages = _memory(model_instance).get_history_prompt_messages(max_token_limit=11)
+
+    assert [m.content for m in prompt_messages] == ["aaa", "qqqq", "aaaa"]
+    model_instance.get_llm_num_tokens.assert_not_called()
+    session.write_session.execute.assert_not_called()
+
+
+def test_only_new_messages_are_counted(session, model_instance):
+    session.messages = [_message(index, query_tokens=index, answer_tokens=index) for index in range(1, 4)]
+    session.messages.append(_message(4))
+
+    prompt_messages = _memory(model_instance).get_history_prompt_messages(max_token_limit=20)
+
+    assert len(prompt_messages) == 8
+    assert model_instance.get_llm_num_tokens.call_count == 1
+    assert [m.content for m in model_instance.get_llm_num_tokens.call_args.args[0]] == ["qqqq", "aaaa"]
+
+    model_instance.get_llm_num_tokens.reset_mock()
+    prompt_messages = _memory(model_instance).get_history_prompt_messages(max_token_limit=11)
+
+    assert [m.content for m in prompt_messages] == ["aaa", "qqqq", "aaaa"]
+    assert model_instance.get_llm_num_tokens.call_count == 1 + 2
+    update_rows = session.write_session.execute.call_args.args[1]
+    assert update_rows == [
+        {
+            "id": "message-4",
+            "memory_tokens_model": "provider:model",
+            "memory_query_tokens": 4,
+            "memory_answer_tokens": 4,
+        }
+    ]
+
+
+def test_token_counts_of_queries_with_files_are_persisted_with_the_files(session, model_instance, mocker):
+    message = _message(1)
+    session.messages = [message]
+    mocker.patch.object(TokenBufferMemory, "_get_message_files", return_value={"message-1": [MagicMock()]})
+    mocker.patch.object(
+        TokenBufferMemory, "_get_file_extra_configs", return_value={None: SimpleNamespace(image_config=None)}
+    )
+    mocker.patch.object(token_buffer_memory.file_factory, "build_from_message_files", return_value=[MagicMock()])
+    mocker.patch.object(
+        token_buffer_memory.file_manager,
+        "to_prompt_message_content",
+        return_value=ImagePromptMessageContent(url="https://example.com/a.png", format="png", mime_type="image/png"),
+    )
+
+    _memory(model_instance).get_history_prompt_messages(max_token_limit=1)
+
+    update_rows = session.write_session.execute.call_args.args[1]
+    assert update_rows == [
+        {
+            "id": "message-1",
+            "memory_tokens_model": "provider:model:1:low",
+            "memory_query_tokens": 2,
+            "memory_answer_tokens": 1,
+        }
+    ]
+
+    message.memory_tokens_model = "provider:model:1:low"
+    message.memory_query_tokens = 2
+    message.memory_answer_tokens = 1
+    model_instance.get_llm_num_tokens.reset_mock()
+    _memory(model_instance).get_history_prompt_messages(max_token_limit=1)
+
+    model_instance.get_llm_num_tokens.assert_not_called()
+
+
+def test_token_counts_of_another_model_are_recounted(session, model_instance):
+    session.messages = [
+        _message(index, query_tokens=100, answer_tokens=100, tokens_model="other:model") for index in range(1, 4)
+    ]
+
+    prompt_messages = _memory(model_instance).get_history_prompt_messages(max_token_limit=3)
+
+    assert [m.content for m in prompt_messages] == ["aaa"]
+    assert model_instance.get_llm_num_tokens.call_count == 1 + 6
+    update_rows = session.write_session.execute.call_args.args[1]
+    assert {row["memory_tokens_model"] for row in update_rows} == {"provider:model"}
+
+
+def test_tokens_can_be_estimated_locally(session, model_instance, monkeypatch):
+    monkeypatch.setattr(dify_config, "MEMORY_TOKEN_ESTIMATION_ENABLED", True)
+    monkeypatch.setattr(token_buffer_memory.GPT2Tokenizer, "get_num_tokens", staticmethod(len))
+    session.messages = [_message(index, query_tokens=100, answer_tokens=100) for index in range(1, 4)]
+
+    prompt_messages = _memory(model_instance).get_history_prompt_messages(max_token_limit=3)
+
+    assert [m.content for m in prompt_messages] == ["aaa"]
+    model_instance.get_llm_num_tokens.assert_not_called()
+    session.write_session.execute.assert_not_called()
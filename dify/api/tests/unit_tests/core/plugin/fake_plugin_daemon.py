@@ -0,0 +1,37 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+from tests.unit_tests.utils.local_http_server import LocalHTTPServer, LocalRequestHandler
+
+
+class _Handler(LocalRequestHandler):
+    def _send_stream(self, chunks: int) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(chunks):
+            line = b"data: " + json.dumps({"code": 0, "message": "", "data": {"index": i}}).encode() + b"\n\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def handle_request(self) -> None:
+        url = urlparse(self.path)
+        body = self.read_body()
+        if not self.authorized:
+            self.send_json({"code": -401, "message": "unauthorized", "data": None})
+        elif url.path.endswith("/stream"):
+            self._send_stream(int(parse_qs(url.query).get("chunks", ["10"])[0]))
+        else:
+            self.send_json({"code": 0, "message": "", "data": {"path": url.path, "body": body.decode()}})
+
+
+class FakePluginDaemon(LocalHTTPServer):
+    """
+    Local stand-in of the plugin daemon inner API for tests and benchmarks of the plugin clients.
+
+    Any path answers with a `PluginDaemonBasicResponse` echoing path and body, paths ending with
+    `/stream` answer with `?chunks=` SSE framed responses. Accepted connections are counted.
+    """
+
+    handler_class = _Handler
@@ -0,0 +1,107 @@
+import pytest
+from yarl import URL
+
+from configs import dify_config
+from core.plugin.impl import base
+from core.plugin.impl.base import BasePluginClient
+from core.plugin.impl.session import PluginDaemonSession, endpoint_of, iter_ndjson_lines
+from tests.unit_tests.core.plugin.fake_plugin_daemon import FakePluginDaemon
+
+TENANT_ID = "9d6e8a3c-4f0b-4c1e-9a6e-2b7d5c8f1e3a"
+
+
+@pytest.fixture
+def daemon():
+    with FakePluginDaemon(api_key=dify_config.PLUGIN_DAEMON_KEY) as daemon:
+        yield daemon
+
+
+@pytest.fixture
+def session(mocker, daemon):
+    session = PluginDaemonSession(max_connections=4, connect_timeout=5, read_timeout=5)
+    mocker.patch.object(base, "plugin_daemon_session", session)
+    mocker.patch.object(base, "plugin_daemon_inner_api_baseurl", URL(daemon.url))
+    yield session
+    session.close()
+
+
+def test_requests_reuse_keep_alive_connections(daemon, session):
+    client = BasePluginClient()
+
+    for i in range(20):
+        data = client._request_with_plugin_daemon_response(
+            "POST",
+            f"plugin/{TENANT_ID}/dispatch/echo",
+            dict,
+            headers={"Content-Type": "application/json"},
+            data={"i": i},
+        )
+        assert data == {"path": f"/plugin/{TENANT_ID}/dispatch/echo", "body": f'{{"i": {i}}}'}
+
+    assert daemon.requests == 20
+    assert daemon.connections == 1
+    assert session.stats()["POST plugin/{id}/dispatch/echo"]["count"] == 20
+
+
+def test_streams_release_their_connection(daemon, session):
+    client = BasePluginClient()
+
+    for _ in range(5):
+        chunks = list(
+            client._request_with_plugin_daemon_response_stream(
+                "POST", f"plugin/{TENANT_ID}/dispatch/stream", dict, params={"chunks": 50}
+            )
+        )
+        assert [chunk["index"] for chunk in chunks] == list(range(50))
+
+    # a stream abandoned midway is closed, its connection is not reused
+    stream = client._request_with_plugin_daemon_response_stream(
+        "POST", f"plugin/{TENANT_ID}/dispatch/stream", dict, params={"chunks": 50}
+    )
+    next(stream)
+    stream.close()
+
+    assert daemon.connections <= 2
+
+
+def test_iter_ndjson_lines_handles_split_lines_and_sse_framing():
+    chunks = [b'{"a"', b": 1}\n\ndata: ", b'{"b": 2}\r\n', b"", b'{"c": 3}']
+
+    assert list(iter_ndjson_lines(chunks)) == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+
+def test_endpoint_of_replaces_ids():
+    assert endpoint_of("post", f"/plugin/{TENANT_ID}/dispatch/llm/invoke") == "POST plugin/{id}/dispatch/llm/invoke"
+    assert endpoint_of("GET", "plugin/abc/management/list") == "GET plugin/abc/management/list"
+
+
+def test_plugin_daemon_stream_benchmark(benchmark, daemon, session):
+    client = BasePluginClient()
+
+    def run():
+        return sum(
+            1
+            for _ in client._request_with_plugin_daemon_response_stream(
+                "POST", f"plugin/{TENANT_ID}/dispatch/stream", dict, params={"chunks": 200}
+            )
+        )
+
+    assert benchmark(run) == 200
+    assert daemon.connections == 1
+
+
+@pytest.mark.parametrize(
+    ("line", "message"),
+    [
+        (b'{"error": "plugin not found"}', "plugin not found"),
+        (b"upstream unavailable \xff", "upstream unavailable �"),
+    ],
+)
+def test_stream_errors_show_the_decoded_line(mocker, line, message):
+    client = BasePluginClient()
+    mocker.patch.object(client, "_stream_request", return_value=iter([line]))
+
+    with pytest.raises(ValueError) as exc_info:
+        list(client._request_with_plugin_daemon_response_stream("POST", "plugin/dispatch/stream", dict))
+
+    assert str(exc_info.value) == message
@@ -0,0 +1,295 @@
+import json
+import re
+from types import SimpleNamespace
+from typing import Optional
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import operators
+
+from core.rag.datasource.keyword.jieba import jieba as jieba_module
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from core.rag.datasource.keyword.keyword_table_cache import KeywordTableCache
+from core.rag.models.document import Document
+from models import dataset as dataset_module
+from models.dataset import DatasetKeywordPosting, DatasetKeywordTable
+
+DATASET_ID = "dataset-1"
+FILE_KEY = f"keyword_files/tenant-1/{DATASET_ID}.txt"
+
+
+def _legacy_keyword_table(table: dict[str, list[str]]) -> str:
+    return json.dumps(
+        {"__type__": "keyword_table", "__data__": {"index_id": DATASET_ID, "summary": None, "table": table}}
+    )
+
+
+class FakeStorage:
+    def __init__(self) -> None:
+        self.files: dict[str, bytes] = {}
+
+    def exists(self, key: str) -> bool:
+        return key in self.files
+
+    def load_once(self, key: str) -> bytes:
+        return self.files[key]
+
+    def delete(self, key: str) -> None:
+        self.files.pop(key, None)
+
+
+class FakeQuery:
+    def __init__(self, session: "FakeSession", entities: tuple) -> None:
+        self._session = session
+        self._entities = entities
+        self._clauses: list = []
+
+    def filter(self, *clauses) -> "FakeQuery":
+        self._clauses.extend(clauses)
+        return self
+
+    def filter_by(self, **kwargs) -> "FakeQuery":
+        return self
+
+    def _matches(self) -> list[dict[str, str]]:
+        rows = [
+            {"dataset_id": dataset_id, "keyword": keyword, "index_node_id": node_id}
+            for dataset_id, keyword, node_id in self._session.postings
+        ]
+        for clause in self._clauses:
+            key, value = clause.left.key, clause.right.value
+            if clause.operator is operators.eq:
+                rows = [row for row in rows if row[key] == value]
+            elif clause.operator is operators.in_op:
+                rows = [row for row in rows if row[key] in value]
+            else:
+                raise NotImplementedError(clause.operator)
+        return rows
+
+    @property
+    def _model(self):
+        entity = self._entities[0]
+        return getattr(entity, "class_", entity)
+
+    def first(self):
+        if self._model is DatasetKeywordTable:
+            return self._session.keyword_table
+        if self._model is DatasetKeywordPosting:
+            rows = self.all()
+            return rows[0] if rows else None
+        if self._model is dataset_module.Dataset:
+            return self._session.dataset
+        # document segments
+        return None
+
+    def all(self) -> list[tuple]:
+        return [tuple(row[entity.key] for entity in self._entities) for row in self._matches()]
+
+    def count(self) -> int:
+        return len(self._matches())
+
+    def delete(self, synchronize_session=None) -> int:
+        rows = self._matches()
+        for row in rows:
+            self._session.postings.discard((row["dataset_id"], row["keyword"], row["index_node_id"]))
+        return len(rows)
+
+
+class FakeSession:
+    """In-memory stand-in of the session for the keyword postings and the keyword table of a dataset."""
+
+    def __init__(self) -> None:
+        self.postings: set[tuple[str, str, str]] = {("dataset-2", "apple", "other-node")}
+        self.keyword_table: Optional[DatasetKeywordTable] = None
+        self.dataset = None
+        self.inserted: list[tuple[str, str, str]] = []
+        self._committed = set(self.postings)
+
+    def query(self, *entities) -> FakeQuery:
+        return FakeQuery(self, entities)
+
+    def execute(self, stmt) -> None:
+        rows: dict[str, dict[str, str]] = {}
+        for name, value in stmt.compile(dialect=postgresql.dialect()).params.items():
+            match = re.fullmatch(r"(\w+?)(?:_m(\d+))?", name)
+            assert match
+            rows.setdefault(match.group(2) or "0", {})[match.group(1)] = value
+        for row in rows.values():
+            posting = (row["dataset_id"], row["keyword"], row["index_node_id"])
+            self.inserted.append(posting)
+            self.postings.add(posting)
+
+    def add(self, obj) -> None:
+        self.keyword_table = obj
+
+    def delete(self, obj) -> None:
+        self.keyword_table = None
+
+    def commit(self) -> None:
+        self._committed = set(self.postings)
+
+    def rollback(self) -> None:
+        self.postings = set(self._committed)
+
+
+class FakeDataset:
+    def __init__(self, session: FakeSession) -> None:
+        self.id = DATASET_ID
+        self.tenant_id = "tenant-1"
+        self._session = session
+
+    @property
+    def dataset_keyword_table(self) -> Optional[DatasetKeywordTable]:
+        return self._session.keyword_table
+
+
+@pytest.fixture
+def session(mocker, fake_redis) -> FakeSession:
+    session = FakeSession()
+    session.dataset = FakeDataset(session)
+    db = SimpleNamespace(session=session)
+    mocker.patch.object(jieba_module, "db", db)
+    mocker.patch.object(dataset_module, "db", db)
+    mocker.patch.object(jieba_module, "redis_client", MagicMock())
+    mocker.patch.object(jieba_module, "keyword_table_cache", KeywordTableCache(max_bytes=1024 * 1024, ttl=60))
+    return session
+
+
+@pytest.fixture
+def storage(mocker) -> FakeStorage:
+    storage = FakeStorage()
+    mocker.patch.object(jieba_module, "storage", storage)
+    mocker.patch.object(dataset_module, "storage", storage)
+    return storage
+
+
+@pytest.fixture
+def jieba(session) -> Jieba:
+    keyword = Jieba(session.dataset)
+    keyword._segment_content_cache = MagicMock()
+    return keyword
+
+
+def _dataset_postings(session: FakeSession) -> set[tuple[str, str]]:
+    return {(keyword, node_id) for dataset_id, keyword, node_id in session.postings if dataset_id == DATASET_ID}
+
+
+def test_database_keyword_table_is_imported(jieba, session, storage):
+    session.keyword_table = DatasetKeywordTable(
+        dataset_id=DATASET_ID,
+        keyword_table=_legacy_keyword_table({"apple": ["node-1", "node-2"], "pear": ["node-2"]}),
+        data_source_type="database",
+    )
+
+    assert jieba.text_exists("node-1")
+
+    assert _dataset_postings(session) == {("apple", "node-1"), ("apple", "node-2"), ("pear", "node-2")}
+    assert session.keyword_table.data_source_type == "postings"
+    assert session.keyword_table.keyword_table == ""
+    assert jieba._get_keyword_postings({"apple"}) == {"apple": frozenset({"node-1", "node-2"})}
+
+
+def test_file_keyword_table_is_imported_and_the_file_deleted(jieba, session, storage):
+    session.keyword_table = DatasetKeywordTable(dataset_id=DATASET_ID, keyword_table="", data_source_type="file")
+    storage.files[FILE_KEY] = _legacy_keyword_table({"apple": ["node-1"]}).encode()
+
+    assert jieba.text_exists("node-1")
+
+    assert _dataset_postings(session) == {("apple", "node-1")}
+    assert session.keyword_table.data_source_type == "postings"
+    assert FILE_KEY not in storage.files
+
+
+def test_unreadable_keyword_table_file_is_kept(jieba, session, storage):
+    session.keyword_table = DatasetKeywordTable(dataset_id=DATASET_ID, keyword_table="", data_source_type="file")
+    storage.files[FILE_KEY] = b"not json"
+
+    with pytest.raises(ValueError, match="Failed to load the legacy keyword table"):
+        jieba.text_exists("node-1")
+
+    assert FILE_KEY in storage.files
+    assert session.keyword_table.data_source_type == "file"
+    assert _dataset_postings(session) == set()
+
+
+def test_keyword_table_is_kept_when_postings_are_missing(jieba, session, storage, mocker):
+    legacy_table = _legacy_keyword_table({"apple": ["node-1"]})
+    session.keyword_table = DatasetKeywordTable(
+        dataset_id=DATASET_ID, keyword_table=legacy_table, data_source_type="database"
+    )
+    # the insert is lost, e.g. by a concurrent delete
+    mocker.patch.object(session, "execute")
+
+    with pytest.raises(ValueError, match="Imported 0 of 1 keyword postings"):
+        jieba.text_exists("node-1")
+
+    assert session.keyword_table.data_source_type == "database"
+    assert session.keyword_table.keyword_table == legacy_table
+
+
+def test_add_texts_writes_only_the_new_postings(jieba, session, storage):
+    session.keyword_table = DatasetKeywordTable(dataset_id=DATASET_ID, keyword_table="", data_source_type="postings")
+    jieba.add_texts([Document(page_content="apple", metadata={"doc_id": "node-1"})], keywords_list=[["apple"]])
+    assert jieba._get_keyword_postings({"apple"}) == {"apple": frozenset({"node-1"})}
+    session.inserted.clear()
+
+    jieba.add_texts(
+        [Document(page_content="apple pear", metadata={"doc_id": "node-2"})], keywords_list=[["apple", "pear"]]
+    )
+
+    assert sorted(session.inserted) == [(DATASET_ID, "apple", "node-2"), (DATASET_ID, "pear", "node-2")]
+    # the write bumped the version, the cached postings of the keyword are not served anymore
+    assert jieba._get_keyword_postings({"apple"}) == {"apple": frozenset({"node-1", "node-2"})}
+
+
+def test_delete_by_ids_removes_the_postings_of_the_segments(jieba, session, storage):
+    session.keyword_table = DatasetKeywordTable(dataset_id=DATASET_ID, keyword_table="", data_source_type="postings")
+    jieba.add_texts(
+        [
+            Document(page_content="apple", metadata={"doc_id": "node-1"}),
+            Document(page_content="apple pear", metadata={"doc_id": "node-2"}),
+        ],
+        keywords_list=[["apple"], ["apple", "pear"]],
+    )
+    assert jieba._get_keyword_postings({"pear"}) == {"pear": frozenset({"node-2"})}
+
+    jieba.delete_by_ids(["node-2"])
+
+    assert _dataset_postings(session) == {("apple", "node-1")}
+    assert jieba._get_keyword_postings({"pear"}) == {"pear": frozenset()}
+    assert not jieba.text_exists("node-2")
+    assert ("dataset-2", "apple", "other-node") in session.postings
+
+
+def test_delete_removes_the_keyword_index_of_the_dataset(jieba, session, storage):
+    session.keyword_table = DatasetKeywordTable(dataset_id=DATASET_ID, keyword_table="", data_source_type="postings")
+    jieba.add_texts([Document(page_content="apple", metadata={"doc_id": "node-1"})], keywords_list=[["apple"]])
+
+    jieba.delete()
+
+    assert _dataset_postings(session) == set()
+    assert session.keyword_table is None
+    assert session.postings == {("dataset-2", "apple", "other-node")}
+
+
+def test_delete_removes_the_legacy_keyword_table_file(jieba, session, storage):
+    session.keyword_table = DatasetKeywordTable(dataset_id=DATASET_ID, keyword_table="", data_source_type="file")
+    storage.files[FILE_KEY] = _legacy_keyword_table({"apple": ["node-1"]}).encode()
+
+    jieba.delete()
+
+    assert session.keyword_table is None
+    assert FILE_KEY not in storage.files
+
+
+def test_index_created_again_after_delete_writes_its_keyword_table(jieba, session, storage):
+    jieba.add_texts([Document(page_content="apple", metadata={"doc_id": "node-1"})], keywords_list=[["apple"]])
+    assert session.keyword_table.data_source_type == "postings"
+
+    jieba.delete()
+    jieba.add_texts([Document(page_content="pear", metadata={"doc_id": "node-2"})], keywords_list=[["pear"]])
+
+    assert session.keyword_table is not None
+    assert session.keyword_table.data_source_type == "postings"
+    assert _dataset_postings(session) == {("pear", "node-2")}
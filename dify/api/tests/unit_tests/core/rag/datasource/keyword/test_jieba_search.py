@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.rag.datasource.keyword.jieba import jieba as jieba_module
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from core.rag.datasource.keyword.segment_content_cache import CachedSegmentContent
+
+
+def _segment(index_node_id: str, document_id: str = "document-1") -> SimpleNamespace:
+    return SimpleNamespace(
+        index_node_id=index_node_id,
+        index_node_hash=f"hash-{index_node_id}",
+        document_id=document_id,
+        dataset_id="dataset-1",
+        content=f"content of {index_node_id}",
+    )
+
+
+@pytest.fixture
+def jieba(mocker):
+    keyword = Jieba(SimpleNamespace(id="dataset-1", tenant_id="tenant-1"))
+    mocker.patch.object(keyword, "_ensure_keyword_postings")
+    mocker.patch.object(jieba_module, "keyword_table_cache")
+    keyword._segment_content_cache = MagicMock()
+    keyword._segment_content_cache.get_many.return_value = {}
+    return keyword
+
+
+@pytest.fixture
+def segment_query(mocker):
+    query = MagicMock()
+    query.filter.return_value = query
+    session = MagicMock()
+    session.query.return_value = query
+    mocker.patch.object(jieba_module, "db", SimpleNamespace(session=session))
+    return query
+
+
+def test_search_hydrates_segments_in_one_query_and_keeps_ranking(jieba, segment_query, mocker):
+    mocker.patch.object(jieba, "_retrieve_ids_by_query", return_value=["node-3", "node-1", "node-2"])
+    segment_query.all.return_value = [_segment("node-1"), _segment("node-2"), _segment("node-3")]
+
+    documents = jieba.search("query", top_k=3, document_ids_filter=["document-1"])
+
+    assert [document.metadata["doc_id"] for document in documents] == ["node-3", "node-1", "node-2"]
+    assert documents[0].page_content == "content of node-3"
+    segment_query.all.assert_called_once()
+    # dataset / index node ids and the document filter are applied to the same query
+    assert segment_query.filter.call_count == 2
+    cached = jieba._segment_content_cache.set_many.call_args.args[0]
+    assert {segment.index_node_id for segment in cached} == {"node-1", "node-2", "node-3"}
+
+
+def test_search_reads_through_segment_content_cache(jieba, segment_query, mocker):
+    mocker.patch.object(jieba, "_retrieve_ids_by_query", return_value=["node-1", "node-2"])
+    jieba._segment_content_cache.get_many.return_value = {
+        "node-1": CachedSegmentContent.model_validate(vars(_segment("node-1"))),
+        "node-2": CachedSegmentContent.model_validate(vars(_segment("node-2", document_id="document-2"))),
+    }
+    segment_query.all.return_value = []
+
+    documents = jieba.search("query", top_k=2, document_ids_filter=["document-1"])
+
+    assert [document.metadata["doc_id"] for document in documents] == ["node-1"]
+    # node-2 is filtered out by document, it is looked up in the database with the filter applied
+    segment_query.all.assert_called_once()
+
+
+def test_delete_by_ids_invalidates_segment_content_cache(jieba, segment_query):
+    jieba.delete_by_ids(["node-1", "node-2"])
+
+    jieba._segment_content_cache.delete_many.assert_called_once_with(["node-1", "node-2"])
@@ -0,0 +1,36 @@
+from core.rag.datasource.keyword.keyword_table_cache import KeywordTableCache
+
+
+def test_postings_are_scoped_by_version():
+    cache = KeywordTableCache(max_bytes=1024 * 1024, ttl=60)
+    cache.set_many("dataset-1", 1, {"apple": frozenset({"node-1", "node-2"})})
+
+    assert cache.get_many("dataset-1", 1, ["apple", "pear"]) == {"apple": frozenset({"node-1", "node-2"})}
+    # a write bumps the version, cached postings of the previous version are no longer served
+    assert cache.get_many("dataset-1", 2, ["apple"]) == {}
+    assert cache.get_many("dataset-2", 1, ["apple"]) == {}
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["hit_rate"] == 0.25
+
+
+def test_cache_is_memory_bounded():
+    cache = KeywordTableCache(max_bytes=4096, ttl=60)
+    for i in range(100):
+        cache.set_many("dataset-1", 1, {f"keyword-{i}": frozenset({f"node-{i}-{j}" for j in range(5)})})
+
+    stats = cache.stats()
+    assert stats["size"] <= 4096
+    assert 0 < stats["entries"] < 100
+    # least recently used postings are evicted first
+    assert cache.get_many("dataset-1", 1, ["keyword-99"])
+    assert not cache.get_many("dataset-1", 1, ["keyword-0"])
+
+
+def test_disabled_cache_stores_nothing():
+    cache = KeywordTableCache(max_bytes=0, ttl=60)
+    cache.set_many("dataset-1", 1, {"apple": frozenset({"node-1"})})
+
+    assert cache.get_many("dataset-1", 1, ["apple"]) == {}
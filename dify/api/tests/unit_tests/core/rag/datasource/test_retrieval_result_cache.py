@@ -0,0 +1,91 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.rag.datasource import retrieval_result_cache as cache_module
+from core.rag.datasource.retrieval_result_cache import RetrievalResultCache
+from core.rag.models.document import ChildDocument, Document
+
+
+@pytest.fixture
+def redis(mocker, fake_redis):
+    # results are stored in the same Redis as the content version
+    mocker.patch.object(cache_module, "redis_client", fake_redis)
+    return fake_redis
+
+
+@pytest.fixture
+def cache():
+    return RetrievalResultCache(enabled=True, ttl=60)
+
+
+PARAMS = {"retrieval_method": "semantic_search", "query": "what is dify", "top_k": 4}
+
+
+def _documents() -> list[Document]:
+    return [
+        Document(
+            page_content="Dify is an LLM app development platform",
+            vector=[0.5, -0.25, 1.0],
+            metadata={"doc_id": "node-1", "dataset_id": "dataset-1", "score": 0.91},
+            children=[ChildDocument(page_content="child", vector=[1.0, 0.0], metadata={"doc_id": "child-1"})],
+        ),
+        Document(page_content="没有向量", metadata={"doc_id": "node-2", "score": 0.5}, provider="external"),
+    ]
+
+
+def test_round_trip_keeps_documents(cache, redis):
+    key = cache.build_key("dataset-1", PARAMS)
+    cache.set(key, _documents())
+
+    cached = cache.get("dataset-1", key)
+
+    assert cached == _documents()
+
+
+def test_content_version_bump_invalidates_results(cache, redis):
+    key = cache.build_key("dataset-1", PARAMS)
+    cache.set(key, _documents())
+
+    cache.bump_version("dataset-1")
+
+    new_key = cache.build_key("dataset-1", PARAMS)
+    assert new_key != key
+    assert cache.get("dataset-1", new_key) is None
+    # other datasets are unaffected
+    assert cache.build_key("dataset-2", PARAMS) == cache.build_key("dataset-2", dict(reversed(PARAMS.items())))
+
+
+def test_key_depends_on_every_parameter(cache, redis):
+    keys = {
+        cache.build_key("dataset-1", PARAMS),
+        cache.build_key("dataset-1", {**PARAMS, "top_k": 5}),
+        cache.build_key("dataset-1", {**PARAMS, "query": "what is rag"}),
+        cache.build_key("dataset-1", {**PARAMS, "document_ids_filter": ["document-1"]}),
+    }
+    assert len(keys) == 4
+
+
+def test_hit_rate_is_reported_per_dataset(cache, redis):
+    key = cache.build_key("dataset-1", PARAMS)
+    cache.get("dataset-1", key)
+    cache.set(key, _documents())
+    cache.get("dataset-1", key)
+    cache.get("dataset-1", key)
+
+    assert cache.stats("dataset-1") == {"hits": 2, "misses": 1, "hit_rate": 2 / 3}
+    assert cache.stats("dataset-2") == {"hits": 0, "misses": 0, "hit_rate": 0.0}
+    assert cache.total_stats() == {"hits": 2, "misses": 1, "hit_rate": 2 / 3, "datasets": 1}
+
+
+def test_disabled_cache_builds_no_key(redis):
+    assert RetrievalResultCache(enabled=False, ttl=60).build_key("dataset-1", PARAMS) is None
+
+
+def test_unavailable_redis_disables_the_lookup(cache, mocker):
+    broken_redis = MagicMock()
+    broken_redis.get.side_effect = ConnectionError("redis is down")
+    mocker.patch.object(cache_module, "redis_client", broken_redis)
+    mocker.patch("libs.versioned_cache.redis_client", broken_redis)
+
+    assert cache.build_key("dataset-1", PARAMS) is None
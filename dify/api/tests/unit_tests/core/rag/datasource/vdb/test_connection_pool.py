@@ -0,0 +1,182 @@
+import threading
+import time
+
+import pytest
+
+from core.rag.datasource.vdb.connection_pool import (
+    ConnectionPoolRegistry,
+    ConnectionPoolTimeoutError,
+    Psycopg2ConnectionPool,
+)
+
+
+class FakeCursor:
+    def __init__(self, connection: "FakeConnection"):
+        self._connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql):
+        if self._connection.fail_ping:
+            raise RuntimeError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.fail_ping = False
+        self.transaction_status = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return self.transaction_status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.transaction_status = 0
+
+    def close(self):
+        self.closed = 1
+
+
+def _pool(connections: list[FakeConnection], **kwargs) -> Psycopg2ConnectionPool:
+    def connect():
+        connection = FakeConnection()
+        connections.append(connection)
+        return connection
+
+    options = {
+        "min_connections": 0,
+        "max_connections": 2,
+        "max_lifetime": 3600,
+        "timeout": 1,
+        "health_check_interval": 30,
+    }
+    options.update(kwargs)
+    return Psycopg2ConnectionPool(connect, **options)
+
+
+def test_connections_are_reused():
+    connections: list[FakeConnection] = []
+    pool = _pool(connections)
+
+    for _ in range(10):
+        with pool.connection():
+            pass
+
+    assert len(connections) == 1
+    assert pool.stats() == {
+        "size": 1,
+        "idle": 1,
+        "in_use": 0,
+        "waiting": 0,
+        "created": 1,
+        "recycled": 0,
+        "max_connections": 2,
+    }
+
+
+def test_callers_beyond_max_connections_wait_for_a_release():
+    connections: list[FakeConnection] = []
+    pool = _pool(connections, max_connections=1, timeout=5)
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.connection():
+            acquired.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    acquired.wait(5)
+    threading.Timer(0.1, release.set).start()
+
+    with pool.connection() as connection:
+        assert connection is connections[0]
+    holder.join()
+    assert pool.stats()["created"] == 1
+
+
+def test_exhausted_pool_times_out():
+    pool = _pool([], max_connections=1, timeout=0.1)
+
+    with pool.connection():
+        started_at = time.monotonic()
+        with pytest.raises(ConnectionPoolTimeoutError):
+            with pool.connection():
+                pass
+        assert time.monotonic() - started_at < 1
+
+
+def test_expired_and_broken_connections_are_recycled():
+    connections: list[FakeConnection] = []
+    pool = _pool(connections, max_lifetime=0)
+
+    with pool.connection():
+        pass
+    with pool.connection() as connection:
+        connection.closed = 2
+
+    assert all(connection.closed for connection in connections)
+    assert pool.stats()["recycled"] == 2
+    assert pool.stats()["size"] == 0
+
+
+def test_idle_connections_are_health_checked_before_reuse():
+    connections: list[FakeConnection] = []
+    pool = _pool(connections, health_check_interval=0)
+
+    with pool.connection():
+        pass
+    connections[0].fail_ping = True
+    with pool.connection() as connection:
+        assert connection is connections[1]
+
+    assert connections[0].closed
+
+
+def test_open_transactions_are_rolled_back_on_release():
+    connections: list[FakeConnection] = []
+    pool = _pool(connections)
+
+    def failing_query():
+        with pool.connection() as connection:
+            connection.transaction_status = 3
+            raise ValueError("query failed")
+
+    with pytest.raises(ValueError):
+        failing_query()
+
+    assert connections[0].rollbacks == 1
+    assert pool.stats()["idle"] == 1
+
+
+def test_registry_shares_one_pool_per_key():
+    registry = ConnectionPoolRegistry()
+    created = []
+
+    def factory():
+        pool = _pool([])
+        created.append(pool)
+        return pool
+
+    first = registry.get_or_create(("pgvector", "localhost", 5432, "dify", "postgres", "secret"), factory)
+    second = registry.get_or_create(("pgvector", "localhost", 5432, "dify", "postgres", "secret"), factory)
+    other = registry.get_or_create(("pgvector", "localhost", 5433, "dify", "postgres", "secret"), factory)
+
+    assert first is second
+    assert other is not first
+    assert len(created) == 2
+    # pools are summed per store, without their connection configs
+    stats = registry.stats()
+    assert set(stats) == {"pgvector"}
+    assert stats["pgvector"]["pools"] == 2
+    assert stats["pgvector"]["size"] == sum(pool.stats()["size"] for pool in created)
@@ -0,0 +1,176 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from core.rag.datasource.vdb import vector_cache as vector_cache_module
+from core.rag.datasource.vdb import vector_factory
+from core.rag.datasource.vdb.vector_cache import VectorCache
+
+
+def _dataset(**kwargs) -> SimpleNamespace:
+    values = {
+        "id": "dataset-1",
+        "tenant_id": "tenant-1",
+        "embedding_model_provider": "openai",
+        "embedding_model": "text-embedding-3-small",
+        "index_struct": '{"type": "pgvector", "vector_store": {"class_prefix": "Vector_index_1_Node"}}',
+    }
+    values.update(kwargs)
+    index_struct = values["index_struct"]
+    return SimpleNamespace(**values, index_struct_dict=json.loads(index_struct) if index_struct else None)
+
+
+@pytest.fixture(autouse=True)
+def provider_configurations_version(mocker):
+    return mocker.patch.object(vector_cache_module.provider_configurations_cache, "get_version", return_value=0)
+
+
+@pytest.fixture
+def vector_class(mocker):
+    return mocker.patch.object(vector_factory, "Vector", side_effect=lambda dataset, embeddings=None: object())
+
+
+@pytest.fixture(autouse=True)
+def model_manager(mocker):
+    return mocker.patch.object(vector_cache_module, "ModelManager")
+
+
+def test_vectors_are_reused_per_dataset(vector_class):
+    cache = VectorCache(maxsize=10, ttl=60)
+
+    first = cache.get_vector(_dataset())
+    second = cache.get_vector(_dataset())
+    other = cache.get_vector(_dataset(id="dataset-2"))
+
+    assert first is second
+    assert other is not first
+    assert vector_class.call_count == 2
+    stats = cache.stats()
+    # the second dataset reuses the embeddings of the first one
+    assert (stats["hits"], stats["misses"], stats["constructions"]) == (2, 3, 3)
+    assert stats["construction_seconds"] >= 0
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"embedding_model": "text-embedding-3-large"},
+        {"embedding_model_provider": "cohere"},
+        {"index_struct": '{"type": "opengauss", "vector_store": {"class_prefix": "Vector_index_1_Node"}}'},
+    ],
+)
+def test_embedding_or_index_changes_build_a_new_vector(vector_class, changes):
+    cache = VectorCache(maxsize=10, ttl=60)
+
+    before = cache.get_vector(_dataset())
+    after = cache.get_vector(_dataset(**changes))
+
+    assert before is not after
+
+
+def test_datasets_without_index_struct_are_not_cached(vector_class):
+    cache = VectorCache(maxsize=10, ttl=60)
+
+    cache.get_vector(_dataset(index_struct=None))
+    cache.get_vector(_dataset(index_struct=None))
+
+    assert vector_class.call_count == 2
+    assert cache.stats()["vectors"] == 0
+
+
+def test_vectors_of_stores_without_pooled_clients_are_not_cached(vector_class, model_manager):
+    cache = VectorCache(maxsize=10, ttl=60)
+    dataset = _dataset(index_struct='{"type": "qdrant", "vector_store": {"class_prefix": "Vector_index_1_Node"}}')
+
+    first = cache.get_vector(dataset)
+    second = cache.get_vector(dataset)
+
+    assert first is not second
+    assert cache.stats()["vectors"] == 0
+    # the embeddings are still shared
+    assert vector_class.call_args_list[0].kwargs["embeddings"] is vector_class.call_args_list[1].kwargs["embeddings"]
+    assert model_manager.return_value.get_model_instance.call_count == 1
+
+
+def test_vector_keeps_no_dataset(mocker):
+    factory = mocker.patch.object(vector_factory.Vector, "get_vector_factory")
+    dataset = _dataset()
+
+    vector = vector_factory.Vector(dataset=dataset, embeddings=mocker.Mock())
+
+    factory.return_value.return_value.init_vector.assert_called_once_with(dataset, mocker.ANY, mocker.ANY)
+    assert dataset not in vars(vector).values()
+    assert vector._dataset_id == "dataset-1"
+
+
+def test_invalidate_dataset_drops_its_vectors(vector_class):
+    cache = VectorCache(maxsize=10, ttl=60)
+    cache.get_vector(_dataset())
+    cache.get_vector(_dataset(id="dataset-2"))
+
+    cache.invalidate_dataset("dataset-1")
+
+    cache.get_vector(_dataset())
+    assert vector_class.call_count == 3
+    assert cache.stats()["vectors"] == 2
+
+
+def test_embeddings_are_shared_per_model(model_manager):
+    cache = VectorCache(maxsize=10, ttl=60)
+
+    first = cache.get_embeddings("tenant-1", "openai", "text-embedding-3-small")
+    second = cache.get_embeddings("tenant-1", "openai", "text-embedding-3-small")
+    cache.get_embeddings("tenant-2", "openai", "text-embedding-3-small")
+
+    assert first is second
+    assert model_manager.return_value.get_model_instance.call_count == 2
+
+
+def test_cached_vectors_share_the_embeddings(vector_class, model_manager):
+    cache = VectorCache(maxsize=10, ttl=60)
+
+    cache.get_vector(_dataset())
+    embeddings = cache.get_embeddings("tenant-1", "openai", "text-embedding-3-small")
+
+    assert vector_class.call_args.kwargs["embeddings"] is embeddings
+    assert model_manager.return_value.get_model_instance.call_count == 1
+
+
+def test_provider_configurations_version_bump_builds_new_objects(
+    vector_class, model_manager, provider_configurations_version
+):
+    cache = VectorCache(maxsize=10, ttl=60)
+    vector = cache.get_vector(_dataset())
+    embeddings = cache.get_embeddings("tenant-1", "openai", "text-embedding-3-small")
+
+    provider_configurations_version.return_value = 1
+
+    assert cache.get_vector(_dataset()) is not vector
+    assert cache.get_embeddings("tenant-1", "openai", "text-embedding-3-small") is not embeddings
+
+
+def test_cache_is_bypassed_without_provider_configurations_version(
+    vector_class, model_manager, provider_configurations_version
+):
+    provider_configurations_version.return_value = None
+    cache = VectorCache(maxsize=10, ttl=60)
+
+    cache.get_vector(_dataset())
+    cache.get_vector(_dataset())
+    cache.get_embeddings("tenant-1", "openai", "text-embedding-3-small")
+    cache.get_embeddings("tenant-1", "openai", "text-embedding-3-small")
+
+    assert vector_class.call_count == 2
+    assert model_manager.return_value.get_model_instance.call_count == 2
+    assert cache.stats()["vectors"] == cache.stats()["embeddings"] == 0
+
+
+def test_disabled_cache_always_constructs(vector_class):
+    cache = VectorCache(maxsize=0, ttl=60)
+
+    cache.get_vector(_dataset())
+    cache.get_vector(_dataset())
+
+    assert vector_class.call_count == 2
+    assert cache.stats()["constructions"] == 4
@@ -0,0 +1,189 @@
+import pickle
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from core.entities.embedding_type import EmbeddingInputType
+from core.rag.embedding import cached_embedding
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from core.rag.embedding.embedding_cache import document_embedding_cache
+from libs import helper
+from models.dataset import Embedding
+
+
+def _vector(seed: int) -> list[float]:
+    return [float(seed + 1), 1.0, 0.0]
+
+
+def _stored_embedding(text: str) -> Embedding:
+    embedding = Embedding(model_name="model", hash=helper.generate_text_hash(text), provider_name="provider")
+    seed = int(text.split("-")[1])
+    normalized = np.asarray(_vector(seed)) / np.linalg.norm(_vector(seed))
+    embedding.set_embedding(normalized.tolist())
+    return embedding
+
+
+@pytest.fixture
+def model_instance():
+    instance = MagicMock()
+    instance.provider = "provider"
+    instance.model = "model"
+    instance.model_type_instance.get_model_schema.return_value = None
+
+    def invoke_text_embedding(texts, user=None, input_type=None):
+        return SimpleNamespace(embeddings=[_vector(int(text.split("-")[1])) for text in texts])
+
+    instance.invoke_text_embedding.side_effect = invoke_text_embedding
+    return instance
+
+
+@pytest.fixture
+def mock_db(mocker):
+    document_embedding_cache.clear()
+    stored: dict[str, Embedding] = {}
+    session = MagicMock()
+
+    def query(_model):
+        query_mock = MagicMock()
+
+        def filter_(*clauses):
+            hashes = clauses[-1].right.value
+            query_mock.all.return_value = [stored[h] for h in hashes if h in stored]
+            return query_mock
+
+        query_mock.filter.side_effect = filter_
+        query_mock.filter_by.side_effect = lambda **kwargs: MagicMock(
+            first=MagicMock(return_value=stored.get(kwargs["hash"]))
+        )
+        return query_mock
+
+    session.query.side_effect = query
+    mocker.patch.object(cached_embedding, "db", SimpleNamespace(session=session, engine=MagicMock()))
+    yield stored, session
+    document_embedding_cache.clear()
+
+
+def test_embed_documents_resolves_each_tier(model_instance, mock_db):
+    stored, session = mock_db
+    stored[helper.generate_text_hash("text-1")] = _stored_embedding("text-1")
+
+    texts = ["text-0", "text-1", "text-2", "text-0"]
+    embeddings = CacheEmbedding(model_instance).embed_documents(texts)
+
+    assert len(embeddings) == 4
+    assert embeddings[0] == embeddings[3]
+    for text, embedding in zip(texts, embeddings):
+        expected = np.asarray(_vector(int(text.split("-")[1])))
+        assert np.allclose(embedding, expected / np.linalg.norm(expected))
+
+    # duplicated texts are embedded only once, and new vectors are written with one bulk upsert
+    assert model_instance.invoke_text_embedding.call_count == 2
+    assert session.execute.call_count == 1
+    stats = document_embedding_cache.stats.snapshot()
+    assert stats["database_hits"] == 1
+    assert stats["model_hits"] == 2
+
+    # second call is served by the process-local cache only
+    session.query.reset_mock()
+    model_instance.invoke_text_embedding.reset_mock()
+    assert CacheEmbedding(model_instance).embed_documents(texts) == embeddings
+    session.query.assert_not_called()
+    model_instance.invoke_text_embedding.assert_not_called()
+    assert document_embedding_cache.stats.snapshot()["local_hits"] == 3
+
+
+def test_embed_documents_round_trips_for_10k_cached_texts(model_instance, mock_db):
+    stored, session = mock_db
+    texts = [f"text-{i}" for i in range(10_000)]
+    for text in texts:
+        stored[helper.generate_text_hash(text)] = _stored_embedding(text)
+
+    embeddings = CacheEmbedding(model_instance).embed_documents(texts)
+
+    assert all(embedding is not None for embedding in embeddings)
+    model_instance.invoke_text_embedding.assert_not_called()
+    # one bulk query per batch instead of one query per text
+    assert session.query.call_count == 10_000 // cached_embedding.dify_config.EMBEDDING_CACHE_QUERY_BATCH_SIZE
+
+
+def test_legacy_rows_are_rewritten_outside_the_callers_session(model_instance, mock_db, mocker):
+    stored, session = mock_db
+    legacy = _stored_embedding("text-1")
+    legacy.id = "embedding-1"
+    vector = legacy.get_embedding_array()
+    legacy.embedding = pickle.dumps(vector.tolist(), protocol=pickle.HIGHEST_PROTOCOL)
+    stored[legacy.hash] = legacy
+    migration_session = MagicMock()
+    session_factory = mocker.patch.object(cached_embedding, "Session")
+    session_factory.return_value.__enter__.return_value = migration_session
+
+    embeddings = CacheEmbedding(model_instance).embed_documents(["text-1"])
+
+    assert np.allclose(embeddings[0], vector)
+    # the caller's session is neither committed nor rolled back by the read
+    session.commit.assert_not_called()
+    session.rollback.assert_not_called()
+    assert legacy.is_legacy_format
+    (_, values), _ = migration_session.execute.call_args
+    assert [value["id"] for value in values] == ["embedding-1"]
+    assert np.allclose(cached_embedding.decode_vector(values[0]["embedding"]), vector, atol=1e-7)
+    migration_session.commit.assert_called_once()
+
+
+def _embed_documents_per_text(model_instance, texts: list[str]) -> list[list[float]]:
+    """
+    Cache lookup of embed_documents before the tiered cache: one query per text,
+    one insert per new embedding.
+    """
+    session = cached_embedding.db.session
+    embeddings: list = [None] * len(texts)
+    for i, text in enumerate(texts):
+        text_hash = helper.generate_text_hash(text)
+        row = (
+            session.query(Embedding)
+            .filter_by(model_name=model_instance.model, hash=text_hash, provider_name=model_instance.provider)
+            .first()
+        )
+        if row:
+            embeddings[i] = row.get_embedding()
+            continue
+        result = model_instance.invoke_text_embedding(texts=[text], input_type=EmbeddingInputType.DOCUMENT)
+        vector = np.asarray(result.embeddings[0])
+        embeddings[i] = (vector / np.linalg.norm(vector)).tolist()
+        embedding = Embedding(model_name=model_instance.model, hash=text_hash, provider_name=model_instance.provider)
+        embedding.set_embedding(embeddings[i])
+        session.add(embedding)
+    session.commit()
+    return embeddings
+
+
+@pytest.mark.parametrize("cached", [True, False], ids=["cached", "uncached"])
+@pytest.mark.parametrize("implementation", ["per_text", "batched"])
+def test_embed_documents_benchmark(benchmark, model_instance, mock_db, cached, implementation):
+    stored, session = mock_db
+    texts = [f"text-{i}" for i in range(10_000)]
+    if cached:
+        for text in texts:
+            stored[helper.generate_text_hash(text)] = _stored_embedding(text)
+
+    def run():
+        # every round starts with a cold process-local cache
+        document_embedding_cache.clear()
+        session.reset_mock()
+        if implementation == "per_text":
+            return _embed_documents_per_text(model_instance, texts)
+        return CacheEmbedding(model_instance).embed_documents(texts)
+
+    embeddings = benchmark.pedantic(run, rounds=1)
+
+    assert all(embedding is not None for embedding in embeddings)
+    round_trips = session.query.call_count + session.execute.call_count + session.add.call_count
+    benchmark.extra_info["database_round_trips"] = round_trips
+    if implementation == "batched":
+        batches = 10_000 // cached_embedding.dify_config.EMBEDDING_CACHE_QUERY_BATCH_SIZE
+        # one bulk query per batch, plus one bulk upsert per batch of new embeddings
+        assert round_trips == (batches if cached else 2 * batches)
+    else:
+        assert round_trips == (10_000 if cached else 20_000)
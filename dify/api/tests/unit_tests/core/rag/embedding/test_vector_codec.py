@@ -0,0 +1,68 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from core.rag.embedding.vector_codec import (
+    VectorCodecError,
+    VectorStorageFormat,
+    decode_stored_vector,
+    decode_vector,
+    encode_vector,
+    is_encoded_vector,
+)
+from models.dataset import Embedding
+
+
+@pytest.fixture
+def vector() -> np.ndarray:
+    rng = np.random.default_rng(42)
+    v = rng.standard_normal(1536)
+    return v / np.linalg.norm(v)
+
+
+@pytest.mark.parametrize(
+    ("storage_format", "payload_size", "atol"),
+    [
+        (VectorStorageFormat.FLOAT32, 1536 * 4, 1e-7),
+        (VectorStorageFormat.FLOAT16, 1536 * 2, 1e-3),
+        (VectorStorageFormat.INT8, 1536 + 4, 1e-2),
+    ],
+)
+def test_round_trip(vector, storage_format, payload_size, atol):
+    data = encode_vector(vector, storage_format)
+
+    assert is_encoded_vector(data)
+    assert len(data) == 12 + payload_size
+    decoded = decode_vector(data)
+    assert decoded.shape == (1536,)
+    assert np.allclose(decoded, vector, atol=atol)
+
+
+def test_float32_is_smaller_than_pickled_list(vector):
+    assert len(encode_vector(vector)) * 2 < len(pickle.dumps(vector.tolist(), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_decode_is_zero_copy_for_float_payloads(vector):
+    decoded = decode_vector(encode_vector(vector))
+
+    assert not decoded.flags.owndata
+    assert not decoded.flags.writeable
+
+
+def test_decode_rejects_unknown_data():
+    with pytest.raises(VectorCodecError):
+        decode_vector(b"not a vector")
+
+
+def test_legacy_pickled_rows_stay_readable(vector):
+    embedding = Embedding(model_name="model", hash="hash", provider_name="provider")
+    embedding.embedding = pickle.dumps(vector.tolist(), protocol=pickle.HIGHEST_PROTOCOL)
+
+    assert embedding.is_legacy_format
+    assert np.allclose(decode_stored_vector(embedding.embedding), vector)
+    assert embedding.get_embedding() == vector.tolist()
+
+    embedding.set_embedding(embedding.get_embedding_array())
+    assert not embedding.is_legacy_format
+    assert np.allclose(embedding.get_embedding_array(), vector, atol=1e-7)
@@ -0,0 +1,98 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from core.rag.models.document import Document
+from core.rag.rerank.entity.weight import KeywordScoringMethod
+from core.rag.rerank.keyword_scorer import KeywordScorer, KeywordTermMatrix
+
+VOCABULARY = [f"term{i}" for i in range(500)]
+
+
+def _reference_tfidf_cosine(query_keywords: list[str], documents_keywords: list[list[str]]) -> list[float]:
+    """The former per-document dict implementation."""
+    total_documents = len(documents_keywords)
+    all_keywords = set().union(*documents_keywords)
+    keyword_idf = {
+        keyword: math.log((1 + total_documents) / (1 + sum(1 for doc in documents_keywords if keyword in doc))) + 1
+        for keyword in all_keywords
+    }
+    query_tfidf = {keyword: count * keyword_idf.get(keyword, 0) for keyword, count in Counter(query_keywords).items()}
+
+    scores = []
+    for document_keywords in documents_keywords:
+        document_tfidf = {
+            keyword: count * keyword_idf[keyword] for keyword, count in Counter(document_keywords).items()
+        }
+        numerator = sum(query_tfidf[x] * document_tfidf[x] for x in set(query_tfidf) & set(document_tfidf))
+        denominator = math.sqrt(sum(v**2 for v in query_tfidf.values())) * math.sqrt(
+            sum(v**2 for v in document_tfidf.values())
+        )
+        scores.append(numerator / denominator if denominator else 0.0)
+    return scores
+
+
+def _random_documents_keywords(count: int, seed: int = 0) -> list[list[str]]:
+    rng = np.random.default_rng(seed)
+    return [rng.choice(VOCABULARY, size=rng.integers(1, 20), replace=False).tolist() for _ in range(count)]
+
+
+def test_tfidf_cosine_matches_reference():
+    documents_keywords = _random_documents_keywords(200)
+    query_keywords = ["term1", "term2", "term3", "unknown"]
+
+    scores = KeywordTermMatrix(documents_keywords).tfidf_cosine_scores(query_keywords)
+
+    assert scores.tolist() == pytest.approx(_reference_tfidf_cosine(query_keywords, documents_keywords))
+
+
+def test_bm25_prefers_documents_matching_rare_terms():
+    documents_keywords = [["common", "rare"], ["common", "other"], ["common"], ["unrelated"]]
+
+    scores = KeywordTermMatrix(documents_keywords).bm25_scores(["common", "rare"]).tolist()
+
+    assert scores[0] == 1.0
+    assert scores[0] > scores[1] > scores[3]
+    assert scores[3] == 0.0
+
+
+def test_empty_candidates():
+    matrix = KeywordTermMatrix([])
+
+    assert matrix.tfidf_cosine_scores(["term"]).tolist() == []
+    assert matrix.bm25_scores(["term"]).tolist() == []
+
+
+def test_scorer_reuses_stored_keywords(mocker):
+    load_segment_keywords = mocker.patch.object(
+        KeywordScorer, "_load_segment_keywords", return_value={"node-2": ["apple", "banana"]}
+    )
+    documents = [
+        Document(page_content="ignored", metadata={"doc_id": "node-1", "keywords": ["apple"]}),
+        Document(page_content="ignored", metadata={"doc_id": "node-2"}),
+    ]
+
+    scores = KeywordScorer(KeywordScoringMethod.TF_IDF).score("apple", documents)
+
+    load_segment_keywords.assert_called_once_with(["node-2"])
+    assert documents[1].metadata["keywords"] == ["apple", "banana"]
+    assert scores[0] == pytest.approx(1.0)
+    assert 0 < scores[1] < 1
+
+
+@pytest.mark.parametrize("candidates", [50, 200, 1000])
+@pytest.mark.parametrize("method", ["tf_idf", "bm25"])
+def test_keyword_scoring_benchmark(benchmark, candidates, method):
+    documents_keywords = _random_documents_keywords(candidates)
+    query_keywords = ["term1", "term2", "term3"]
+
+    def run():
+        matrix = KeywordTermMatrix(documents_keywords)
+        if method == "bm25":
+            return matrix.bm25_scores(query_keywords)
+        return matrix.tfidf_cosine_scores(query_keywords)
+
+    scores = benchmark(run)
+    assert len(scores) == candidates
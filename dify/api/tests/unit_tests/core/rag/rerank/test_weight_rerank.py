@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from core.rag.models.document import Document
+from core.rag.rerank import weight_rerank
+from core.rag.rerank.entity.weight import KeywordSetting, VectorSetting, Weights
+from core.rag.rerank.weight_rerank import WeightRerankRunner
+
+
+@pytest.fixture
+def runner() -> WeightRerankRunner:
+    return WeightRerankRunner(
+        tenant_id="tenant-1",
+        weights=Weights(
+            vector_setting=VectorSetting(
+                vector_weight=0.7, embedding_provider_name="provider", embedding_model_name="model"
+            ),
+            keyword_setting=KeywordSetting(keyword_weight=0.3),
+        ),
+    )
+
+
+def test_calculate_cosine_scores_all_unscored_documents_at_once(runner, mocker):
+    vector_cache = mocker.patch.object(weight_rerank, "vector_cache")
+    rng = np.random.default_rng(0)
+    query_vector = rng.standard_normal(8).tolist()
+    documents = [
+        Document(page_content="scored", metadata={"doc_id": "1", "score": 0.42}),
+        Document(page_content="a", vector=rng.standard_normal(8).tolist(), metadata={"doc_id": "2"}),
+        Document(page_content="b", vector=rng.standard_normal(8).tolist(), metadata={"doc_id": "3"}),
+        Document(page_content="no vector", metadata={"doc_id": "4"}),
+    ]
+
+    scores = runner._calculate_cosine("tenant-1", "query", documents, runner.weights.vector_setting, query_vector)
+
+    # the query embedding of the retrieval is reused
+    vector_cache.get_embeddings.assert_not_called()
+    assert scores[0] == pytest.approx(0.42)
+    for document, score in zip(documents[1:3], scores[1:3]):
+        expected = np.dot(query_vector, document.vector) / (
+            np.linalg.norm(query_vector) * np.linalg.norm(document.vector)
+        )
+        assert score == pytest.approx(expected, abs=1e-6)
+    assert scores[3] == 0.0
+
+
+def test_calculate_cosine_skips_embedding_when_all_documents_are_scored(runner, mocker):
+    vector_cache = mocker.patch.object(weight_rerank, "vector_cache")
+    documents = [Document(page_content="scored", metadata={"doc_id": "1", "score": 0.9})]
+
+    assert runner._calculate_cosine("tenant-1", "query", documents, runner.weights.vector_setting) == [0.9]
+    vector_cache.get_embeddings.assert_not_called()
+
+
+def test_calculate_cosine_scores_zero_for_an_all_zero_query_vector(runner, mocker):
+    mocker.patch.object(weight_rerank, "vector_cache")
+    documents = [
+        Document(page_content="scored", metadata={"doc_id": "1", "score": 0.42}),
+        Document(page_content="a", vector=[1.0, 2.0, 3.0], metadata={"doc_id": "2"}),
+    ]
+
+    scores = runner._calculate_cosine("tenant-1", "query", documents, runner.weights.vector_setting, [0.0, 0.0, 0.0])
+
+    assert scores == [pytest.approx(0.42), 0.0]
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+from core.rag.retrieval.retrieval_executor import RetrievalExecutor
+
+
+@pytest.fixture
+def executor():
+    retrieval_executor = RetrievalExecutor("test", max_workers=4)
+    yield retrieval_executor
+    retrieval_executor.shutdown()
+
+
+def test_run_returns_results_in_task_order_with_latency(executor):
+    results = executor.run({"dataset-1": lambda: ["a"], "dataset-2": lambda: ["b", "c"]}, timeout=5)
+
+    assert [result.key for result in results] == ["dataset-1", "dataset-2"]
+    assert [result.result for result in results] == [["a"], ["b", "c"]]
+    assert all(result.succeeded and result.latency >= 0 for result in results)
+
+
+def test_run_returns_partial_results_when_a_task_misses_the_deadline(executor):
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return ["late"]
+
+    started_at = time.perf_counter()
+    results = executor.run({"fast": lambda: ["on time"], "slow": slow}, timeout=0.2)
+    elapsed = time.perf_counter() - started_at
+    release.set()
+
+    assert elapsed < 2
+    fast, late = results
+    assert fast.result == ["on time"]
+    assert late.timed_out
+    assert late.result is None
+
+
+def test_run_isolates_failing_tasks(executor):
+    def failing():
+        raise ValueError("vector store unavailable")
+
+    failed, succeeded = executor.run({"broken": failing, "healthy": lambda: ["ok"]}, timeout=5)
+
+    assert isinstance(failed.error, ValueError)
+    assert not failed.succeeded
+    assert succeeded.result == ["ok"]
+
+
+def test_run_cancels_queued_tasks_after_the_deadline():
+    single_worker = RetrievalExecutor("single", max_workers=1)
+    release = threading.Event()
+    calls = []
+
+    def blocking():
+        release.wait(5)
+
+    def queued():
+        calls.append("queued")
+
+    try:
+        blocked, cancelled = single_worker.run({"blocking": blocking, "queued": queued}, timeout=0.1)
+        release.set()
+        time.sleep(0.1)
+    finally:
+        single_worker.shutdown()
+
+    assert blocked.timed_out
+    assert cancelled.timed_out
+    assert calls == []
+
+
+def test_stalled_key_holds_at_most_max_overdue_threads():
+    pool = RetrievalExecutor("overdue", max_workers=4, max_overdue=2)
+    release = threading.Event()
+    stalled_calls = []
+
+    def stalled():
+        stalled_calls.append(1)
+        release.wait(5)
+
+    try:
+        for _ in range(5):
+            stalled_result, healthy = pool.run({"stalled": stalled, "healthy": lambda: ["ok"]}, timeout=0.05)
+            # the other datasets keep their threads and results
+            assert healthy.result == ["ok"]
+            assert stalled_result.timed_out or stalled_result.skipped
+        assert len(stalled_calls) == 2
+        assert pool.overdue() == {"stalled": 2}
+        assert pool.stats()["stalled"]["skipped"] == 3
+
+        release.set()
+        deadline = time.monotonic() + 2
+        while pool.overdue() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.overdue() == {}
+        (recovered,) = pool.run({"stalled": lambda: ["back"]}, timeout=5)
+        assert recovered.result == ["back"]
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_nested_runs_share_the_deadline_of_the_outer_run(executor):
+    inner_executor = RetrievalExecutor("inner", max_workers=2)
+    release = threading.Event()
+    inner_finished = threading.Event()
+    inner_results = []
+
+    def dataset():
+        time.sleep(0.1)
+        started_at = time.perf_counter()
+        (search,) = inner_executor.run({"search": lambda: release.wait(5)}, timeout=5)
+        inner_results.append((search.timed_out, time.perf_counter() - started_at))
+        inner_finished.set()
+
+    try:
+        executor.run({"dataset": dataset}, timeout=0.5)
+        inner_finished.wait(2)
+    finally:
+        release.set()
+        inner_executor.shutdown()
+
+    # the inner run got what remained of the 0.5s of the outer run, not its own 5s
+    ((timed_out, elapsed),) = inner_results
+    assert timed_out
+    assert elapsed < 0.5
+
+
+def test_stats_report_latency_per_key(executor):
+    def failing():
+        raise ValueError("vector store unavailable")
+
+    executor.run({"dataset-1": lambda: ["a"], "dataset-2": failing}, timeout=5)
+    executor.run({"dataset-1": lambda: ["b"]}, timeout=5)
+
+    stats = executor.stats()
+    assert stats["dataset-1"]["count"] == 2
+    assert stats["dataset-1"]["errors"] == 0
+    assert stats["dataset-2"]["errors"] == 1
+    assert stats["dataset-1"]["max"] >= stats["dataset-1"]["avg"] >= 0
+
+    executor.reset_stats()
+    assert executor.stats() == {}
+
+
+def test_pool_is_shared_across_runs(executor):
+    thread_names = set()
+
+    def record():
+        thread_names.add(threading.current_thread().name)
+
+    for _ in range(20):
+        executor.run({"dataset": record}, timeout=5)
+
+    assert len(thread_names) <= 4
+    assert all(name.startswith("retrieval-test") for name in thread_names)
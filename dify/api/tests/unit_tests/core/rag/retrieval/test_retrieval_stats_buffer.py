@@ -0,0 +1,110 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core.rag.models.document import Document
+from core.rag.retrieval import retrieval_stats_buffer as buffer_module
+from core.rag.retrieval.retrieval_stats_buffer import RetrievalStatsBuffer
+from models.dataset import ChildChunk, DocumentSegment
+
+
+def _document(doc_id: str, dataset_id: str = "dataset-1") -> Document:
+    return Document(page_content=doc_id, metadata={"doc_id": doc_id, "dataset_id": dataset_id}, provider="dify")
+
+
+@pytest.fixture
+def session(mocker):
+    session = MagicMock()
+    mocker.patch.object(buffer_module, "db", MagicMock(session=session))
+    return session
+
+
+@pytest.fixture
+def buffer(mocker):
+    stats_buffer = RetrievalStatsBuffer(flush_interval=60, flush_threshold=100)
+    # no background worker in tests, flushes are explicit
+    mocker.patch.object(stats_buffer, "_ensure_worker")
+    return stats_buffer
+
+
+def _query_results(session, segments: list[tuple], child_chunks: list[tuple]) -> dict[str, MagicMock]:
+    queries = {"segments": MagicMock(), "child_chunks": MagicMock(), "update": MagicMock()}
+    queries["segments"].filter.return_value.all.return_value = segments
+    queries["child_chunks"].filter.return_value.all.return_value = child_chunks
+
+    def query(*entities):
+        if entities[0] is DocumentSegment:
+            return queries["update"]
+        if entities[0] is ChildChunk.segment_id:
+            return queries["child_chunks"]
+        return queries["segments"]
+
+    session.query.side_effect = query
+    return queries
+
+
+def test_hits_are_aggregated_and_written_in_one_update(buffer, session):
+    queries = _query_results(
+        session,
+        segments=[("segment-1", "dataset-1", "node-1"), ("segment-2", "dataset-1", "node-2")],
+        child_chunks=[("segment-3", "dataset-1", "node-3")],
+    )
+    for _ in range(3):
+        buffer.record_hits([_document("node-1"), _document("node-2"), _document("node-3")])
+
+    assert buffer.pending() == 3
+    buffer.flush()
+
+    # every chunk was hit 3 times: one statement increments all their segments
+    update_filter = queries["update"].filter
+    update_filter.assert_called_once()
+    assert update_filter.return_value.update.call_count == 1
+    increment = next(iter(update_filter.return_value.update.call_args.args[0].values()))
+    assert increment.right.value == 3
+    session.commit.assert_called_once()
+    assert buffer.pending() == 0
+
+
+def test_hits_of_other_datasets_are_not_counted(buffer, session):
+    queries = _query_results(session, segments=[("segment-1", "dataset-2", "node-1")], child_chunks=[])
+    buffer.record_hits([_document("node-1", dataset_id="dataset-1")])
+
+    buffer.flush()
+
+    queries["update"].filter.assert_not_called()
+
+
+def test_queries_are_inserted_in_bulk(buffer, session):
+    buffer.record_query("what is dify", ["dataset-1", "dataset-2"], "app-1", "account", "user-1")
+    buffer.record_query("and rag", ["dataset-1"], "app-1", "end_user", "user-2")
+
+    buffer.flush()
+
+    session.execute.assert_called_once()
+    rows = session.execute.call_args.args[1]
+    assert [(row["dataset_id"], row["content"]) for row in rows] == [
+        ("dataset-1", "what is dify"),
+        ("dataset-2", "what is dify"),
+        ("dataset-1", "and rag"),
+    ]
+    assert all(row["created_at"] is not None for row in rows)
+    session.commit.assert_called_once()
+
+
+def test_failed_flush_is_rolled_back_and_dropped(buffer, session):
+    session.execute.side_effect = RuntimeError("database unavailable")
+    buffer.record_query("query", ["dataset-1"], "app-1", "account", "user-1")
+
+    buffer.flush()
+
+    session.rollback.assert_called_once()
+    assert buffer.pending() == 0
+
+
+def test_reaching_the_threshold_wakes_the_worker(buffer):
+    buffer._flush_threshold = 2
+    buffer.record_hits([_document("node-1")])
+    assert not buffer._wakeup.is_set()
+
+    buffer.record_hits([_document("node-2")])
+    assert buffer._wakeup.is_set()
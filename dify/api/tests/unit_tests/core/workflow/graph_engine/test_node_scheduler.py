@@ -0,0 +1,124 @@
+import contextvars
+import threading
+
+from core.app.entities.app_invoke_entities import InvokeFrom
+from core.workflow.entities.variable_pool import VariablePool
+from core.workflow.entities.workflow_node_execution import WorkflowNodeExecutionMetadataKey
+from core.workflow.enums import SystemVariableKey
+from core.workflow.graph_engine.entities.event import GraphRunSucceededEvent, NodeRunStartedEvent, NodeRunSucceededEvent
+from core.workflow.graph_engine.entities.graph import Graph
+from core.workflow.graph_engine.graph_engine import GraphEngine
+from core.workflow.graph_engine.node_scheduler import NodeScheduler, node_scheduler
+from models.enums import UserFrom
+from models.workflow import WorkflowType
+
+
+def _acquire_in_thread(scheduler: NodeScheduler, run_id: str, granted: list[str]) -> threading.Thread:
+    def acquire():
+        scheduler.acquire(run_id)
+        granted.append(run_id)
+
+    # a fresh context, like a worker thread of another branch
+    thread = threading.Thread(target=contextvars.Context().run, args=(acquire,), daemon=True)
+    thread.start()
+    return thread
+
+
+def _wait_for_waiters(scheduler: NodeScheduler, count: int) -> None:
+    for _ in range(1000):
+        if scheduler.stats()["waiting"] == count:
+            return
+        threading.Event().wait(0.001)
+    raise AssertionError(f"expected {count} waiters")
+
+
+def test_slots_are_limited_per_process_and_per_run():
+    scheduler = NodeScheduler(max_concurrency=3, max_concurrency_per_run=2)
+    granted: list[str] = []
+
+    threads = [_acquire_in_thread(scheduler, run_id, granted) for run_id in ("a", "a", "a")]
+    _wait_for_waiters(scheduler, 1)
+    assert granted == ["a", "a"]
+
+    threads.append(_acquire_in_thread(scheduler, "b", granted))
+    threads[-1].join(timeout=5)
+    assert granted == ["a", "a", "b"]
+
+    scheduler.release("a")
+    for thread in threads:
+        thread.join(timeout=5)
+    assert granted == ["a", "a", "b", "a"]
+    assert scheduler.stats()["running"] == 3
+
+
+def test_freed_slots_are_handed_to_waiting_runs_in_turn():
+    scheduler = NodeScheduler(max_concurrency=1, max_concurrency_per_run=1)
+    scheduler.acquire("busy")
+    granted: list[str] = []
+
+    threads = []
+    for run_id in ("a", "a", "a", "b", "b"):
+        threads.append(_acquire_in_thread(scheduler, run_id, granted))
+        _wait_for_waiters(scheduler, len(threads))
+
+    scheduler.release("busy")
+    for index in range(len(threads)):
+        for _ in range(1000):
+            if len(granted) > index:
+                break
+            threading.Event().wait(0.001)
+        scheduler.release(granted[index])
+
+    assert granted == ["a", "b", "a", "b", "a"]
+
+
+def test_nested_acquire_reuses_the_slot_of_the_context():
+    scheduler = NodeScheduler(max_concurrency=1, max_concurrency_per_run=1)
+
+    assert scheduler.acquire("outer") is True
+    assert scheduler.acquire("nested") is False
+    scheduler.release("outer")
+
+    assert scheduler.stats()["running"] == 0
+
+
+def test_graph_engine_reports_scheduling_latency():
+    graph_config = {
+        "edges": [{"id": "1", "source": "start", "target": "end"}],
+        "nodes": [
+            {"data": {"type": "start", "title": "start", "variables": []}, "id": "start"},
+            {"data": {"type": "end", "title": "end", "outputs": []}, "id": "end"},
+        ],
+    }
+    graph_engine = GraphEngine(
+        tenant_id="111",
+        app_id="222",
+        workflow_type=WorkflowType.WORKFLOW,
+        workflow_id="333",
+        graph_config=graph_config,
+        user_id="444",
+        user_from=UserFrom.ACCOUNT,
+        invoke_from=InvokeFrom.WEB_APP,
+        call_depth=0,
+        graph=Graph.init(graph_config=graph_config),
+        variable_pool=VariablePool(system_variables={SystemVariableKey.USER_ID: "aaa"}, user_inputs={}),
+        max_execution_steps=500,
+        max_execution_time=1200,
+    )
+    node_scheduler.reset_stats()
+
+    items = list(graph_engine.run())
+
+    assert isinstance(items[-1], GraphRunSucceededEvent)
+    started = [item for item in items if isinstance(item, NodeRunStartedEvent)]
+    assert [item.route_node_state.node_id for item in started] == ["start", "end"]
+    assert all(item.route_node_state.scheduling_latency > 0 for item in started)
+    succeeded = [item for item in items if isinstance(item, NodeRunSucceededEvent)]
+    assert all(
+        item.route_node_state.node_run_result.metadata[WorkflowNodeExecutionMetadataKey.SCHEDULING_LATENCY] > 0
+        for item in succeeded
+    )
+    stats = node_scheduler.stats()
+    assert stats["running"] == 0
+    assert stats["scheduling_latency"]["start"]["count"] == 1
+    assert stats["scheduling_latency"]["end"]["count"] == 1
@@ -2,7 +2,11 @@ import time
 import uuid
 from unittest.mock import patch
 
+from yarl import URL
+
+from configs import dify_config
 from core.app.entities.app_invoke_entities import InvokeFrom
+from core.helper.code_executor import code_executor
 from core.workflow.entities.node_entities import NodeRunResult
 from core.workflow.entities.variable_pool import VariablePool
 from core.workflow.entities.workflow_node_execution import WorkflowNodeExecutionStatus
@@ -16,6 +20,7 @@ from core.workflow.nodes.iteration.iteration_node import IterationNode
 from core.workflow.nodes.template_transform.template_transform_node import TemplateTransformNode
 from models.enums import UserFrom
 from models.workflow import WorkflowType
+from tests.unit_tests.core.helper.code_executor.fake_sandbox import FakeSandbox
 
 
 def test_run():
@@ -859,3 +864,84 @@ def test_iteration_run_error_handle():
             assert item.run_result.status == WorkflowNodeExecutionStatus.SUCCEEDED
             assert item.run_result.outputs == {"output": []}
     assert count == 14
+
+
+def test_iteration_batches_code_node_executions(monkeypatch):
+    graph_config = {
+        "edges": [
+            {"id": "start-source-iteration-1-target", "source": "start", "target": "iteration-1"},
+            {"id": "iteration-start-source-code-target", "source": "iteration-start", "target": "code"},
+        ],
+        "nodes": [
+            {"data": {"title": "Start", "type": "start", "variables": []}, "id": "start"},
+            {
+                "data": {
+                    "iterator_selector": ["start", "numbers"],
+                    "output_selector": ["code", "result"],
+                    "output_type": "array[number]",
+                    "start_node_id": "iteration-start",
+                    "title": "iteration",
+                    "type": "iteration",
+                },
+                "id": "iteration-1",
+            },
+            {
+                "data": {"iteration_id": "iteration-1", "title": "iteration-start", "type": "iteration-start"},
+                "id": "iteration-start",
+            },
+            {
+                "data": {
+                    "iteration_id": "iteration-1",
+                    "title": "code",
+                    "type": "code",
+                    "code_language": "python3",
+                    "code": "def main(x: int) -> dict:\n    return {'result': 12 // x}\n",
+                    "variables": [{"variable": "x", "value_selector": ["iteration-1", "item"]}],
+                    "outputs": {"result": {"type": "number"}},
+                },
+                "id": "code",
+            },
+        ],
+    }
+
+    graph = Graph.init(graph_config=graph_config)
+
+    init_params = GraphInitParams(
+        tenant_id="1",
+        app_id="1",
+        workflow_type=WorkflowType.WORKFLOW,
+        workflow_id="1",
+        graph_config=graph_config,
+        user_id="1",
+        user_from=UserFrom.ACCOUNT,
+        invoke_from=InvokeFrom.DEBUGGER,
+        call_depth=0,
+    )
+
+    pool = VariablePool(
+        system_variables={SystemVariableKey.FILES: [], SystemVariableKey.USER_ID: "1"},
+        user_inputs={},
+        environment_variables=[],
+    )
+    pool.add(["start", "numbers"], [1, 2, 3, 4, 6])
+
+    iteration_node = IterationNode(
+        id=str(uuid.uuid4()),
+        graph_init_params=init_params,
+        graph=graph,
+        graph_runtime_state=GraphRuntimeState(variable_pool=pool, start_at=time.perf_counter()),
+        config=graph_config["nodes"][1],
+    )
+
+    with FakeSandbox(api_key=dify_config.CODE_EXECUTION_API_KEY) as sandbox:
+        monkeypatch.setattr(code_executor, "code_execution_endpoint_url", URL(sandbox.url))
+        monkeypatch.setattr(dify_config, "CODE_EXECUTION_BATCH_SIZE", 2)
+
+        events = list(iteration_node._run())
+
+        assert sandbox.runs == 3
+
+    completed = events[-1]
+    assert isinstance(completed, RunCompletedEvent)
+    assert completed.run_result.status == WorkflowNodeExecutionStatus.SUCCEEDED
+    assert completed.run_result.outputs == {"output": [12, 6, 4, 3, 2]}
@@ -1,3 +1,6 @@
+import tracemalloc
+from datetime import datetime
+
 import pytest
 
 from core.file import File, FileTransferMethod, FileType
@@ -44,3 +47,125 @@ def test_use_long_selector(pool):
     result = pool.get(("node_1", "part_1", "part_2"))
     assert result is not None
     assert result.value == "test_value"
+
+
+def test_child_reads_through_to_parent(pool, file):
+    pool.add(("node_1", "text"), "parent_value")
+    pool.add(("node_1", "file_var"), FileSegment(value=file))
+
+    child = pool.create_child()
+
+    assert child.get(("node_1", "text")) is pool.get(("node_1", "text"))
+    assert child.get(("node_1", "file_var", "name")).value == file.filename
+
+
+def test_child_writes_and_removals_stay_in_child(pool):
+    pool.add(("node_1", "text"), "parent_value")
+    pool.add(("node_2", "text"), "parent_value")
+    child = pool.create_child()
+
+    child.add(("node_1", "text"), "child_value")
+    child.add(("node_3", "text"), "child_value")
+    child.remove(("node_2",))
+
+    assert child.get(("node_1", "text")).value == "child_value"
+    assert child.get(("node_2", "text")) is None
+    assert pool.get(("node_1", "text")).value == "parent_value"
+    assert pool.get(("node_2", "text")).value == "parent_value"
+    assert pool.get(("node_3", "text")) is None
+
+    child.remove(("node_1", "text"))
+    assert child.get(("node_1", "text")) is None
+
+    grandchild = child.create_child()
+    grandchild.add(("node_2", "text"), "grandchild_value")
+    assert grandchild.get(("node_1", "text")) is None
+    assert grandchild.get(("node_2", "text")).value == "grandchild_value"
+    assert child.get(("node_2", "text")) is None
+
+
+@pytest.fixture
+def retrieval_pool(pool):
+    # roughly what a knowledge retrieval node with 50 chunks of 20KB leaves in the pool
+    documents = [{"content": "x" * 20_000, "metadata": {"score": 0.5, "position": i}} for i in range(50)]
+    pool.add(("knowledge_retrieval", "result"), documents)
+    return pool
+
+
+def test_child_shares_segments_of_parent(retrieval_pool):
+    tracemalloc.start()
+    try:
+        children = [retrieval_pool.create_child() for _ in range(200)]
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert all(child.get(("knowledge_retrieval", "result")) is not None for child in children)
+    assert size / len(children) < 16 * 1024
+
+
+def test_create_child_benchmark(benchmark, retrieval_pool):
+    def run():
+        child = retrieval_pool.create_child()
+        child.add(("iteration", "index"), 0)
+        child.add(("iteration", "item"), "item")
+        return child.get(("knowledge_retrieval", "result"))
+
+    assert benchmark(run) is not None
+
+
+def test_get_resolves_keys_nested_in_objects(pool, file):
+    pool.add(("http", "body"), {"user": {"name": "dify", "tags": ["a", "b"]}, "avatar": file})
+
+    assert pool.get(("http", "body", "user", "name")).value == "dify"
+    assert pool.get(("http", "body", "user", "tags")).value == ["a", "b"]
+    assert pool.get(("http", "body", "user", "name")).selector == ["http", "body", "user", "name"]
+    assert pool.get(("http", "body", "avatar", "name")).value == file.filename
+    assert pool.get(("http", "body", "user", "missing")) is None
+    assert pool.get(("http", "body", "user", "name", "more")) is None
+
+
+def test_keys_added_explicitly_take_precedence_over_nested_keys(pool):
+    pool.add(("http", "body"), {"user": {"name": "dify"}})
+    pool.add(("http", "body", "user", "name"), "overridden")
+
+    assert pool.get(("http", "body", "user", "name")).value == "overridden"
+
+    child = pool.create_child()
+    child.remove(("http",))
+    assert child.get(("http", "body", "user")) is None
+
+
+def test_unsupported_nested_values_fail_when_added(pool):
+    with pytest.raises(ValueError, match="not supported value"):
+        pool.add(("http", "body"), {"user": {"created_at": datetime.now()}})
+    with pytest.raises(ValueError, match="not supported value"):
+        pool.add(("http", "body"), {"dates": [datetime.now()]})
+
+    pool.add(("http", "body"), {"users": [{"created_at": "2025-01-01"}], "count": None})
+
+
+@pytest.fixture
+def large_output():
+    return {f"item_{i}": {"id": i, "name": f"name {i}", "tags": {"a": "x", "b": "y"}} for i in range(2000)}
+
+
+def test_nested_keys_are_not_materialized(pool, large_output):
+    tracemalloc.start()
+    try:
+        pool.add(("http", "body"), large_output)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(pool.variable_dictionary["http"]) == 1
+    assert size < 1024 * 1024
+
+
+def test_get_nested_key_benchmark(benchmark, pool, large_output):
+    pool.add(("http", "body"), large_output)
+
+    result = benchmark(pool.get, ("http", "body", "item_1500", "tags", "a"))
+
+    assert result is not None
+    assert result.value == "x"
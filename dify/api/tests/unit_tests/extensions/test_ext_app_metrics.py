@@ -0,0 +1,123 @@
+import pytest
+from flask import Flask
+
+from configs import dify_config
+from extensions import ext_app_metrics
+
+INNER_API_HEADERS = {"X-Inner-Api-Key": "inner-api-key"}
+
+
+@pytest.fixture
+def client(mocker):
+    mocker.patch.object(dify_config, "INNER_API", True)
+    mocker.patch.object(dify_config, "INNER_API_KEY", "inner-api-key")
+    app = Flask(__name__)
+    ext_app_metrics.init_app(app)
+    return app.test_client()
+
+
+@pytest.mark.parametrize(
+    "route",
+    [
+        "/ssrf-pool-stat",
+        "/node-execution-flush-stat",
+        "/node-execution-cache-stat",
+        "/vector-pool-stat",
+        "/vector-cache-stat",
+        "/embedding-cache-stat",
+        "/keyword-table-cache-stat",
+        "/retrieval-cache-stat",
+    ],
+)
+def test_stats_require_the_inner_api_key(client, route):
+    assert client.get(route).status_code == 401
+    assert client.get(route, headers={"X-Inner-Api-Key": "wrong"}).status_code == 401
+
+
+def test_ssrf_pool_stat(client, mocker):
+    from core.helper import ssrf_proxy
+
+    pools = {"sync:direct:True": {"connections": 2, "idle": 1, "active": 1, "waiting": 0}}
+    mocker.patch.object(ssrf_proxy, "pool_stats", return_value=pools)
+
+    response = client.get("/ssrf-pool-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert response.json["pools"] == pools
+
+
+def test_node_execution_flush_stat(client):
+    response = client.get("/node-execution-flush-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert {"flush_latency", "flushed_rows", "errors", "dropped_rows", "queue_depth"} <= response.json.keys()
+
+
+def test_node_execution_cache_stat(client):
+    response = client.get("/node-execution-cache-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert {"caches", "entries", "hits", "misses", "evictions", "payload_bytes"} <= response.json.keys()
+
+
+def test_vector_pool_stat(client, mocker):
+    from core.rag.datasource.vdb.connection_pool import connection_pool_registry
+
+    pools = {"pgvector": {"pools": 1, "size": 2, "in_use": 1, "waiting": 0, "created": 2}}
+    mocker.patch.object(connection_pool_registry, "stats", return_value=pools)
+
+    response = client.get("/vector-pool-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert response.json["pools"] == pools
+
+
+def test_vector_cache_stat(client):
+    response = client.get("/vector-cache-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert {"hits", "misses", "constructions", "construction_seconds", "avg_construction_seconds"} <= (
+        response.json.keys()
+    )
+
+
+def test_embedding_cache_stat(client):
+    from core.rag.embedding.embedding_cache import document_embedding_cache
+
+    document_embedding_cache.stats.reset()
+    document_embedding_cache.stats.incr("local", 3)
+    document_embedding_cache.stats.incr("model", 1)
+
+    response = client.get("/embedding-cache-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert response.json["local_hits"] == 3
+    assert response.json["local_hit_rate"] == 0.75
+    document_embedding_cache.stats.reset()
+
+
+def test_keyword_table_cache_stat(client, mocker):
+    from core.rag.datasource.keyword.keyword_table_cache import keyword_table_cache
+
+    stats = {"hits": 3, "misses": 1, "hit_rate": 0.75, "entries": 2, "size": 512}
+    mocker.patch.object(keyword_table_cache, "stats", return_value=stats)
+
+    response = client.get("/keyword-table-cache-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert response.json["hit_rate"] == 0.75
+    assert response.json["misses"] == 1
+
+
+def test_retrieval_cache_stat(client, mocker):
+    from core.rag.datasource.retrieval_result_cache import retrieval_result_cache
+
+    stats = {"hits": 2, "misses": 1, "hit_rate": 2 / 3, "datasets": 1}
+    mocker.patch.object(retrieval_result_cache, "total_stats", return_value=stats)
+
+    response = client.get("/retrieval-cache-stat", headers=INNER_API_HEADERS)
+
+    assert response.status_code == 200
+    assert response.json["hits"] == 2
+    assert response.json["datasets"] == 1
+    assert "dataset-1" not in response.get_data(as_text=True)
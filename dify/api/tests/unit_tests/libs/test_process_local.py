@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from libs.process_local import ProcessLocal
+
+
+def test_process_local_creates_the_object_once():
+    local = ProcessLocal(object)
+
+    assert local.peek() is None
+    assert local.get() is local.get()
+    assert local.peek() is local.get()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not supported")
+def test_process_local_creates_a_new_object_in_forked_processes():
+    local = ProcessLocal(object)
+    parent_value = local.get()
+
+    pid = os.fork()
+    if pid == 0:
+        # nothing is inherited, and the object of the parent is not handed out to be closed
+        os._exit(0 if local.peek() is None and local.get() is not parent_value and local.pop() is not None else 1)
+    _, status = os.waitpid(pid, 0)
+
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert local.get() is parent_value
+
+
+def test_process_local_pop():
+    local = ProcessLocal(object)
+    value = local.get()
+
+    assert local.pop() is value
+    assert local.pop() is None
+    assert local.get() is not value
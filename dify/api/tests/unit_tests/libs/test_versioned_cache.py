@@ -0,0 +1,23 @@
+from libs.versioned_cache import VersionedCache
+
+
+def test_values_are_scoped_by_version(fake_redis):
+    cache = VersionedCache("test_version:{}", maxsize=10, ttl=60)
+    cache.set("scope-1", cache.get_version("scope-1"), "value")
+
+    assert cache.get("scope-1", cache.get_version("scope-1")) == "value"
+    cache.bump_version("scope-1")
+    assert cache.get("scope-1", cache.get_version("scope-1")) is None
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 1
+
+
+def test_cache_is_bypassed_without_version(mocker, fake_redis):
+    mocker.patch.object(fake_redis, "get", side_effect=ConnectionError)
+    cache = VersionedCache("test_version:{}", maxsize=10, ttl=60)
+
+    version = cache.get_version("scope-1")
+    cache.set("scope-1", version, "value")
+
+    assert version is None
+    assert cache.get("scope-1", version) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from flask_restful import marshal
+
+from fields.conversation_fields import conversation_fields, conversation_with_summary_fields
+from models import model
+from models.model import Conversation, Message, MessageFeedback
+
+PAGE_SIZE = 20
+
+
+def _conversation(index: int) -> Conversation:
+    return Conversation(
+        id=f"conversation-{index}",
+        app_id="app",
+        app_model_config_id="app-model-config",
+        mode="chat",
+        name=f"conversation {index}",
+        status="normal",
+        from_source="api",
+        from_end_user_id=f"end-user-{index}",
+        dialogue_count=0,
+    )
+
+
+@pytest.fixture
+def session(mocker):
+    session = MagicMock()
+    session.results = {}
+
+    def query(*entities):
+        query_mock = MagicMock()
+        for method in ("filter", "outerjoin", "join", "group_by", "order_by"):
+            getattr(query_mock, method).return_value = query_mock
+        query_mock.all.return_value = session.results.get(entities[0], [])
+        query_mock.count.return_value = 0
+        query_mock.first.return_value = None
+        return query_mock
+
+    session.query.side_effect = query
+    mocker.patch.object(model, "db", SimpleNamespace(session=session))
+    return session
+
+
+@pytest.mark.parametrize("fields", [conversation_fields, conversation_with_summary_fields])
+def test_marshalling_a_page_queries_per_conversation_without_aggregates(session, fields):
+    marshal([_conversation(index) for index in range(PAGE_SIZE)], fields)
+
+    assert session.query.call_count >= 7 * PAGE_SIZE
+
+
+@pytest.mark.parametrize("fields", [conversation_fields, conversation_with_summary_fields])
+def test_loaded_aggregates_are_marshalled_without_further_queries(session, fields):
+    conversations = [_conversation(index) for index in range(PAGE_SIZE)]
+    first_message = Message(id="message", conversation_id="conversation-0", query="hello", answer="hi")
+    session.results = {
+        Message.conversation_id: [("conversation-0", None, 2), ("conversation-0", "succeeded", 1)],
+        MessageFeedback.conversation_id: [
+            ("conversation-0", "user", "like", 3),
+            ("conversation-0", "admin", "dislike", 1),
+        ],
+        Message: [first_message],
+    }
+
+    Conversation.load_aggregates(conversations)
+    query_count = session.query.call_count
+    data = marshal(conversations, fields)
+
+    assert query_count <= 8
+    assert session.query.call_count == query_count
+    assert data[0]["user_feedback_stats"] == {"like": 3, "dislike": 0}
+    assert data[0]["admin_feedback_stats"] == {"like": 0, "dislike": 1}
+    assert conversations[0].message_count == 3
+    assert conversations[0].status_count == {"success": 1, "failed": 0, "partial_success": 0}
+    assert conversations[0].first_message is first_message
+    assert conversations[1].message_count == 0
+    assert conversations[1].status_count is None
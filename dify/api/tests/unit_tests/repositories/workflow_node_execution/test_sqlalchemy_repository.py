@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session, sessionmaker
 
 from core.model_runtime.utils.encoders import jsonable_encoder
 from core.repositories import SQLAlchemyWorkflowNodeExecutionRepository
+from core.repositories.sqlalchemy_workflow_node_execution_repository import node_execution_cache_stats
 from core.workflow.entities.workflow_node_execution import (
     WorkflowNodeExecution,
     WorkflowNodeExecutionMetadataKey,
@@ -400,3 +401,72 @@ def test_to_domain_model(repository):
     assert domain_model.metadata == metadata_dict
     assert domain_model.created_at == db_model.created_at
     assert domain_model.finished_at == db_model.finished_at
+
+
+def _running_execution(index: int) -> WorkflowNodeExecution:
+    return WorkflowNodeExecution(
+        id=f"id-{index}",
+        node_execution_id=f"node-execution-{index}",
+        workflow_id="test-workflow-id",
+        workflow_execution_id="test-workflow-run-id",
+        index=index,
+        node_id=f"node-{index}",
+        node_type=NodeType.LLM,
+        title="LLM",
+        status=WorkflowNodeExecutionStatus.RUNNING,
+        created_at=datetime.now(),
+    )
+
+
+def test_running_executions_are_served_from_cache_until_finished(repository, session):
+    session_obj, _ = session
+    session_obj.scalar.return_value = None
+    execution = _running_execution(1)
+
+    repository.save(execution)
+    cached = repository.get_by_node_execution_id("node-execution-1")
+    assert cached is not None
+    assert cached.status == WorkflowNodeExecutionStatus.RUNNING
+    session_obj.scalar.assert_not_called()
+
+    execution.status = WorkflowNodeExecutionStatus.SUCCEEDED
+    repository.save(execution)
+    assert repository.get_by_node_execution_id("node-execution-1") is None
+    session_obj.scalar.assert_called_once()
+    assert repository._node_execution_cache.stats() == {
+        "entries": 0,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+        "payload_bytes": 0,
+    }
+
+
+def test_node_execution_cache_is_bounded(repository, monkeypatch):
+    monkeypatch.setattr(repository._node_execution_cache, "maxsize", 2)
+
+    for index in range(3):
+        repository.save(_running_execution(index))
+
+    assert len(repository._node_execution_cache) == 2
+    assert repository._node_execution_cache.get("node-execution-0") is None
+    assert repository._node_execution_cache.get("node-execution-2") is not None
+    assert node_execution_cache_stats()["evictions"] >= 1
+
+
+def test_node_execution_cache_tracks_payload_size(repository):
+    cache = repository._node_execution_cache
+    execution = _running_execution(0)
+    execution.inputs = {"query": "x" * 1000}
+
+    cache.put(execution)
+    held = cache.stats()["payload_bytes"]
+    assert held > 1000
+
+    execution.inputs = {"query": "x" * 2000}
+    cache.put(execution)
+    assert cache.stats()["payload_bytes"] > held + 900
+
+    execution.status = WorkflowNodeExecutionStatus.SUCCEEDED
+    cache.put(execution)
+    assert cache.stats()["payload_bytes"] == 0
@@ -0,0 +1,217 @@
+"""
+Unit tests for the write-behind implementation of WorkflowNodeExecutionRepository.
+"""
+
+import threading
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session, sessionmaker
+
+from configs import dify_config
+from core.repositories import WriteBehindWorkflowNodeExecutionRepository
+from core.repositories.write_behind_workflow_node_execution_repository import node_execution_flusher
+from core.workflow.entities.workflow_node_execution import WorkflowNodeExecution, WorkflowNodeExecutionStatus
+from core.workflow.nodes.enums import NodeType
+from models.account import Account
+from models.workflow import WorkflowNodeExecutionTriggeredFrom
+
+
+@pytest.fixture
+def session():
+    session = MagicMock(spec=Session)
+    session.__enter__ = MagicMock(return_value=session)
+    session.__exit__ = MagicMock(return_value=None)
+    session.get_bind.return_value.dialect.name = "sqlite"
+
+    session_factory = MagicMock(spec=sessionmaker)
+    session_factory.return_value = session
+    return session, session_factory
+
+
+@pytest.fixture
+def repository(session, monkeypatch):
+    _, session_factory = session
+    monkeypatch.setattr(dify_config, "WORKFLOW_NODE_EXECUTION_WRITE_STRICT", False)
+    # leave flushing to the tests
+    monkeypatch.setattr(node_execution_flusher, "schedule", MagicMock())
+
+    user = Account()
+    user.id = "test-user-id"
+    user._current_tenant = MagicMock()
+    user._current_tenant.id = "test-tenant"
+    return WriteBehindWorkflowNodeExecutionRepository(
+        session_factory=session_factory,
+        user=user,
+        app_id="test-app",
+        triggered_from=WorkflowNodeExecutionTriggeredFrom.WORKFLOW_RUN,
+    )
+
+
+def _execution(index: int) -> WorkflowNodeExecution:
+    return WorkflowNodeExecution(
+        id=f"id-{index}",
+        node_execution_id=f"node-execution-{index}",
+        workflow_id="test-workflow-id",
+        workflow_execution_id="test-workflow-run-id",
+        index=index,
+        node_id=f"node-{index}",
+        node_type=NodeType.LLM,
+        title="LLM",
+        status=WorkflowNodeExecutionStatus.RUNNING,
+        created_at=datetime.now(),
+    )
+
+
+def test_start_and_finish_of_a_node_are_written_once(repository, session):
+    session_obj, _ = session
+    execution = _execution(1)
+
+    repository.save(execution)
+    execution.status = WorkflowNodeExecutionStatus.SUCCEEDED
+    execution.update_from_mapping(outputs={"text": "hi"})
+    repository.save(execution)
+    session_obj.merge.assert_not_called()
+
+    repository.flush()
+
+    session_obj.merge.assert_called_once()
+    db_model = session_obj.merge.call_args.args[0]
+    assert db_model.status == WorkflowNodeExecutionStatus.SUCCEEDED
+    assert db_model.outputs_dict == {"text": "hi"}
+    session_obj.commit.assert_called_once()
+    assert repository.pending_count == 0
+
+
+def test_saved_state_is_kept_and_served_from_memory(repository, session):
+    session_obj, _ = session
+    execution = _execution(1)
+    repository.save(execution)
+    execution.status = WorkflowNodeExecutionStatus.FAILED
+
+    loaded = repository.get_by_node_execution_id("node-execution-1")
+
+    assert loaded is not None
+    assert loaded.status == WorkflowNodeExecutionStatus.RUNNING
+    session_obj.scalar.assert_not_called()
+
+
+def test_reads_of_a_run_flush_first(repository, session):
+    session_obj, _ = session
+    session_obj.scalars.return_value.all.return_value = []
+    repository.save(_execution(1))
+
+    assert repository.get_running_executions("test-workflow-run-id") == []
+
+    session_obj.merge.assert_called_once()
+    assert repository.pending_count == 0
+
+
+def test_failed_flush_keeps_pending_executions(repository, session):
+    session_obj, _ = session
+    session_obj.commit.side_effect = [RuntimeError("database is gone"), None]
+    repository.save(_execution(1))
+
+    repository.flush()
+    assert repository.pending_count == 1
+    node_execution_flusher.schedule.assert_called_with(repository, attempt=1)
+
+    repository.flush()
+    assert repository.pending_count == 0
+
+
+def test_failing_execution_is_isolated_from_its_batch(repository, session):
+    session_obj, _ = session
+
+    def merge(db_model):
+        if db_model.id == "id-1":
+            raise ValueError("value too long")
+
+    session_obj.merge.side_effect = merge
+    for index in range(3):
+        repository.save(_execution(index))
+
+    repository.flush()
+
+    written = [call.args[0].id for call in session_obj.merge.call_args_list[2:]]
+    assert written == ["id-0", "id-1", "id-2"]
+    assert session_obj.commit.call_count == 2
+    assert repository.pending_count == 1
+
+
+def test_failing_execution_is_dropped_after_max_attempts(repository, session, monkeypatch):
+    session_obj, _ = session
+    session_obj.merge.side_effect = ValueError("value too long")
+    monkeypatch.setattr(node_execution_flusher, "max_attempts", 2)
+    repository.save(_execution(1))
+
+    repository.flush()
+    assert repository.pending_count == 1
+    repository.flush()
+    assert repository.pending_count == 0
+    assert session_obj.merge.call_count == 2
+
+
+def test_postgresql_writes_one_upsert_per_batch(repository, session, monkeypatch):
+    session_obj, _ = session
+    session_obj.get_bind.return_value.dialect.name = "postgresql"
+    monkeypatch.setattr(node_execution_flusher, "batch_size", 2)
+    for index in range(3):
+        repository.save(_execution(index))
+
+    repository.flush()
+
+    assert session_obj.execute.call_count == 2
+    assert session_obj.commit.call_count == 2
+    sql = str(session_obj.execute.call_args_list[0].args[0].compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (id) DO UPDATE" in sql
+    session_obj.merge.assert_not_called()
+
+
+def test_strict_mode_writes_every_save(session, monkeypatch):
+    session_obj, session_factory = session
+    monkeypatch.setattr(dify_config, "WORKFLOW_NODE_EXECUTION_WRITE_STRICT", True)
+    user = Account()
+    user.id = "test-user-id"
+    user._current_tenant = MagicMock()
+    user._current_tenant.id = "test-tenant"
+    repository = WriteBehindWorkflowNodeExecutionRepository(
+        session_factory=session_factory,
+        user=user,
+        app_id="test-app",
+        triggered_from=WorkflowNodeExecutionTriggeredFrom.WORKFLOW_RUN,
+    )
+
+    repository.save(_execution(1))
+
+    session_obj.merge.assert_called_once()
+    assert repository.pending_count == 0
+
+
+def test_flusher_flushes_scheduled_repositories_after_interval(monkeypatch):
+    flushed = threading.Event()
+    repository = MagicMock(spec=WriteBehindWorkflowNodeExecutionRepository)
+    repository.flush.side_effect = flushed.set
+    monkeypatch.setattr(node_execution_flusher, "interval", 0.01)
+
+    node_execution_flusher.schedule(repository)
+
+    assert flushed.wait(timeout=5)
+    stats = node_execution_flusher.stats()
+    assert stats["queue_depth"] == 0
+    assert {"flush_latency", "flushed_rows", "errors"} <= stats.keys()
+
+
+def test_finished_executions_are_not_kept_in_memory(repository):
+    for index in range(10_000):
+        execution = _execution(index)
+        repository.save(execution)
+        assert repository.get_by_node_execution_id(execution.node_execution_id) is not None
+        execution.status = WorkflowNodeExecutionStatus.SUCCEEDED
+        repository.save(execution)
+
+    stats = repository._node_execution_cache.stats()
+    assert stats["entries"] == 0
+    assert stats["evictions"] == 10_000
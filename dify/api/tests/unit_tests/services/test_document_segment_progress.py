@@ -0,0 +1,27 @@
+from unittest.mock import MagicMock, patch
+
+from services.dataset_service import DocumentService
+
+
+@patch("services.dataset_service.db")
+def test_segment_progress_of_a_batch_is_one_grouped_query(mock_db):
+    document_ids = [f"document-{index}" for index in range(100)]
+    query = MagicMock()
+    query.filter.return_value = query
+    query.group_by.return_value = query
+    query.all.return_value = [("document-0", 3, 5), ("document-1", 0, 2)]
+    mock_db.session.query.return_value = query
+
+    progress = DocumentService.get_segment_progress(document_ids)
+
+    mock_db.session.query.assert_called_once()
+    assert progress["document-0"] == (3, 5)
+    assert progress["document-1"] == (0, 2)
+    assert progress["document-99"] == (0, 0)
+    assert len(progress) == 100
+
+
+@patch("services.dataset_service.db")
+def test_segment_progress_without_documents_does_not_query(mock_db):
+    assert DocumentService.get_segment_progress([]) == {}
+    mock_db.session.query.assert_not_called()
@@ -0,0 +1,38 @@
+from unittest.mock import MagicMock
+
+from core.plugin.entities.plugin_daemon import PluginInstallTaskStatus
+from services.plugin import plugin_service
+from services.plugin.plugin_service import PluginService
+
+
+def test_polling_a_finished_install_task_drops_the_caches_once(mocker):
+    keys: set[str] = set()
+
+    def set_(key, value, ex=None, nx=False):
+        if nx and key in keys:
+            return None
+        keys.add(key)
+        return True
+
+    mocker.patch.object(plugin_service, "redis_client", MagicMock(set=MagicMock(side_effect=set_)))
+    installer = mocker.patch.object(plugin_service, "PluginInstaller").return_value
+    installer.fetch_plugin_installation_task.return_value = MagicMock(status=PluginInstallTaskStatus.Success)
+    invalidate = mocker.patch.object(PluginService, "_invalidate_plugin_caches")
+
+    for _ in range(3):
+        PluginService.fetch_install_task("tenant-1", "task-1")
+    PluginService.fetch_install_task("tenant-1", "task-2")
+
+    assert [call.args for call in invalidate.call_args_list] == [("tenant-1",), ("tenant-1",)]
+
+
+def test_polling_a_running_install_task_keeps_the_caches(mocker):
+    redis = mocker.patch.object(plugin_service, "redis_client", MagicMock())
+    installer = mocker.patch.object(plugin_service, "PluginInstaller").return_value
+    installer.fetch_plugin_installation_task.return_value = MagicMock(status=PluginInstallTaskStatus.Running)
+    invalidate = mocker.patch.object(PluginService, "_invalidate_plugin_caches")
+
+    PluginService.fetch_install_task("tenant-1", "task-1")
+
+    invalidate.assert_not_called()
+    redis.set.assert_not_called()
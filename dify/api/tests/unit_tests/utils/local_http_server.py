@@ -0,0 +1,95 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LocalRequestHandler(BaseHTTPRequestHandler):
+    """
+    Base handler of the local stand-ins of the services, subclasses answer in `handle_request`.
+    Accepted connections and requests are counted.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def setup(self) -> None:
+        super().setup()
+        # headers and body are written separately, without nodelay every response waits for a delayed ack
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    @property
+    def authorized(self) -> bool:
+        return self.headers.get("X-Api-Key") == self.server.api_key
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self) -> None:
+        raise NotImplementedError
+
+    def _handle(self) -> None:
+        with self.server.lock:
+            self.server.requests += 1
+        self.handle_request()
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler_class: type[LocalRequestHandler], api_key: str) -> None:
+        super().__init__(("127.0.0.1", 0), handler_class)
+        self.api_key = api_key
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+
+class LocalHTTPServer:
+    """
+    HTTP server on a free local port, served by a background thread while the context is entered
+    """
+
+    handler_class: type[LocalRequestHandler]
+
+    def __init__(self, api_key: str) -> None:
+        self._server = _Server(self.handler_class, api_key)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._server.shutdown()
+        self._server.server_close()